@@ -0,0 +1,37 @@
+#!/usr/bin/python
+
+"""
+cmdperf.py: measure the throughput of node.cmd() for commands
+that produce a large amount of output
+
+Usage: cmdperf.py [megabytes]
+"""
+
+from time import time
+from sys import argv
+
+from mininet.net import Mininet
+from mininet.log import setLogLevel, info
+
+
+def cmdPerf( megabytes=100, trials=3 ):
+    "Time host.cmd() on megabytes of output and report throughput"
+    net = Mininet( controller=None )
+    host = net.addHost( 'h1' )
+    nbytes = megabytes * 1024 * 1024
+    # 64-byte lines (including \r\n from the pty)
+    cmd = 'yes %s | head -c %d' % ( 'x' * 62, nbytes )
+    info( '*** Running', cmd, '\n' )
+    for trial in range( trials ):
+        start = time()
+        result = host.cmd( cmd )
+        elapsed = time() - start
+        info( '*** trial %d: %d bytes in %.2fs (%.1f MB/s)\n' %
+              ( trial, len( result ), elapsed,
+                len( result ) / elapsed / 1e6 ) )
+    net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    cmdPerf( megabytes=int( argv[ 1 ] ) if len( argv ) > 1 else 100 )
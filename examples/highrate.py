@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+"""
+highrate.py: measure achieved vs. configured rate for TCLink
+shaping at multi-gigabit rates
+
+We connect two hosts with a veth pair, measure its unshaped
+rate with iperf, and then change its bw in place (Link.update())
+to each rate in turn, comparing the rate iperf achieves with the
+configured rate. Above TCIntf.bwParamMax (1 Gb/s), we shape with
+high_rate=True, which sizes bursts and quanta from the rate; at
+1 Gb/s we also measure the default parameters for comparison.
+
+Usage: highrate.py [seconds [rate (Mb/s) ...]]
+"""
+
+from sys import argv
+
+from mininet.net import Mininet
+from mininet.link import TCLink
+from mininet.log import setLogLevel, info
+from mininet.util import quietRun
+
+
+def iperfRate( net, seconds ):
+    "Return receive rate (Mb/s) measured by iperf from h1 to h2"
+    serverbw, _clientbw = net.iperf( fmt='m', seconds=seconds )
+    return float( serverbw.split()[ 0 ] )
+
+
+def highRate( seconds=5, rates=None ):
+    """Measure achieved rate for each configured rate
+       seconds: iperf duration for each measurement
+       rates: list of rates (Mb/s)
+       returns: list of ( mode, configured rate, achieved rate )"""
+    if not rates:
+        rates = [ 1000, 2000, 5000, 10000, 25000, 40000 ]
+    net = Mininet( link=TCLink, controller=None )
+    h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+    link = net.addLink( h1, h2 )
+    net.start()
+    info( '*** Measuring unshaped veth rate\n' )
+    results = [ ( 'unshaped', None, iperfRate( net, seconds ) ) ]
+    modes = [ ( rate, high ) for rate in rates
+              for high in ( ( False, True ) if rate <= link.intf1.bwParamMax
+                            else ( True, ) ) ]
+    for rate, high in modes:
+        info( '*** Shaping at %d Mb/s (%s)\n' %
+              ( rate, 'high_rate' if high else 'default' ) )
+        failures = link.update( bw=rate, high_rate=high, wait=True )
+        if failures:
+            info( '*** tc errors:', failures, '\n' )
+            continue
+        results.append( ( 'high_rate' if high else 'default', rate,
+                          iperfRate( net, seconds ) ) )
+    net.stop()
+    info( '\n*** Results\n' )
+    info( '%-10s %12s %12s %8s\n' % ( 'mode', 'configured', 'achieved',
+                                      'ratio' ) )
+    for mode, rate, achieved in results:
+        info( '%-10s %12s %12.1f %8s\n' %
+              ( mode, rate or '-', achieved,
+                '%.3f' % ( achieved / rate ) if rate else '-' ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    if not quietRun( 'which iperf' ):
+        raise Exception( 'This example requires iperf' )
+    highRate( seconds=int( argv[ 1 ] ) if len( argv ) > 1 else 5,
+              rates=[ int( arg ) for arg in argv[ 2: ] ] )
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+
+"""
+linktrace.py: replay synthetic bandwidth and delay traces on
+many links at once, and report how closely we kept to schedule
+
+Usage: linktrace.py [links [seconds [steps per second]]]
+"""
+
+from math import sin, pi
+from sys import argv
+
+from mininet.net import Mininet
+from mininet.link import TCLink
+from mininet.linktrace import LinkTracePlayer
+from mininet.log import setLogLevel, info
+
+
+def synthTrace( seconds, hz, phase=0 ):
+    "Return a trace with sinusoidal bandwidth and delay"
+    trace = []
+    for step in range( int( seconds * hz ) ):
+        t = float( step ) / hz
+        x = sin( 2 * pi * ( t / seconds + phase ) )
+        trace.append( ( t, { 'bw': 10 + 8 * x,
+                             'delay': '%.1fms' % ( 20 + 15 * x ) } ) )
+    return trace
+
+
+def linkTrace( links=10, seconds=5, hz=50 ):
+    "Replay a trace on each of a number of links"
+    net = Mininet( link=TCLink, controller=None )
+    h0 = net.addHost( 'h0' )
+    traces = {}
+    for i in range( 1, links + 1 ):
+        link = net.addLink( h0, net.addHost( 'h%d' % i ), bw=10,
+                            delay='20ms' )
+        traces[ link ] = synthTrace( seconds, hz, phase=float( i ) / links )
+    info( '*** Computing tc changes\n' )
+    player = LinkTracePlayer( traces )
+    player.play()
+    net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    args = [ int( arg ) for arg in argv[ 1: ] ]
+    linkTrace( *args )
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+
+"""
+perflink.py: compare iperf throughput across link profiles
+
+For each link profile, we connect two hosts with a single link
+and measure TCP throughput with iperf, to show how much of a
+bandwidth-heavy experiment's throughput is limited by the veths
+themselves: Link (single queue, default offloads), TCLink (GRO
+off), and PerfLink (a queue per CPU, jumbo MTU, GRO/TSO/GSO on)
+with standard and jumbo MTUs.
+
+Usage: perflink.py [seconds]
+"""
+
+from functools import partial
+from sys import argv
+
+from mininet.net import Mininet
+from mininet.link import Link, TCLink, PerfLink
+from mininet.log import setLogLevel, info
+from mininet.util import quietRun
+
+
+profiles = ( ( 'Link', Link ),
+             ( 'TCLink', TCLink ),
+             ( 'PerfLink mtu 1500', partial( PerfLink, mtu=1500 ) ),
+             ( 'PerfLink', PerfLink ) )
+
+
+def profileRate( link, seconds ):
+    "Return iperf throughput (Mb/s) between two hosts using link"
+    net = Mininet( link=link, controller=None )
+    h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+    net.addLink( h1, h2 )
+    net.start()
+    serverbw, _clientbw = net.iperf( fmt='m', seconds=seconds )
+    net.stop()
+    return float( serverbw.split()[ 0 ] )
+
+
+def perfLink( seconds=10 ):
+    "Measure throughput for each link profile"
+    results = []
+    for name, link in profiles:
+        info( '*** Testing', name, '\n' )
+        results.append( ( name, profileRate( link, seconds ) ) )
+    info( '\n*** Results\n' )
+    for name, rate in results:
+        info( '%-20s %10.1f Mb/s\n' % ( name, rate ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    if not quietRun( 'which iperf' ):
+        raise Exception( 'This example requires iperf' )
+    perfLink( seconds=int( argv[ 1 ] ) if len( argv ) > 1 else 10 )
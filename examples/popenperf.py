@@ -0,0 +1,36 @@
+#!/usr/bin/python
+
+"""
+popenperf.py: compare the rate at which host.popen() can spawn
+short-lived commands when attaching to the host's namespaces with
+mnexec (the default) or with setns() (setnsPopen=True)
+
+Usage: popenperf.py [spawns]
+"""
+
+from time import time
+from sys import argv
+
+from mininet.net import Mininet
+from mininet.log import setLogLevel, info
+
+
+def popenPerf( spawns=1000 ):
+    "Time host.pexec( 'true' ) with and without setnsPopen"
+    net = Mininet( controller=None )
+    hosts = { 'mnexec': net.addHost( 'h1' ),
+              'setns': net.addHost( 'h2', setnsPopen=True ) }
+    for method in sorted( hosts ):
+        host = hosts[ method ]
+        start = time()
+        for _ in range( spawns ):
+            host.pexec( 'true' )
+        elapsed = time() - start
+        info( '*** %s: %d spawns in %.2fs (%.0f spawns/s)\n' %
+              ( method, spawns, elapsed, spawns / elapsed ) )
+    net.stop()
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    popenPerf( spawns=int( argv[ 1 ] ) if len( argv ) > 1 else 1000 )
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+
+"""
+topobench.py: compare memory use and construction time of Topo
+and CompactTopo for a large topology
+
+We build a leaf-spine topology (hosts attached to leaf switches,
+each leaf linked to every spine) with each class, and report the
+time to build it, the memory it uses, and the time to list its
+nodes and sorted links as Mininet.buildFromTopo() does. Memory is
+measured with tracemalloc, so it is only reported on Python 3.
+
+Usage: topobench.py [leaves [spines [hosts per leaf]]]
+"""
+
+from sys import argv
+from time import time
+
+from mininet.topo import Topo
+from mininet.compacttopo import CompactTopo
+from mininet.log import setLogLevel, info
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+
+def leafSpine( topoClass, leaves, spines, hostsPerLeaf ):
+    "Return a leaf-spine topology built with topoClass"
+
+    class LeafSpine( topoClass ):
+        "Leaf-spine topology"
+        def build( self ):
+            spineNames = [ self.addSwitch( 's%d' % ( s + 1 ) )
+                           for s in range( spines ) ]
+            for l in range( leaves ):
+                leaf = self.addSwitch( 'l%d' % ( l + 1 ) )
+                for spine in spineNames:
+                    self.addLink( leaf, spine, bw=10000 )
+                for h in range( hostsPerLeaf ):
+                    host = self.addHost( 'h%ds%d' % ( h + 1, l + 1 ) )
+                    self.addLink( host, leaf, bw=1000, delay='1ms' )
+
+    return LeafSpine()
+
+
+def topoBench( leaves=1000, spines=16, hostsPerLeaf=32 ):
+    """Build and list the topology with Topo and CompactTopo
+       returns: list of ( class name, build time (s), memory (MB)
+         or None, list time (s) )"""
+    results = []
+    for topoClass in Topo, CompactTopo:
+        info( '*** Building %d-leaf, %d-spine topology with %s\n' %
+              ( leaves, spines, topoClass.__name__ ) )
+        if tracemalloc:
+            tracemalloc.start()
+        start = time()
+        topo = leafSpine( topoClass, leaves, spines, hostsPerLeaf )
+        built = time() - start
+        memory = None
+        if tracemalloc:
+            memory = tracemalloc.get_traced_memory()[ 0 ] / 1e6
+            tracemalloc.stop()
+        start = time()
+        topo.hosts()
+        topo.switches()
+        links = topo.links( sort=True, withInfo=True )
+        listed = time() - start
+        info( '*** %d links\n' % len( links ) )
+        results.append( ( topoClass.__name__, built, memory, listed ) )
+        del topo, links
+    info( '\n*** Results\n' )
+    info( '%-12s %10s %12s %10s\n' % ( 'class', 'build (s)', 'memory (MB)',
+                                       'list (s)' ) )
+    for name, built, memory, listed in results:
+        info( '%-12s %10.2f %12s %10.2f\n' %
+              ( name, built, '%.1f' % memory if memory else '-', listed ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    topoBench( *[ int( arg ) for arg in argv[ 1: ] ] )
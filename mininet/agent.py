@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+"""
+agent.py: command agent which runs in a node's namespaces
+
+Node.startAgent() runs this file (via mnexec, like any other popen()
+command) with one end of a socketpair as its stdin. The agent runs
+commands it receives using /bin/sh -c, any number at a time, and
+returns each command's output, exit status and timing. Unlike our
+bash shell, it needs no pty, keeps stdout and stderr separate and
+passes binary output through unchanged.
+
+Protocol: each frame is a header ( payload length, request id, type )
+followed by its payload.
+
+  Requests:
+    'C': run command (payload) with separate stdout and stderr
+    'M': run command (payload) with stderr merged into stdout
+    'K': send signal (payload: 4-byte signal number) to command's
+         process group
+
+  Replies:
+    'R': command result: exit status (-signal if killed), wall,
+         user and system CPU time (s), stdout length, stdout, stderr
+
+The agent exits, sending SIGHUP to any running commands, when the
+socket is closed. Since it is run by path in the node, this file only
+uses the standard library.
+"""
+
+import fcntl
+import os
+import re
+import select
+import signal
+import socket
+import struct
+import sys
+from subprocess import Popen, PIPE, STDOUT
+from time import time
+
+# Frame header: payload length, request id, type
+Header = struct.Struct( '!IIc' )
+# Result: exit status, wall time, user time, system time, stdout length
+Result = struct.Struct( '!idddI' )
+Signal = struct.Struct( '!I' )
+
+# Source file to run in a node (rather than a compiled .pyc)
+agentPath = os.path.splitext( os.path.abspath( __file__ ) )[ 0 ] + '.py'
+
+
+def frame( rid, ftype, payload=b'' ):
+    """Return an encoded frame
+       rid: request id
+       ftype: frame type (b'C', b'M', b'K' or b'R')
+       payload: frame payload (bytes)"""
+    return Header.pack( len( payload ), rid, ftype ) + payload
+
+
+def parseFrames( buf ):
+    """Remove complete frames from the start of buf
+       buf: bytearray of received data
+       returns: list of ( rid, ftype, payload )"""
+    frames, start = [], 0
+    while len( buf ) - start >= Header.size:
+        length, rid, ftype = Header.unpack_from( bytes( buf[ start :
+                                                   start + Header.size ] ) )
+        end = start + Header.size + length
+        if len( buf ) < end:
+            break
+        frames.append( ( rid, ftype, bytes( buf[ start + Header.size :
+                                                 end ] ) ) )
+        start = end
+    del buf[ :start ]
+    return frames
+
+
+def encodeResult( status, wall, user, system, stdout, stderr ):
+    "Return the payload of a result frame"
+    return Result.pack( status, wall, user, system,
+                        len( stdout ) ) + stdout + stderr
+
+
+def decodeResult( payload ):
+    """Decode the payload of a result frame
+       returns: dict of stdout, stderr, status, wall, user and sys"""
+    status, wall, user, system, outlen = Result.unpack_from( payload )
+    start = Result.size
+    return { 'stdout': payload[ start : start + outlen ],
+             'stderr': payload[ start + outlen : ],
+             'status': status, 'wall': wall, 'user': user, 'sys': system }
+
+
+class Agent( object ):
+    "Run commands received over a socket and return their results"
+
+    # Commands containing any of these characters need a shell
+    # (e.g. % for job specs, which /bin/kill doesn't understand)
+    shellChars = re.compile( r'[^\w\s@+=:,./-]' )
+
+    def __init__( self, sock ):
+        "sock: connected socket"
+        self.sock = sock
+        self.buf = bytearray()
+        self.jobs = {}  # request id -> job dict
+        self.fds = {}  # output fd -> ( request id, output list, pipe )
+        self.poller = select.poll()
+        self.poller.register( sock.fileno(), select.POLLIN )
+        self.devnull = open( os.devnull, 'rb' )
+        # SIGCHLD wakes up poll() via a pipe, so that we can reap
+        # commands as soon as they exit
+        self.wakeup, wakeupw = os.pipe()
+        for fd in self.wakeup, wakeupw:
+            fcntl.fcntl( fd, fcntl.F_SETFL, os.O_NONBLOCK )
+        self.poller.register( self.wakeup, select.POLLIN )
+        signal.set_wakeup_fd( wakeupw )
+        signal.signal( signal.SIGCHLD, lambda _sig, _frame: None )
+
+    def start( self, rid, cmd, merge ):
+        "Start command cmd for request rid"
+        # Run each command in its own session so that signals
+        # reach all of its processes
+        if sys.version_info[ 0 ] >= 3:
+            session = { 'start_new_session': True }
+        else:
+            session = { 'preexec_fn': os.setsid }
+        params = dict( stdin=self.devnull, stdout=PIPE,
+                       stderr=STDOUT if merge else PIPE, close_fds=True,
+                       **session )
+        popen = None
+        if not self.shellChars.search( cmd ):
+            # Skip /bin/sh for simple commands, unless they turn out
+            # to be shell builtins or missing
+            try:
+                popen = Popen( cmd.split(), **params )
+            except OSError:
+                pass
+        if not popen:
+            popen = Popen( [ '/bin/sh', '-c', cmd ], **params )
+        job = { 'popen': popen, 'start': time(), 'out': [], 'err': [],
+                'open': 0 }
+        for pipe, chunks in ( ( popen.stdout, job[ 'out' ] ),
+                              ( popen.stderr, job[ 'err' ] ) ):
+            if pipe:
+                self.fds[ pipe.fileno() ] = ( rid, chunks, pipe )
+                self.poller.register( pipe.fileno(), select.POLLIN )
+                job[ 'open' ] += 1
+        self.jobs[ rid ] = job
+
+    def read( self, fd ):
+        "Read output from fd, closing it at EOF"
+        rid, chunks, pipe = self.fds[ fd ]
+        data = os.read( fd, 65536 )
+        if data:
+            chunks.append( data )
+            return
+        self.poller.unregister( fd )
+        del self.fds[ fd ]
+        pipe.close()
+        self.jobs[ rid ][ 'open' ] -= 1
+
+    def reap( self ):
+        "Send results of exited commands whose output is closed"
+        for rid, job in list( self.jobs.items() ):
+            if job[ 'open' ]:
+                continue
+            popen = job[ 'popen' ]
+            pid, status, usage = os.wait4( popen.pid, os.WNOHANG )
+            if not pid:
+                continue
+            wall = time() - job[ 'start' ]
+            if os.WIFSIGNALED( status ):
+                status = -os.WTERMSIG( status )
+            else:
+                status = os.WEXITSTATUS( status )
+            # Keep Popen from waiting for (or warning about) it
+            popen.returncode = status
+            del self.jobs[ rid ]
+            self.sock.sendall( frame( rid, b'R', encodeResult(
+                status, wall, usage.ru_utime, usage.ru_stime,
+                b''.join( job[ 'out' ] ), b''.join( job[ 'err' ] ) ) ) )
+
+    def request( self, rid, ftype, payload ):
+        "Handle a request frame"
+        if ftype in ( b'C', b'M' ):
+            self.start( rid, payload.decode( 'utf-8' ), ftype == b'M' )
+        elif ftype == b'K' and rid in self.jobs:
+            sig, = Signal.unpack( payload )
+            try:
+                os.killpg( self.jobs[ rid ][ 'popen' ].pid, sig )
+            except OSError:
+                pass
+
+    def run( self ):
+        "Handle requests until our socket is closed"
+        sockfd = self.sock.fileno()
+        while True:
+            try:
+                events = self.poller.poll()
+            except ( select.error, OSError ):
+                # Python 2: interrupted by SIGCHLD
+                events = []
+            for fd, _event in events:
+                if fd == self.wakeup:
+                    os.read( fd, 4096 )
+                    continue
+                if fd != sockfd:
+                    self.read( fd )
+                    continue
+                data = self.sock.recv( 65536 )
+                if not data:
+                    self.stop()
+                    return
+                self.buf += data
+                for rid, ftype, payload in parseFrames( self.buf ):
+                    self.request( rid, ftype, payload )
+            self.reap()
+
+    def stop( self ):
+        "Hang up on running commands"
+        for job in self.jobs.values():
+            try:
+                os.killpg( job[ 'popen' ].pid, signal.SIGHUP )
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    Agent( socket.fromfd( 0, socket.AF_UNIX, socket.SOCK_STREAM ) ).run()
+    sys.exit( 0 )
@@ -102,8 +102,20 @@ def cleanup( cls):
             info( "*** Removing tap9 - assuming it's from cluster edition\n" )
             sh( 'ip link del tap9' )
 
+        info( "*** Removing registered node namespaces\n" )
+        # Names in /var/run/mntns are only registered by mnexec -N
+        names = sh( 'ls /var/run/mntns 2> /dev/null' ).split()
+        for i in range( 0, len( names ), n ):
+            paths = ' '.join( '/var/run/%s/%s' % ( nsdir, name )
+                              for name in names[ i : i + n ]
+                              for nsdir in ( 'netns', 'mntns' ) )
+            sh( 'umount -l %s 2> /dev/null; rm -f %s' % ( paths, paths ) )
+
         info( "*** Killing stale mininet node processes\n" )
+        # Shells and lazyShell namespace holders are tagged mininet:
         killprocs( 'mininet:' )
+        # Command agents (see agent.py)
+        killprocs( 'mininet/agent.py' )
 
         info( "*** Shutting down stale tunnels\n" )
         killprocs( 'Tunnel=Ethernet' )
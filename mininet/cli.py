@@ -35,6 +35,7 @@
 import atexit
 
 from mininet.log import info, output, error
+from mininet.trafficmatrix import patterns
 from mininet.term import makeTerms, runX11
 from mininet.util import ( quietRun, dumpNodeConnections,
                            dumpPorts )
@@ -195,16 +196,26 @@ def do_px( self, line ):
     # pylint: enable=broad-except,exec-used
 
     def do_pingall( self, line ):
-        "Ping between all hosts."
-        self.mn.pingAll( line )
+        """Ping between all hosts, all pairs at once.
+           Usage: pingall [timeout]"""
+        self.mn.pingAll( line, parallel=True )
 
     def do_pingpair( self, _line ):
         "Ping between first two hosts, useful for testing."
         self.mn.pingPair()
 
-    def do_pingallfull( self, _line ):
-        "Ping between all hosts, returns all ping results."
-        self.mn.pingAllFull()
+    def do_pingallfull( self, line ):
+        """Ping between all hosts, all pairs at once; returns all results,
+           including RTT percentiles if count > 1, and optionally saves
+           them to a CSV or .npz file.
+           Usage: pingallfull [count [file]]"""
+        args = line.split()
+        if len( args ) > 2 or ( args and not args[ 0 ].isdigit() ):
+            error( 'invalid number of args: pingallfull [count [file]]\n' )
+            return
+        count = int( args[ 0 ] ) if args else 1
+        export = args[ 1 ] if len( args ) > 1 else None
+        self.mn.pingAllFull( parallel=True, count=count, export=export )
 
     def do_pingpairfull( self, _line ):
         "Ping between first two hosts, returns all ping results."
@@ -252,6 +263,22 @@ def do_iperfudp( self, line ):
             error( 'invalid number of args: iperfudp bw src dst\n' +
                    'bw examples: 10M\n' )
 
+    def do_iperfmatrix( self, line ):
+        """Run iperf flows between many pairs of hosts at once.
+           Usage: iperfmatrix [all|permutation|incast [seconds]]"""
+        args = line.split()
+        if len( args ) > 2 or ( len( args ) == 2 and
+                                not args[ 1 ].isdigit() ):
+            error( 'invalid number of args: iperfmatrix '
+                   '[all|permutation|incast [seconds]]\n' )
+            return
+        pattern = args[ 0 ] if args else 'permutation'
+        if pattern not in patterns:
+            error( 'unknown traffic pattern: %s\n' % pattern )
+            return
+        seconds = int( args[ 1 ] ) if len( args ) > 1 else 5
+        self.mn.iperfMatrix( pattern, seconds=seconds )
+
     def do_intfs( self, _line ):
         "List interfaces."
         for node in self.mn.values():
@@ -0,0 +1,342 @@
+"""
+compacttopo.py: compact graph backend for very large topologies
+
+MultiGraph stores each link as nested dicts, including an info dict
+with the link's nodes, ports and options, and Topo keeps another
+nested dict with every node's ports. For topologies with millions of
+links, this can take gigabytes.
+
+CompactGraph implements the MultiGraph interface using integer node
+ids and arrays:
+
+- each link's nodes, ports and key are stored in arrays
+- its other options are interned, so links with the same options
+  (e.g. from lopts) share a single dict
+- adjacency is built when needed in CSR form: an array of offsets
+  (one per node) into an array of link indices
+
+CompactTopo is a Topo which uses a CompactGraph, and which finds
+ports from its links rather than keeping Topo.ports. To use it,
+subclass it rather than Topo:
+
+    class BigTopo( CompactTopo ):
+        def build( self, n ):
+            ...
+
+Since link info dicts are assembled when they are requested, changes
+to them are only kept if they are saved with setlinkInfo().
+
+Only the Python standard library is required.
+"""
+
+from array import array
+
+from mininet.topo import MultiGraph, Topo
+
+
+# Array value for missing or non-integer values, which we keep
+# in CompactGraph.otherValues
+NONE = -( 1 << 31 )
+
+# Placeholder for fields which are missing altogether
+MISSING = object()
+
+
+class CompactGraph( MultiGraph ):
+    "MultiGraph which stores links in arrays"
+
+    # pylint: disable=super-init-not-called
+    def __init__( self ):
+        self.node = {}  # node name to attribute dict
+        self.ids = {}  # node name to node id
+        self.names = []  # node id to node name
+        # Link arrays, indexed by link number
+        self.src, self.dst = array( 'l' ), array( 'l' )
+        self.keys = array( 'l' )
+        self.port1, self.port2 = array( 'l' ), array( 'l' )
+        self.ends = array( 'b' )  # 1 if node1, node2 are src, dst
+        self.optIndex = array( 'l' )
+        self.opts = []  # interned option dicts
+        self.optIds = {}  # hashable form of options to index in opts
+        self.otherValues = {}  # ( link, field ) to value not in arrays
+        self.nextKey = {}  # node id pair to next ordinal key
+        self.adj = None  # ( offsets, links ) adjacency, if built
+    # pylint: enable=super-init-not-called
+
+    def nodeId( self, node ):
+        "Return id for node, adding it if necessary"
+        nodeId = self.ids.get( node )
+        if nodeId is None:
+            nodeId = self.ids[ node ] = len( self.names )
+            self.names.append( node )
+            self.node.setdefault( node, {} )
+            self.adj = None
+        return nodeId
+
+    def add_node( self, node, attr_dict=None, **attrs ):
+        """Add node to graph
+           attr_dict: attribute dict (optional)
+           attrs: more attributes (optional)
+           warning: updates attr_dict with attrs"""
+        MultiGraph.add_node( self, node, attr_dict, **attrs )
+        self.nodeId( node )
+
+    def add_edge( self, src, dst, key=None, attr_dict=None, **attrs ):
+        """Add edge to graph
+           key: optional key
+           attr_dict: optional attribute dict
+           attrs: more attributes
+           warning: udpates attr_dict with attrs"""
+        attr_dict = {} if attr_dict is None else attr_dict
+        attr_dict.update( attrs )
+        i, j = self.nodeId( src ), self.nodeId( dst )
+        # If no key, pick next ordinal number
+        pair = ( min( i, j ) << 32 ) | max( i, j )
+        nextKey = self.nextKey.get( pair, 1 )
+        if key is None:
+            key = nextKey
+        if isinstance( key, int ) and key >= nextKey:
+            self.nextKey[ pair ] = key + 1
+        link = len( self.src )
+        self.src.append( i )
+        self.dst.append( j )
+        for arr in ( self.keys, self.port1, self.port2, self.ends,
+                     self.optIndex ):
+            arr.append( 0 )
+        self.put( self.keys, link, 'key', key )
+        self.setAttrs( link, attr_dict )
+        self.adj = None
+        return key
+
+    def put( self, arr, link, field, value ):
+        "Internal method: store value in arr, or in otherValues"
+        self.otherValues.pop( ( link, field ), None )
+        if ( isinstance( value, int ) and not isinstance( value, bool )
+             and value != NONE ):
+            try:
+                arr[ link ] = value
+                return
+            except OverflowError:
+                pass
+        arr[ link ] = NONE
+        if value is not MISSING:
+            self.otherValues[ link, field ] = value
+
+    def fetch( self, arr, link, field ):
+        "Internal method: return value stored by put(), or MISSING"
+        value = arr[ link ]
+        if value != NONE:
+            return value
+        return self.otherValues.get( ( link, field ), MISSING )
+
+    def intern( self, opts ):
+        "Internal method: return index of a dict equal to opts in self.opts"
+        try:
+            frozen = tuple( sorted( opts.items() ) )
+            index = self.optIds.get( frozen )
+        except TypeError:
+            # Unhashable or unorderable options
+            frozen, index = None, None
+        if index is None:
+            index = len( self.opts )
+            self.opts.append( opts )
+            if frozen is not None:
+                self.optIds[ frozen ] = index
+        return index
+
+    def setAttrs( self, link, attrs ):
+        "Set attribute dict for link"
+        opts = dict( attrs )
+        src, dst = ( self.names[ self.src[ link ] ],
+                     self.names[ self.dst[ link ] ] )
+        ends = ( opts.get( 'node1', MISSING ) == src and
+                 opts.get( 'node2', MISSING ) == dst )
+        if ends:
+            del opts[ 'node1' ], opts[ 'node2' ]
+        self.ends[ link ] = 1 if ends else 0
+        self.put( self.port1, link, 'port1', opts.pop( 'port1', MISSING ) )
+        self.put( self.port2, link, 'port2', opts.pop( 'port2', MISSING ) )
+        self.optIndex[ link ] = self.intern( opts )
+
+    def attrs( self, link ):
+        "Return a new attribute dict for link"
+        info = dict( self.opts[ self.optIndex[ link ] ] )
+        if self.ends[ link ]:
+            info.update( node1=self.names[ self.src[ link ] ],
+                         node2=self.names[ self.dst[ link ] ] )
+        for field, arr in ( 'port1', self.port1 ), ( 'port2', self.port2 ):
+            value = self.fetch( arr, link, field )
+            if value is not MISSING:
+                info[ field ] = value
+        return info
+
+    def key( self, link ):
+        "Return key for link"
+        return self.fetch( self.keys, link, 'key' )
+
+    def linkEnds( self, link ):
+        "Return ( node1, node2 ) for link, from its attributes"
+        if self.ends[ link ]:
+            return ( self.names[ self.src[ link ] ],
+                     self.names[ self.dst[ link ] ] )
+        opts = self.opts[ self.optIndex[ link ] ]
+        return opts[ 'node1' ], opts[ 'node2' ]
+
+    def numLinks( self ):
+        "Return the number of links"
+        return len( self.src )
+
+    def adjacency( self ):
+        """Return CSR adjacency, building it if necessary
+           returns: offsets, links where links[ offsets[ i ] :
+             offsets[ i + 1 ] ] are node id i's links"""
+        if self.adj is None:
+            n = len( self.names )
+            offsets = array( 'l', [ 0 ] ) * ( n + 1 )
+            for ids in self.src, self.dst:
+                for i in ids:
+                    offsets[ i + 1 ] += 1
+            for i in range( n ):
+                offsets[ i + 1 ] += offsets[ i ]
+            fill = array( 'l', offsets )
+            links = array( 'l', [ 0 ] ) * offsets[ n ]
+            for link in range( len( self.src ) ):
+                for i in self.src[ link ], self.dst[ link ]:
+                    links[ fill[ i ] ] = link
+                    fill[ i ] += 1
+            self.adj = offsets, links
+        return self.adj
+
+    def nodeLinks( self, nodeId ):
+        """Return links of node id (twice for links to itself)"""
+        offsets, links = self.adjacency()
+        return links[ offsets[ nodeId ] : offsets[ nodeId + 1 ] ]
+
+    def edges_iter( self, data=False, keys=False ):
+        "Iterator: return graph edges, optionally with data and keys"
+        names = self.names
+        for link in range( len( self.src ) ):
+            src, dst = names[ self.src[ link ] ], names[ self.dst[ link ] ]
+            if src > dst:
+                # As MultiGraph does
+                src, dst = dst, src
+            if data:
+                if keys:
+                    yield( src, dst, self.key( link ), self.attrs( link ) )
+                else:
+                    yield( src, dst, self.attrs( link ) )
+            else:
+                if keys:
+                    yield( src, dst, self.key( link ) )
+                else:
+                    yield( src, dst )
+
+    def __getitem__( self, node ):
+        """Return link dict for given src node, which is assembled
+           from our arrays (see setEdgeInfo())"""
+        i = self.ids[ node ]
+        result = {}
+        for link in self.nodeLinks( i ):
+            other = ( self.dst[ link ] if self.src[ link ] == i
+                      else self.src[ link ] )
+            entry = result.setdefault( self.names[ other ], {} )
+            entry[ self.key( link ) ] = self.attrs( link )
+        return result
+
+    def setEdgeInfo( self, src, dst, info, key=None ):
+        """Set attribute dict of a link between src and dst
+           key: link key (default: lowest key)"""
+        i, j = self.ids[ src ], self.ids[ dst ]
+        links = dict( ( self.key( link ), link )
+                      for link in self.nodeLinks( i )
+                      if set( ( self.src[ link ], self.dst[ link ] ) ) ==
+                      set( ( i, j ) ) )
+        if key is None:
+            key = min( links )
+        self.setAttrs( links[ key ], info )
+
+
+class CompactTopo( Topo ):
+    """Topo which keeps its graph in a CompactGraph, and finds
+       ports from its links rather than keeping Topo.ports"""
+
+    graphClass = CompactGraph
+
+    def __init__( self, *args, **params ):
+        self.portCounts = array( 'l' )  # ports per node id
+        Topo.__init__( self, *args, **params )
+
+    def addPort( self, src, dst, sport=None, dport=None ):
+        """Generate port mapping for new edge.
+            src: source switch name
+            dst: destination switch name
+            Note: unlike Topo, we count ports rather than tracking
+            which are used, so we may reuse explicitly numbered
+            ports when choosing new ones"""
+        i, j = self.g.nodeId( src ), self.g.nodeId( dst )
+        counts = self.portCounts
+        if len( counts ) < len( self.g.names ):
+            counts.extend( [ 0 ] * ( len( self.g.names ) - len( counts ) ) )
+        # New port: number of outlinks + base
+        if sport is None:
+            sport = counts[ i ] + ( 1 if self.isSwitch( src ) else 0 )
+        if dport is None:
+            dport = counts[ j ] + ( 1 if self.isSwitch( dst ) else 0 )
+        counts[ i ] += 1
+        counts[ j ] += 1
+        return sport, dport
+
+    def port( self, src, dst ):
+        """Get port numbers.
+            src: source switch name
+            dst: destination switch name
+            returns: tuple (sport, dport), or a list of them if there
+              isn't exactly one link between src and dst"""
+        g = self.g
+        i, j = g.ids[ src ], g.ids[ dst ]
+        ports = []
+        for link in g.nodeLinks( i ):
+            info = g.attrs( link )
+            if g.src[ link ] == i and g.dst[ link ] == j:
+                ports.append( ( info[ 'port1' ], info[ 'port2' ] ) )
+            elif g.dst[ link ] == i and g.src[ link ] == j:
+                ports.append( ( info[ 'port2' ], info[ 'port1' ] ) )
+        return ports if len( ports ) != 1 else ports[ 0 ]
+
+    def setlinkInfo( self, src, dst, info, key=None ):
+        "Set link metadata dict"
+        self.g.setEdgeInfo( src, dst, info, key )
+        if self.sortCache:
+            self.sortCache.clear()
+
+    def links( self, sort=False, withKeys=False, withInfo=False ):
+        """Return links
+           sort: sort links alphabetically, preserving (src, dst) order
+           withKeys: return link keys
+           withInfo: return link info
+           returns: list of ( src, dst [,key, info ] )"""
+        if not sort:
+            return Topo.links( self, withKeys=withKeys, withInfo=withInfo )
+        g = self.g
+
+        def sortKey( link ):
+            "Natural sort key for link"
+            items = g.linkEnds( link ) + (
+                ( g.key( link ), ) if withKeys else () )
+            return [ self.naturalKey( item ) for item in items ]
+
+        # We remember the order of our links rather than the links
+        # themselves, which would include every link's info dict
+        order = self.cachedSort(
+            ( 'linkOrder', withKeys ),
+            lambda: array( 'l', sorted( range( g.numLinks() ),
+                                        key=sortKey ) ) )
+        links = []
+        for link in order:
+            item = g.linkEnds( link )
+            if withKeys:
+                item += ( g.key( link ), )
+            if withInfo:
+                item += ( g.attrs( link ), )
+            links.append( item )
+        return links
@@ -20,12 +20,14 @@
 
 Intf: basic interface object that can configure itself
 TCIntf: interface with bandwidth limiting and delay via tc
+PerfIntf: TCIntf with offloads enabled for throughput
 
 Link: basic link class for creating veth pairs
+PerfLink: link with multiqueue, jumbo MTU veths and PerfIntfs
 """
 
 from mininet.log import info, error, debug
-from mininet.util import makeIntfPair
+from mininet.util import makeIntfPair, batchFailures, batchPipe, numCores
 import re
 
 class Intf( object ):
@@ -68,27 +70,63 @@ def ifconfig( self, *args ):
         "Configure ourselves using ifconfig"
         return self.cmd( 'ifconfig', self.name, *args )
 
+    def deferring( self ):
+        "Is our node queueing configuration commands?"
+        return self.node.deferring()
+
+    def configFlushed( self, failures ):
+        """Called by our node once our queued commands have run
+           failures: list of ( origin, command, message ) for the
+             node's commands which failed"""
+        pass
+
+    def queueConfig( self, method, arg, *cmds, **kwargs ):
+        """Queue commands in our node (see Node.deferConfig())
+           method: name of queueing method
+           arg: its argument
+           cmds: batch commands
+           tool: 'ip' (default), 'tc' or 'sh'"""
+        return self.node.queueConfig( '%s.%s( %s )' % ( self, method, arg ),
+                                      cmds, **kwargs )
+
     def setIP( self, ipstr, prefixLen=None ):
         """Set our IP address"""
         # This is a sign that we should perhaps rethink our prefix
         # mechanism and/or the way we specify IP addresses
         if '/' in ipstr:
             self.ip, self.prefixLen = ipstr.split( '/' )
-            return self.ifconfig( ipstr, 'up' )
         else:
             if prefixLen is None:
                 raise Exception( 'No prefix length set for IP address %s'
                                  % ( ipstr, ) )
             self.ip, self.prefixLen = ipstr, prefixLen
+        if self.deferring():
+            # Replace our address, as ifconfig does
+            return self.queueConfig(
+                'setIP', ipstr,
+                'addr flush dev %s scope global' % self.name,
+                'addr add %s/%s brd + dev %s' % ( self.ip, self.prefixLen,
+                                                  self.name ),
+                'link set dev %s up' % self.name )
+        if '/' in ipstr:
+            return self.ifconfig( ipstr, 'up' )
+        else:
             return self.ifconfig( '%s/%s' % ( ipstr, prefixLen ) )
 
     def setMAC( self, macstr ):
         """Set the MAC address for an interface.
            macstr: MAC address as string"""
         self.mac = macstr
-        return ( self.ifconfig( 'down' ) +
-                 self.ifconfig( 'hw', 'ether', macstr ) +
-                 self.ifconfig( 'up' ) )
+        if self.deferring():
+            return self.queueConfig(
+                'setMAC', macstr,
+                'link set dev %s down' % self.name,
+                'link set dev %s address %s' % ( self.name, macstr ),
+                'link set dev %s up' % self.name )
+        return ''.join( self.node.batchCmd( [
+            'ifconfig %s down' % self.name,
+            'ifconfig %s hw ether %s' % ( self.name, macstr ),
+            'ifconfig %s up' % self.name ] ) )
 
     _ipMatchRegex = re.compile( r'\d+\.\d+\.\d+\.\d+' )
     _macMatchRegex = re.compile( r'..:..:..:..:..:..' )
@@ -134,6 +172,10 @@ def MAC( self ):
     def isUp( self, setUp=False ):
         "Return whether interface is up"
         if setUp:
+            if self.deferring():
+                self.queueConfig( 'isUp', 'setUp=True',
+                                  'link set dev %s up' % self.name )
+                return True
             cmdOutput = self.ifconfig( 'up' )
             # no output indicates success
             if cmdOutput:
@@ -229,18 +271,43 @@ class TCIntf( Intf ):
        as well as delay, loss and max queue length"""
 
     # The parameters we use seem to work reasonably up to 1 Gb/sec
-    # For higher data rates, we will probably need to change them.
+    # For higher data rates, high_rate sizes them from the rate
     bwParamMax = 1000
+    bwHighRateMax = 100000
+
+    # With high_rate, bursts must last at least one timer tick
+    # (CONFIG_HZ is 250 for most distribution kernels) and fit
+    # the largest GSO/GRO packet, which can be up to 64 KB
+    shapingHz = 250
+    gsoMaxBytes = 65536
+
+    # RED's bandwidth is in bytes/s and must fit in 32 bits
+    redBwMax = 34000
+
+    # tc batch lines for the qdisc tree we installed, or None if we
+    # don't know what our qdiscs are (e.g. OVS may have changed them)
+    tcTree = None
+    # tree queued by config() while our node is deferring
+    pendingTcTree = None
+
+    def highRateBurst( self, bw ):
+        """Return burst size (bytes) for high rate shaping, which
+           covers a timer tick at rate bw and fits a GSO packet
+           bw: rate in Mb/s"""
+        return max( int( bw * 1e6 / 8 / self.shapingHz ),
+                    2 * self.gsoMaxBytes )
 
     def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
-                latency_ms=None, enable_ecn=False, enable_red=False ):
+                latency_ms=None, enable_ecn=False, enable_red=False,
+                high_rate=False ):
         "Return tc commands to set bandwidth"
 
         cmds, parent = [], ' root '
+        bwMax = self.bwHighRateMax if high_rate else self.bwParamMax
 
-        if bw and ( bw < 0 or bw > self.bwParamMax ):
+        if bw and ( bw < 0 or bw > bwMax ):
             error( 'Bandwidth limit', bw, 'is outside supported range 0..%d'
-                   % self.bwParamMax, '- ignoring\n' )
+                   % bwMax, '- ignoring\n' )
         elif bw is not None:
             # BL: this seems a bit brittle...
             if ( speedup > 0 and
@@ -250,16 +317,24 @@ def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
             # at the semantics of burst (and cburst) to make sure we
             # are specifying the correct sizes. For now I have used
             # the same settings we had in the mininet-hifi code.
+            burst = self.highRateBurst( bw ) if high_rate else 15000
             if use_hfsc:
                 cmds += [ '%s qdisc add dev %s root handle 5:0 hfsc default 1',
                           '%s class add dev %s parent 5:0 classid 5:1 hfsc sc '
                           + 'rate %fMbit ul rate %fMbit' % ( bw, bw ) ]
             elif use_tbf:
                 if latency_ms is None:
-                    latency_ms = 15.0 * 8 / bw
+                    latency_ms = burst * 8.0 / 1000 / bw
                 cmds += [ '%s qdisc add dev %s root handle 5: tbf ' +
-                          'rate %fMbit burst 15000 latency %fms' %
-                          ( bw, latency_ms ) ]
+                          'rate %fMbit burst %d latency %fms' %
+                          ( bw, burst, latency_ms ) ]
+            elif high_rate:
+                # A quantum of one GSO packet keeps HTB from warning
+                # about (or computing) huge quanta at high rates
+                cmds += [ '%s qdisc add dev %s root handle 5:0 htb default 1',
+                          '%s class add dev %s parent 5:0 classid 5:1 htb ' +
+                          'rate %fMbit burst %d cburst %d quantum %d' %
+                          ( bw, burst, burst, self.gsoMaxBytes ) ]
             else:
                 cmds += [ '%s qdisc add dev %s root handle 5:0 htb default 1',
                           '%s class add dev %s parent 5:0 classid 5:1 htb ' +
@@ -267,19 +342,21 @@ def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
             parent = ' parent 5:1 '
 
             # ECN or RED
-            if enable_ecn:
+            if enable_ecn or enable_red:
+                # Thresholds are tuned for 1 Gb/s; at high rates we
+                # scale them so that they stay the same in time
+                scale = ( max( 1.0, float( bw ) / self.bwParamMax )
+                          if high_rate else 1.0 )
+                qmin, qmax = int( 30000 * scale ), int( 35000 * scale )
+                limit = max( 1000000, 4 * qmax )
+                redBurst = 20 if scale == 1 else ( 2 * qmin + qmax ) // 4500
                 cmds += [ '%s qdisc add dev %s' + parent +
-                          'handle 6: red limit 1000000 ' +
-                          'min 30000 max 35000 avpkt 1500 ' +
-                          'burst 20 ' +
-                          'bandwidth %fmbit probability 1 ecn' % bw ]
-                parent = ' parent 6: '
-            elif enable_red:
-                cmds += [ '%s qdisc add dev %s' + parent +
-                          'handle 6: red limit 1000000 ' +
-                          'min 30000 max 35000 avpkt 1500 ' +
-                          'burst 20 ' +
-                          'bandwidth %fmbit probability 1' % bw ]
+                          'handle 6: red limit %d ' % limit +
+                          'min %d max %d avpkt 1500 ' % ( qmin, qmax ) +
+                          'burst %d ' % redBurst +
+                          'bandwidth %fmbit probability 1' %
+                          min( bw, self.redBwMax ) +
+                          ( ' ecn' if enable_ecn else '' ) ]
                 parent = ' parent 6: '
         return cmds, parent
 
@@ -305,6 +382,32 @@ def delayCmds( parent, delay=None, jitter=None,
                 parent = ' parent 10:1 '
         return cmds, parent
 
+    def shapingCmds( self, bw=None, delay=None, jitter=None, loss=None,
+                     speedup=0, use_hfsc=False, use_tbf=False,
+                     latency_ms=None, enable_ecn=False, enable_red=False,
+                     max_queue_size=None, high_rate=False, leaf=None ):
+        """Return tc batch lines for our qdisc tree, and the parent for
+           any further qdiscs (see config() for parameters)"""
+        # Bandwidth limits via various methods
+        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
+                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
+                                      latency_ms=latency_ms,
+                                      enable_ecn=enable_ecn,
+                                      enable_red=enable_red,
+                                      high_rate=high_rate )
+        # Delay/jitter/loss/max_queue_size using netem
+        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
+                                            loss=loss,
+                                            max_queue_size=max_queue_size,
+                                            parent=parent )
+        # Leaf qdisc (e.g. fq or fq_codel) for whatever we've shaped
+        leafcmds = []
+        if leaf and bwcmds + delaycmds:
+            leafcmds = [ '%s qdisc add dev %s' + parent + 'handle 20: ' +
+                         leaf ]
+        return ( [ ( cmd % ( '', self ) ).strip()
+                   for cmd in bwcmds + delaycmds + leafcmds ], parent )
+
     def tc( self, cmd, tc='tc' ):
         "Execute tc command for our interface"
         c = cmd % (tc, self)  # Add in tc command and our name
@@ -312,10 +415,10 @@ def tc( self, cmd, tc='tc' ):
         return self.cmd( c )
 
     def config( self, bw=None, delay=None, jitter=None, loss=None,
-                gro=False, txo=True, rxo=True,
+                gro=False, txo=True, rxo=True, tso=None, gso=None,
                 speedup=0, use_hfsc=False, use_tbf=False,
                 latency_ms=None, enable_ecn=False, enable_red=False,
-                max_queue_size=None, **params ):
+                max_queue_size=None, high_rate=False, leaf=None, **params ):
         """Configure the port and set its properties.
            bw: bandwidth in b/s (e.g. '10m')
            delay: transmit delay (e.g. '1ms' )
@@ -324,13 +427,18 @@ def config( self, bw=None, delay=None, jitter=None, loss=None,
            gro: enable GRO (False)
            txo: enable transmit checksum offload (True)
            rxo: enable receive checksum offload (True)
+           tso: enable TCP segmentation offload (unchanged)
+           gso: enable generic segmentation offload (unchanged)
            speedup: experimental switch-side bw option
            use_hfsc: use HFSC scheduling
            use_tbf: use TBF scheduling
            latency_ms: TBF latency parameter
            enable_ecn: enable ECN (False)
            enable_red: enable RED (False)
-           max_queue_size: queue limit parameter for netem"""
+           max_queue_size: queue limit parameter for netem
+           high_rate: size bursts and quanta from bw, allowing bw up to
+             bwHighRateMax rather than bwParamMax (False)
+           leaf: leaf qdisc, with any options (e.g. 'fq_codel')"""
 
         # Support old names for parameters
         gro = not params.pop( 'disable_gro', not gro )
@@ -342,38 +450,31 @@ def on( isOn ):
             return 'on' if isOn else 'off'
 
         # Set offload parameters with ethool
-        self.cmd( 'ethtool -K', self,
-                  'gro', on( gro ),
-                  'tx', on( txo ),
-                  'rx', on( rxo ) )
+        ethtool = 'ethtool -K %s gro %s tx %s rx %s' % (
+            self, on( gro ), on( txo ), on( rxo ) )
+        for feature, isOn in ( 'tso', tso ), ( 'gso', gso ):
+            if isOn is not None:
+                ethtool += ' %s %s' % ( feature, on( isOn ) )
 
         # Optimization: return if nothing else to configure
         # Question: what happens if we want to reset things?
         if ( bw is None and not delay and not loss
              and max_queue_size is None ):
+            if self.node.deferring():
+                self.node.queueConfig( None, [ ethtool ], tool='sh' )
+            else:
+                self.cmd( ethtool )
             return
 
-        # Clear existing configuration
-        tcoutput = self.tc( '%s qdisc show dev %s' )
-        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
-            cmds = [ '%s qdisc del dev %s root' ]
-        else:
-            cmds = []
-
-        # Bandwidth limits via various methods
-        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
-                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
-                                      latency_ms=latency_ms,
-                                      enable_ecn=enable_ecn,
-                                      enable_red=enable_red )
-        cmds += bwcmds
-
-        # Delay/jitter/loss/max_queue_size using netem
-        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
-                                            loss=loss,
-                                            max_queue_size=max_queue_size,
-                                            parent=parent )
-        cmds += delaycmds
+        # Clear existing configuration. Rather than checking with
+        # tc qdisc show, we delete our root qdisc if we installed one,
+        # and otherwise try to delete it and ignore any error
+        tree, parent = self.shapingCmds(
+            bw=bw, delay=delay, jitter=jitter, loss=loss, speedup=speedup,
+            use_hfsc=use_hfsc, use_tbf=use_tbf, latency_ms=latency_ms,
+            enable_ecn=enable_ecn, enable_red=enable_red,
+            max_queue_size=max_queue_size, high_rate=high_rate, leaf=leaf )
+        lines = [ 'qdisc del dev %s root' % self ] + tree
 
         # Ugly but functional: display configuration info
         stuff = ( ( [ '%.2fMbit' % bw ] if bw is not None else [] ) +
@@ -381,22 +482,135 @@ def on( isOn ):
                   ( [ '%s jitter' % jitter ] if jitter is not None else [] ) +
                   ( ['%.5f%% loss' % loss ] if loss is not None else [] ) +
                   ( [ 'ECN' ] if enable_ecn else [ 'RED' ]
-                    if enable_red else [] ) )
+                    if enable_red else [] ) +
+                  ( [ leaf ] if leaf else [] ) )
         info( '(' + ' '.join( stuff ) + ') ' )
 
-        # Execute all the commands in our node
-        debug("at map stage w/cmds: %s\n" % cmds)
-        tcoutputs = [ self.tc(cmd) for cmd in cmds ]
-        for output in tcoutputs:
-            if output != '':
-                error( "*** Error: %s" % output )
-        debug( "cmds:", cmds, '\n' )
+        # Execute all the commands in our node, using a single
+        # tc -batch process
+        debug("at map stage w/cmds: %s\n" % lines)
+        tcoutputs = self.tcBatch( lines, ethtool )
+        debug( "cmds:", lines, '\n' )
         debug( "outputs:", tcoutputs, '\n' )
         result[ 'tcoutputs'] = tcoutputs
         result[ 'parent' ] = parent
 
         return result
 
+    def tcBatch( self, lines, ethtool ):
+        """Internal method: replace our qdisc tree, and run ethtool
+           lines: tc batch lines, starting with qdisc del
+           ethtool: ethtool command
+           returns: list of tc outputs ('' for success)"""
+        deleting, tree = lines[ 0 ], lines[ 1: ]
+        if self.node.deferring():
+            # We'll know our qdiscs once the node's queue has run
+            # (see configFlushed())
+            self.tcTree, self.pendingTcTree = None, tree
+            # As always, we ignore ethtool errors
+            self.node.queueConfig( None, [ ethtool ], tool='sh' )
+            self.node.queueConfig( None, [ deleting ], tool='tc' )
+            self.queueConfig( 'config', 'tc', *tree, tool='tc' )
+            return [ '' ] * len( lines )
+        if self.tcTree == tree:
+            # Already installed
+            self.cmd( ethtool )
+            return [ '' ] * len( lines )
+        _ethout, tcout = self.node.batchCmd(
+            [ ethtool, batchPipe( 'tc', lines ) ] )
+        outputs = [ '' ] * len( lines )
+        for index, message in batchFailures( tcout ):
+            outputs[ index ] = message
+        # It's fine if there was nothing to delete
+        if not self.tcTree:
+            outputs[ 0 ] = ''
+        for line, output in zip( lines, outputs ):
+            if output:
+                error( "*** Error: tc %s: %s\n" % ( line, output ) )
+        self.tcTree = tree if not any( outputs ) else None
+        return outputs
+
+    def configFlushed( self, failures ):
+        "Record the tree config() queued, if it was installed"
+        tree, self.pendingTcTree = self.pendingTcTree, None
+        origin = '%s.config( tc )' % self
+        if tree is not None and origin not in [ f[ 0 ] for f in failures ]:
+            self.tcTree = tree
+
+    # config() parameters which update() can change
+    shapingParams = ( 'bw', 'delay', 'jitter', 'loss', 'speedup',
+                      'use_hfsc', 'use_tbf', 'latency_ms', 'enable_ecn',
+                      'enable_red', 'max_queue_size', 'high_rate', 'leaf' )
+
+    @staticmethod
+    def tcKey( line ):
+        """Internal method: return the part of a tc batch line which
+           identifies the qdisc or class that it adds, and its kind"""
+        words = line.split()
+        for i, word in enumerate( words ):
+            if word in ( 'handle', 'classid' ):
+                return words[ : i + 3 ]
+        return words
+
+    def shapingTree( self, params ):
+        """Return tc batch lines for our qdisc tree
+           params: config() parameters (others are ignored)"""
+        tree, _parent = self.shapingCmds(
+            **dict( ( name, params[ name ] )
+                    for name in self.shapingParams if name in params ) )
+        return tree
+
+    def changeCmds( self, old, tree, origin ):
+        """Return tc batch lines which change our qdisc tree
+           old: current tree (tc batch lines), or None if unknown
+           tree: new tree
+           origin: description of the caller, for errors
+           returns: list of ( line, origin )"""
+        if old and ( [ self.tcKey( line ) for line in old ] ==
+                     [ self.tcKey( line ) for line in tree ] ):
+            return [ ( line.replace( ' add ', ' change ', 1 ), origin )
+                     for oldLine, line in zip( old, tree )
+                     if oldLine != line ]
+        # Replace our tree; there may be nothing to delete
+        return ( [ ( 'qdisc del dev %s root' % self,
+                     origin if old else None ) ] +
+                 [ ( line, origin ) for line in tree ] )
+
+    def update( self, wait=False, **params ):
+        """Change shaping parameters in place. If our qdisc tree keeps
+           its shape, we use tc change on the qdiscs and classes whose
+           parameters differ, so queued packets aren't dropped;
+           otherwise we replace our tree.
+           params: shaping parameters (see config())
+           wait: run tc and wait for it, rather than using our node's
+             tc process (see Node.tcSend()) and returning immediately
+           returns: list of ( origin, command, message ) for errors
+             (reported so far, if not waiting)"""
+        for name in params:
+            if name not in self.shapingParams:
+                raise Exception( 'update: unknown parameter %s' % name )
+        self.params.update( params )
+        tree = self.shapingTree( self.params )
+        origin = '%s.update()' % self
+        if origin in self.node.tcFailed:
+            # An earlier update failed, so we don't know our qdiscs
+            self.node.tcFailed.discard( origin )
+            self.tcTree = None
+        old, self.tcTree = self.tcTree, tree
+        lines = self.changeCmds( old, tree, origin )
+        if not lines:
+            return []
+        if wait:
+            output = self.cmd( batchPipe( 'tc', [ l for l, _o in lines ] ) )
+            failures = self.node.batchResults( 'tc', lines, output )
+        else:
+            failures = self.node.tcSend( lines )
+        if origin in [ f[ 0 ] for f in failures ]:
+            # We don't know what our qdiscs are now
+            self.node.tcFailed.discard( origin )
+            self.tcTree = None
+        return failures
+
 
 class Link( object ):
 
@@ -476,6 +690,10 @@ def intfName( self, node, n ):
         assert self
         return node.name + '-eth' + repr( n )
 
+    # Function to create veth pairs, with the interface of
+    # util.makeIntfPair(); netlink.makeIntfPair() avoids running ip
+    intfPairFn = staticmethod( makeIntfPair )
+
     @classmethod
     def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
                       node1=None, node2=None, deleteIntfs=True ):
@@ -489,9 +707,18 @@ def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
            (override this method [and possibly delete()]
            to change link type)"""
         # Leave this as a class method for now
-        assert cls
-        return makeIntfPair( intfname1, intfname2, addr1, addr2, node1, node2,
-                             deleteIntfs=deleteIntfs )
+        return cls.intfPairFn( intfname1, intfname2, addr1, addr2,
+                               node1, node2, deleteIntfs=deleteIntfs )
+
+    def update( self, **params ):
+        """Change shaping parameters of our TCIntfs in place
+           (see TCIntf.update())
+           returns: list of ( origin, command, message ) for errors"""
+        failures = []
+        for intf in self.intf1, self.intf2:
+            if isinstance( intf, TCIntf ):
+                failures += intf.update( **params )
+        return failures
 
     def delete( self ):
         "Delete this link"
@@ -544,7 +771,8 @@ def makeIntfPair( self, *args, **kwargs ):
         if self.isPatchLink:
             return None, None
         else:
-            return Link.makeIntfPair( *args, **kwargs )
+            # Use our class's intfPairFn
+            return super( OVSLink, self ).makeIntfPair( *args, **kwargs )
 
 
 class TCLink( Link ):
@@ -574,3 +802,68 @@ class TCULink( TCLink ):
     def __init__( self, *args, **kwargs ):
         kwargs.update( txo=False, rxo=False )
         TCLink.__init__( self, *args, **kwargs )
+
+
+class PerfIntf( TCIntf ):
+    """TCIntf whose offloads default to throughput rather than
+       fidelity: GRO (which also puts a veth into NAPI mode, so that
+       its receive work is spread across CPUs), TSO and GSO are on.
+       An XDP program may also be attached; one which just returns
+       XDP_PASS enables NAPI on kernels too old for GRO to do so."""
+
+    def setXDP( self, obj, section='xdp' ):
+        """Attach an XDP program to our interface
+           obj: BPF object file
+           section: section of obj containing the program"""
+        cmd = 'link set dev %s xdp obj %s sec %s' % ( self, obj, section )
+        if self.deferring():
+            return self.queueConfig( 'setXDP', obj, cmd )
+        output = self.cmd( 'ip', cmd )
+        if output:
+            error( "Error attaching XDP program %s to %s: %s" %
+                   ( obj, self, output ) )
+        return output
+
+    def config( self, gro=True, tso=True, gso=True, xdp=None,
+                xdpSection='xdp', **params ):
+        """Configure the port and set its properties.
+           gro: enable GRO (True)
+           tso: enable TCP segmentation offload (True)
+           gso: enable generic segmentation offload (True)
+           xdp: XDP object file to attach (optional)
+           xdpSection: section of xdp containing the program ('xdp')
+           other parameters: see TCIntf.config()"""
+        result = TCIntf.config( self, gro=gro, tso=tso, gso=gso, **params )
+        if xdp:
+            self.setXDP( xdp, xdpSection )
+        return result
+
+
+class PerfLink( Link ):
+    """Link for bandwidth-heavy experiments: veths with a tx and rx
+       queue per CPU and a jumbo MTU, and PerfIntfs configured via
+       opts (including TCIntf shaping parameters)"""
+
+    def __init__( self, node1, node2, port1=None, port2=None,
+                  intfName1=None, intfName2=None, addr1=None, addr2=None,
+                  mtu=9000, queues=None, **params ):
+        """mtu: MTU for both interfaces
+           queues: tx and rx queues for each interface (default: one
+             per CPU core)
+           params: PerfIntf parameters"""
+        self.mtu = mtu
+        self.queues = queues or numCores() or 1
+        Link.__init__( self, node1, node2, port1=port1, port2=port2,
+                       intfName1=intfName1, intfName2=intfName2,
+                       cls1=PerfIntf,
+                       cls2=PerfIntf,
+                       addr1=addr1, addr2=addr2,
+                       params1=params,
+                       params2=params )
+
+    def makeIntfPair( self, intfname1, intfname2, addr1=None, addr2=None,
+                      node1=None, node2=None, deleteIntfs=True ):
+        "Create pair of interfaces with our MTU and queues"
+        return self.intfPairFn( intfname1, intfname2, addr1, addr2,
+                                node1, node2, deleteIntfs=deleteIntfs,
+                                mtu=self.mtu, queues=self.queues )
@@ -0,0 +1,156 @@
+"""
+linktrace.py: trace-driven link emulation
+
+A LinkTracePlayer replays time series of link parameters (bandwidth,
+delay, loss, etc.) on many TCLinks at once. The tc changes for every
+step are computed in advance (see TCIntf.changeCmds()), so that
+playing a step only means writing them to each node's tc process
+(see Node.tcSend()). Steps are scheduled against a monotonic clock
+rather than by sleeping between steps, so errors don't accumulate,
+and play() reports how late each step was actually applied.
+
+Example:
+
+    trace = loadTrace( 'lte.trace' )
+    player = LinkTracePlayer( { net.linksBetween( h1, s1 )[ 0 ]: trace } )
+    stats = player.play()
+
+Trace files have one step per line, with fields separated by
+whitespace or commas:
+
+    # time (s)  bw (Mbit/s)  delay (ms)  loss (%)
+    0.0         10           20          0
+    0.5         8            25          -
+
+where '-' leaves a parameter unchanged; missing trailing fields
+are also left unchanged.
+"""
+
+import re
+from time import sleep
+
+from mininet.log import info, error
+from mininet.link import Link, TCIntf
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+
+# Trace file columns after the timestamp, and their conversions
+traceFields = ( ( 'bw', float ),
+                ( 'delay', lambda ms: '%gms' % float( ms ) ),
+                ( 'loss', float ) )
+
+def loadTrace( filename ):
+    """Load a link trace from a file (see module docstring)
+       filename: trace file name
+       returns: list of ( time (s), params ) for LinkTracePlayer"""
+    trace = []
+    with open( filename ) as f:
+        for lineno, line in enumerate( f, 1 ):
+            fields = re.split( r'[\s,]+', line.split( '#' )[ 0 ].strip() )
+            if not fields[ 0 ]:
+                continue
+            try:
+                params = dict( ( name, convert( value ) )
+                               for ( name, convert ), value
+                               in zip( traceFields, fields[ 1: ] )
+                               if value != '-' )
+                trace.append( ( float( fields[ 0 ] ), params ) )
+            except ValueError:
+                error( '%s:%d: bad trace line: %s\n' %
+                       ( filename, lineno, line.strip() ) )
+    return trace
+
+
+class LinkTracePlayer( object ):
+    "Replay link parameter traces on TCIntfs"
+
+    def __init__( self, traces ):
+        """traces: dict of Link or TCIntf -> trace, where a trace is a
+             list of ( time (s), params ) and params are TCIntf.update()
+             parameters; a Link's trace is applied to both of its
+             TCIntfs"""
+        self.final = {}  # intf -> ( params, tree ) after last step
+        self.steps = self.schedule( traces )
+
+    @staticmethod
+    def tcIntfs( target ):
+        "Return TCIntfs of a Link or TCIntf"
+        if isinstance( target, Link ):
+            return [ intf for intf in ( target.intf1, target.intf2 )
+                     if isinstance( intf, TCIntf ) ]
+        return [ target ]
+
+    def schedule( self, traces ):
+        """Compute the tc changes for each step of traces
+           traces: dict of Link or TCIntf -> trace
+           returns: sorted list of ( time, { node: tc batch lines } )"""
+        steps = {}
+        for target, trace in traces.items():
+            for intf in self.tcIntfs( target ):
+                params, tree = dict( intf.params ), intf.tcTree
+                origin = '%s trace' % intf
+                for time, change in sorted( trace, key=lambda s: s[ 0 ] ):
+                    params.update( change )
+                    newTree = intf.shapingTree( params )
+                    lines = intf.changeCmds( tree, newTree, origin )
+                    tree = newTree
+                    if lines:
+                        nodeLines = steps.setdefault( time, {} )
+                        nodeLines.setdefault( intf.node, [] ).extend( lines )
+                self.final[ intf ] = ( params, tree )
+        return sorted( steps.items(), key=lambda s: s[ 0 ] )
+
+    def play( self, settle=.1 ):
+        """Apply each step's changes at its scheduled time
+           settle: time (s) to wait for tc errors after the last step
+           returns: dict of steps, mean, p99 and max lateness (s)
+             and failures, a list of ( origin, command, message )"""
+        info( '*** Playing %d trace steps\n' % len( self.steps ) )
+        nodes = set( intf.node for intf in self.final )
+        for node in nodes:
+            node.tcStart()
+        lateness, failures = [], []
+        start = monotonic()
+        for time, nodeLines in self.steps:
+            wait = start + time - monotonic()
+            if wait > 0:
+                sleep( wait )
+            # We check for errors at the end, to keep steps fast
+            for node, lines in nodeLines.items():
+                node.tcSend( lines, check=False )
+            lateness.append( monotonic() - start - time )
+        # Update our intfs' state, as update() would have
+        sleep( settle )
+        for node in nodes:
+            failures += node.tcErrors()
+        failed = set( origin for origin, _cmd, _msg in failures )
+        for intf, ( params, tree ) in self.final.items():
+            intf.params.update( params )
+            origin = '%s trace' % intf
+            intf.tcTree = None if origin in failed else tree
+            intf.node.tcFailed.discard( origin )
+        stats = self.latenessStats( lateness )
+        stats[ 'failures' ] = failures
+        info( '*** %d steps: lateness mean %.3fms, p99 %.3fms, '
+              'max %.3fms; %d tc errors\n' %
+              ( stats[ 'steps' ], stats[ 'mean' ] * 1e3,
+                stats[ 'p99' ] * 1e3, stats[ 'max' ] * 1e3,
+                len( failures ) ) )
+        return stats
+
+    @staticmethod
+    def latenessStats( lateness ):
+        """Return statistics for a list of step lateness values
+           returns: dict of steps, mean, p99 and max"""
+        if not lateness:
+            return { 'steps': 0, 'mean': 0, 'p99': 0, 'max': 0 }
+        ordered = sorted( lateness )
+        return { 'steps': len( ordered ),
+                 'mean': sum( ordered ) / len( ordered ),
+                 'p99': ordered[ int( .99 * ( len( ordered ) - 1 ) ) ],
+                 'max': ordered[ -1 ] }
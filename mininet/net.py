@@ -92,19 +92,23 @@
 import signal
 import random
 
-from time import sleep
+from collections import deque
+from time import sleep, time as now
 from itertools import chain, groupby
 from math import ceil
 
 from mininet.cli import CLI
 from mininet.log import info, error, debug, output, warn
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
-                           Controller )
+                           Controller, CPULimitedHost )
 from mininet.nodelib import NAT
 from mininet.link import Link, Intf
+from mininet.pinger import Pinger, PingStats
+from mininet.sampler import ResourceSampler
+from mininet.trafficmatrix import TrafficMatrix, patterns
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
                            macColonHex, ipStr, ipParse, netParse, ipAdd,
-                           waitListening, BaseString )
+                           waitListening, BaseString, decode )
 from mininet.term import cleanUpScreens, makeTerms
 
 # Mininet version: should be consistent with README and LICENSE
@@ -118,7 +122,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False, bulkStart=False,
+                  deferConfig=False ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -135,7 +140,10 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            autoStaticArp: set all-pairs static MAC addrs?
            autoPinCpus: pin hosts to (real) cores (requires CPULimitedHost)?
            listenPort: base listening port to open; will be incremented for
-               each additional switch in the net if inNamespace=False"""
+               each additional switch in the net if inNamespace=False
+           bulkStart: start all node shells at once in buildFromTopo?
+           deferConfig: queue interface, route and ARP configuration
+               during build() and run it with one ip -batch per node?"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -157,13 +165,17 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.nextCore = 0  # next core for pinning hosts to CPUs
         self.listenPort = listenPort
         self.waitConn = waitConnected
+        self.bulkStart = bulkStart
+        self.deferConfig = deferConfig
 
         self.hosts = []
         self.switches = []
         self.controllers = []
         self.links = []
+        self.pairToLinks = {}  # frozenset( node1, node2 ) to links
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
+        self.nameToList = {}  # name to list (e.g. self.hosts) of node
 
         self.terms = []  # list of spawned xterm processes
 
@@ -226,6 +238,7 @@ def addHost( self, name, cls=None, **params ):
         h = cls( name, **defaults )
         self.hosts.append( h )
         self.nameToNode[ name ] = h
+        self.nameToList[ name ] = self.hosts
         return h
 
     def delNode( self, node, nodes=None):
@@ -233,14 +246,12 @@ def delNode( self, node, nodes=None):
            node: node to delete
            nodes: optional list to delete from (e.g. self.hosts)"""
         if nodes is None:
-            nodes = ( self.hosts if node in self.hosts else
-                      ( self.switches if node in self.switches else
-                        ( self.controllers if node in self.controllers else
-                          [] ) ) )
+            nodes = self.nameToList.get( node.name, [] )
         node.stop( deleteIntfs=True )
         node.terminate()
         nodes.remove( node )
         del self.nameToNode[ node.name ]
+        self.nameToList.pop( node.name, None )
 
     def delHost( self, host ):
         "Delete a host"
@@ -262,6 +273,7 @@ def addSwitch( self, name, cls=None, **params ):
             self.listenPort += 1
         self.switches.append( sw )
         self.nameToNode[ name ] = sw
+        self.nameToList[ name ] = self.switches
         return sw
 
     def delSwitch( self, switch ):
@@ -287,6 +299,7 @@ def addController( self, name='c0', controller=None, **params ):
         if controller_new:  # allow controller-less setups
             self.controllers.append( controller_new )
             self.nameToNode[ name ] = controller_new
+            self.nameToList[ name ] = self.controllers
         return controller_new
 
     def delController( self, controller ):
@@ -399,19 +412,26 @@ def addLink( self, node1, node2, port1=None, port2=None,
         cls = self.link if cls is None else cls
         link = cls( node1, node2, **options )
         self.links.append( link )
+        self.pairToLinks.setdefault(
+            frozenset( ( link.intf1.node, link.intf2.node ) ), [] ).append(
+                link )
         return link
 
     def delLink( self, link ):
         "Remove a link from this network"
+        pair = frozenset( ( link.intf1.node, link.intf2.node ) )
         link.delete()
         self.links.remove( link )
+        links = self.pairToLinks.get( pair, [] )
+        if link in links:
+            links.remove( link )
+        if not links:
+            self.pairToLinks.pop( pair, None )
 
     def linksBetween( self, node1, node2 ):
         "Return Links between node1 and node2"
-        return [ link for link in self.links
-                 if ( node1, node2 ) in (
-                    ( link.intf1.node, link.intf2.node ),
-                    ( link.intf2.node, link.intf1.node ) ) ]
+        return list( self.pairToLinks.get( frozenset( ( node1, node2 ) ),
+                                            [] ) )
 
     def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
         """Delete link(s) between node1 and node2
@@ -468,9 +488,15 @@ def buildFromTopo( self, topo=None ):
                 else:
                     self.addController( 'c%d' % i, cls )
 
+        # In bulk start mode, we spawn every node's shell and then
+        # wait for all of their prompts together
+        bulkParams = { 'waitStart': False } if self.bulkStart else {}
+
         info( '*** Adding hosts:\n' )
         for hostName in topo.hosts():
-            self.addHost( hostName, **topo.nodeInfo( hostName ) )
+            params = dict( bulkParams )
+            params.update( topo.nodeInfo( hostName ) )
+            self.addHost( hostName, **params )
             info( hostName + ' ' )
 
         info( '\n*** Adding switches:\n' )
@@ -480,9 +506,19 @@ def buildFromTopo( self, topo=None ):
             cls = params.get( 'cls', self.switch )
             if hasattr( cls, 'batchStartup' ):
                 params.setdefault( 'batch', True )
+            params = dict( bulkParams, **params )
             self.addSwitch( switchName, **params )
             info( switchName + ' ' )
 
+        if self.bulkStart:
+            info( '\n*** Waiting for node shells to start\n' )
+            Node.waitShells( self.hosts + self.switches )
+
+        if self.deferConfig:
+            # Queue link configuration, which build() will flush
+            for node in self.controllers + self.switches + self.hosts:
+                node.deferConfig()
+
         info( '\n*** Adding links:\n' )
         for srcName, dstName, params in topo.links(
                 sort=True, withInfo=True ):
@@ -500,6 +536,9 @@ def build( self ):
         "Build mininet."
         if self.topo:
             self.buildFromTopo( self.topo )
+        if self.deferConfig:
+            for node in self.controllers + self.switches + self.hosts:
+                node.deferConfig()
         if self.inNamespace:
             self.configureControlNetwork()
         info( '*** Configuring hosts\n' )
@@ -508,8 +547,25 @@ def build( self ):
             self.startTerms()
         if self.autoStaticArp:
             self.staticArp()
+        if self.deferConfig:
+            self.flushConfig()
         self.built = True
 
+    def flushConfig( self ):
+        """Run each node's queued configuration commands
+           (see Node.deferConfig())
+           returns: dict of node -> list of failures, for nodes
+             with failed commands"""
+        info( '*** Applying deferred configuration\n' )
+        nodes = self.controllers + self.switches + self.hosts
+        # Create every queued veth pair before configuring any of them
+        failures = Node.flushIntfPairs( nodes )
+        for node in nodes:
+            nodeFailures = failures.get( node, [] ) + node.flushConfig()
+            if nodeFailures:
+                failures[ node ] = nodeFailures
+        return failures
+
     def startTerms( self ):
         "Start a terminal for each node."
         if 'DISPLAY' not in os.environ:
@@ -530,9 +586,17 @@ def stopXterms( self ):
     def staticArp( self ):
         "Add all-pairs ARP entries to remove the need to handle broadcast."
         for src in self.hosts:
+            # Queue each host's entries and add them with a single
+            # ip -batch, unless they are queued for a deferred build
+            deferring = src.deferring()
+            if not deferring:
+                src.deferConfig()
             for dst in self.hosts:
-                if src != dst:
-                    src.setARP( ip=dst.IP(), mac=dst.MAC() )
+                # Skip hosts without addresses (e.g. ip=None)
+                if dst != src and dst.IP() and dst.MAC():
+                    src.setARP( dst.IP(), dst.MAC() )
+            if not deferring:
+                src.flushConfig()
 
     def start( self ):
         "Start controller and switches."
@@ -627,6 +691,89 @@ def monitor( self, hosts=None, timeoutms=-1 ):
             if not ready and timeoutms >= 0:
                 yield None, None
 
+    def pcmd( self, cmd, nodes=None, maxActive=None, timeout=None,
+              interruptTimeout=1, timedOut=None ):
+        """Run commands on a set of nodes in parallel using their shells.
+           cmd: command string, dict of node -> command string,
+                or function returning the command string for a node
+           nodes: nodes to run on (default: cmd's nodes if cmd is a dict,
+                  otherwise all hosts); each node runs one command,
+                  however many times it is listed
+           maxActive: maximum number of commands to run at once
+                      (default: no limit)
+           timeout: per-node timeout in seconds; commands which time
+                    out are interrupted (default: wait indefinitely)
+           interruptTimeout: time (s) to wait for interrupted commands
+                             to exit; we give up on nodes whose commands
+                             are still running, leaving them waiting
+           timedOut: optional list to which we append the nodes whose
+                     commands timed out
+           returns: dict of node -> output"""
+        if nodes is None:
+            nodes = list( cmd ) if isinstance( cmd, dict ) else self.hosts
+        if isinstance( cmd, dict ):
+            cmdFor = cmd.get
+        elif callable( cmd ):
+            cmdFor = cmd
+        else:
+            cmdFor = lambda _node: cmd
+        # A node's shell can only run one command at a time
+        seen = set()
+        nodes = [ node for node in nodes
+                  if not ( node in seen or seen.add( node ) ) ]
+        if timedOut is None:
+            timedOut = []
+        waiting = deque( nodes )
+        active = {}  # fd -> node
+        deadlines = {}  # node -> time at which to interrupt or give up
+        interrupted = set()
+        outputs = dict( ( node, [] ) for node in nodes )
+        poller = select.poll()
+        while waiting or active:
+            # Start as many commands as we are allowed to
+            while waiting and ( not maxActive or len( active ) < maxActive ):
+                node = waiting.popleft()
+                node.sendCmd( cmdFor( node ) )
+                fd = node.stdout.fileno()
+                active[ fd ] = node
+                poller.register( fd, select.POLLIN )
+                if timeout is not None:
+                    deadlines[ node ] = now() + timeout
+            # Wait for output until the next deadline
+            timeoutms = None
+            if deadlines:
+                nextDeadline = min( deadlines.values() )
+                timeoutms = max( 0, int( ( nextDeadline - now() ) * 1000 ) )
+            for fd, _event in poller.poll( timeoutms ):
+                node = active[ fd ]
+                outputs[ node ].append( node.monitorBytes( timeoutms=0 ) )
+                if not node.waiting:
+                    poller.unregister( fd )
+                    del active[ fd ]
+                    deadlines.pop( node, None )
+            # Interrupt commands which have run out of time, and give
+            # up on those which ignored the interrupt
+            current = now()
+            for node, deadline in list( deadlines.items() ):
+                if deadline > current:
+                    continue
+                if node in interrupted:
+                    warn( '*** pcmd: %s still busy after interrupt, '
+                          'giving up\n' % node )
+                    fd = node.stdout.fileno()
+                    poller.unregister( fd )
+                    del active[ fd ]
+                    del deadlines[ node ]
+                else:
+                    warn( '*** pcmd: %s timed out after %ss\n' %
+                          ( node, timeout ) )
+                    node.sendInt()
+                    interrupted.add( node )
+                    deadlines[ node ] = current + interruptTimeout
+                    timedOut.append( node )
+        return dict( ( node, decode( b''.join( output ) ) )
+                     for node, output in outputs.items() )
+
     # XXX These test methods should be moved out of this class.
     # Probably we should create a tests.py for them
 
@@ -645,12 +792,23 @@ def _parsePing( pingOutput ):
         sent, received = int( m.group( 1 ) ), int( m.group( 2 ) )
         return sent, received
 
-    def ping( self, hosts=None, timeout=None ):
+    def ping( self, hosts=None, timeout=None, parallel=False ):
         """Ping between all specified hosts.
            hosts: list of hosts
            timeout: time to wait for a response, as string
+           parallel: ping all pairs at once (see pingParallel())
            returns: ploss packet loss percentage"""
         # should we check if running?
+        if parallel:
+            pinger = self.pingParallel( hosts, timeout )
+            ploss = pinger.ploss()
+            if ploss is None:
+                output( "*** Warning: No packets sent\n" )
+                return 0
+            sent, received = pinger.totals()
+            output( "*** Results: %i%% dropped (%d/%d received)\n" %
+                    ( ploss, received, sent ) )
+            return ploss
         packets = 0
         lost = 0
         ploss = None
@@ -720,17 +878,37 @@ def _parsePingFull( pingOutput ):
         rttdev = float( m.group( 4 ) )
         return sent, received, rttmin, rttavg, rttmax, rttdev
 
-    def pingFull( self, hosts=None, timeout=None ):
+    @staticmethod
+    def _parsePingRtts( pingOutput ):
+        "Parse ping output and return the RTT (ms) of each reply."
+        return [ float( rtt ) for rtt in
+                 re.findall( r'time=(\d+(?:\.\d+)?) ms', pingOutput ) ]
+
+    def pingFull( self, hosts=None, timeout=None, parallel=False, count=1,
+                  export=None ):
         """Ping between all specified hosts and return all data.
            hosts: list of hosts
            timeout: time to wait for a response, as string
+           parallel: ping all pairs at once (see pingParallel())
+           count: number of pings between each pair of hosts; if more
+             than one, we also show RTT percentiles
+           export: file to save RTT samples and statistics to
+             (.npz or CSV; see PingStats.export())
            returns: all ping data; see function body."""
         # should we check if running?
         # Each value is a tuple: (src, dsd, [all ping outputs])
         all_outputs = []
-        if not hosts:
-            hosts = self.hosts
-            output( '*** Ping: testing ping reachability\n' )
+        if parallel:
+            stats = self.pingParallel( hosts, timeout, count=count )
+            hosts = []
+            all_outputs = [ ( src, dest, stats.stats( src, dest ) )
+                            for src in stats.hosts for dest in stats.hosts
+                            if src != dest ]
+        else:
+            if not hosts:
+                hosts = self.hosts
+                output( '*** Ping: testing ping reachability\n' )
+            stats = PingStats( hosts )
         for node in hosts:
             output( '%s -> ' % node.name )
             for dest in hosts:
@@ -738,10 +916,16 @@ def pingFull( self, hosts=None, timeout=None ):
                     opts = ''
                     if timeout:
                         opts = '-W %s' % timeout
-                    result = node.cmd( 'ping -c1 %s %s' % (opts, dest.IP()) )
+                    result = node.cmd( 'ping -c%d %s %s' %
+                                       ( count, opts, dest.IP() ) )
                     outputs = self._parsePingFull( result )
                     sent, received, rttmin, rttavg, rttmax, rttdev = outputs
                     all_outputs.append( (node, dest, outputs) )
+                    rtts = self._parsePingRtts( result )
+                    for rtt in rtts:
+                        stats.add( node, dest, rtt )
+                    for _lost in range( sent - len( rtts ) ):
+                        stats.add( node, dest )
                     output( ( '%s ' % dest.name ) if received else 'X ' )
             output( '\n' )
         output( "*** Results: \n" )
@@ -749,14 +933,54 @@ def pingFull( self, hosts=None, timeout=None ):
             src, dest, ping_outputs = outputs
             sent, received, rttmin, rttavg, rttmax, rttdev = ping_outputs
             output( " %s->%s: %s/%s, " % (src, dest, sent, received ) )
-            output( "rtt min/avg/max/mdev %0.3f/%0.3f/%0.3f/%0.3f ms\n" %
+            output( "rtt min/avg/max/mdev %0.3f/%0.3f/%0.3f/%0.3f ms" %
                     (rttmin, rttavg, rttmax, rttdev) )
+            if count > 1:
+                values = stats.percentiles( src, dest )
+                output( ", %s %s ms" % (
+                    '/'.join( 'p%g' % p for p in stats.percentileList ),
+                    '/'.join( '-' if v is None else '%0.3f' % v
+                              for v in values ) ) )
+            output( '\n' )
+        if export:
+            stats.export( export )
         return all_outputs
 
-    def pingAll( self, timeout=None ):
+    def pingParallel( self, hosts=None, timeout=None, count=1,
+                      concurrency=None ):
+        """Ping between all specified hosts in parallel using a Pinger,
+           and show which destinations each host could reach
+           hosts: list of hosts (default: all hosts)
+           timeout: time to wait for each response, in seconds
+             (default: 1)
+           count: number of pings between each pair of hosts
+           concurrency: maximum number of pings in flight
+             (default: 256)
+           returns: Pinger, for stats(), ploss() and matrix()"""
+        if not hosts:
+            hosts = self.hosts
+            output( '*** Ping: testing ping reachability\n' )
+        params = { 'count': count }
+        if timeout:
+            params.update( timeout=float( timeout ) )
+        if concurrency:
+            params.update( concurrency=concurrency )
+        pinger = Pinger( hosts, **params )
+        pinger.run()
+        for node in hosts:
+            output( '%s -> ' % node.name )
+            for dest in hosts:
+                if node != dest:
+                    received = pinger.stats( node, dest )[ 1 ]
+                    output( ( '%s ' % dest.name ) if received else 'X ' )
+            output( '\n' )
+        return pinger
+
+    def pingAll( self, timeout=None, parallel=False ):
         """Ping between all hosts.
+           parallel: ping all pairs at once (see pingParallel())
            returns: ploss packet loss percentage"""
-        return self.ping( timeout=timeout )
+        return self.ping( timeout=timeout, parallel=parallel )
 
     def pingPair( self ):
         """Ping between first two hosts, useful for testing.
@@ -764,10 +988,14 @@ def pingPair( self ):
         hosts = [ self.hosts[ 0 ], self.hosts[ 1 ] ]
         return self.ping( hosts=hosts )
 
-    def pingAllFull( self ):
+    def pingAllFull( self, parallel=False, count=1, export=None ):
         """Ping between all hosts.
+           parallel: ping all pairs at once (see pingParallel())
+           count: number of pings between each pair of hosts
+           export: file to save RTT statistics to (see pingFull())
            returns: ploss packet loss percentage"""
-        return self.pingFull()
+        return self.pingFull( parallel=parallel, count=count,
+                              export=export )
 
     def pingPairFull( self ):
         """Ping between first two hosts, useful for testing.
@@ -842,11 +1070,64 @@ def iperf( self, hosts=None, l4Type='TCP', udpBw='10M', fmt=None,
         output( '*** Results: %s\n' % result )
         return result
 
+    def iperfMatrix( self, pattern='permutation', hosts=None, seconds=5,
+                     l4Type='TCP', udpBw='10M', tool='iperf', port=5001 ):
+        """Run iperf flows between many pairs of hosts at once
+           pattern: all, permutation or incast (see trafficmatrix.py),
+             or a list of ( client, server ) hosts
+           hosts: list of hosts for pattern (default: all hosts)
+           seconds: iperf time to transmit
+           l4Type: string, one of [ TCP, UDP ]
+           udpBw: bandwidth target for UDP flows
+           tool: iperf, iperf3 or trafficgen
+           port: first iperf port on each server
+           returns: results of TrafficMatrix.run()"""
+        if isinstance( pattern, BaseString ):
+            if pattern not in patterns:
+                raise Exception( 'Unknown traffic pattern: %s' % pattern )
+            flows = patterns[ pattern ]( hosts or self.hosts )
+        else:
+            flows = pattern
+        output( '*** Iperf: testing', l4Type, 'bandwidth of', len( flows ),
+                'flows\n' )
+        results = TrafficMatrix( flows, seconds=seconds, l4Type=l4Type,
+                                 udpBw=udpBw, tool=tool, port=port ).run()
+        for flow in results[ 'flows' ]:
+            received, start = flow[ 'received' ], flow[ 'start' ]
+            output( ' %s->%s: %s, %s\n' % (
+                flow[ 'client' ], flow[ 'server' ],
+                'failed' if received is None
+                else '%.2f Mbits/sec' % ( received / 1e6 ),
+                'not started' if start is None
+                else 'started at +%.3fs' % start ) )
+        output( '*** Results: %.2f Mbits/sec total, start skew %.3fs, '
+                '%d failed\n' % ( results[ 'aggregate' ] / 1e6,
+                                   results[ 'skew' ], results[ 'failures' ] ) )
+        return results
+
+    def sampleResources( self, hosts=None, interval=1.0, samples=600 ):
+        """Start sampling hosts' cgroup CPU and memory usage in the
+           background (see sampler.py)
+           hosts: hosts to sample (default: all CPULimitedHosts)
+           interval: time (s) between samples
+           samples: number of samples to keep for each host
+           returns: started ResourceSampler; call its stop() method
+             when done and its series() method to get results"""
+        if hosts is None:
+            hosts = [ h for h in self.hosts
+                      if isinstance( h, CPULimitedHost ) ]
+        sampler = ResourceSampler( hosts, interval=interval,
+                                   samples=samples )
+        sampler.start()
+        return sampler
+
     def runCpuLimitTest( self, cpu, duration=5 ):
         """run CPU limit test with 'while true' processes.
         cpu: desired CPU fraction of each host
         duration: test duration in seconds (integer)
-        returns a single list of measured CPU fractions as floats.
+        returns a single list of measured CPU fractions as floats
+        (without hosts whose usage could not be read, and empty if
+        sampling failed).
         """
         pct = cpu * 100
         info( '*** Testing CPU %.0f%% bandwidth limit\n' % pct )
@@ -854,36 +1135,32 @@ def runCpuLimitTest( self, cpu, duration=5 ):
         cores = int( quietRun( 'nproc' ) )
         # number of processes to run a while loop on per host
         num_procs = int( ceil( cores * cpu ) )
-        pids = {}
-        for h in hosts:
-            pids[ h ] = []
-            for _core in range( num_procs ):
-                h.cmd( 'while true; do a=1; done &' )
-                pids[ h ].append( h.cmd( 'echo $!' ).strip() )
-        outputs = {}
-        time = {}
-        # get the initial cpu time for each host
-        for host in hosts:
-            outputs[ host ] = []
-            with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                       host, 'r' ) as f:
-                time[ host ] = float( f.read() )
-        for _ in range( duration ):
-            sleep( 1 )
-            for host in hosts:
-                with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                           host, 'r' ) as f:
-                    readTime = float( f.read() )
-                outputs[ host ].append( ( ( readTime - time[ host ] )
-                                        / 1000000000 ) / cores * 100 )
-                time[ host ] = readTime
-        for h, pids in pids.items():
-            for pid in pids:
-                h.cmd( 'kill -9 %s' % pid )
+        procs = [ h.popen( [ 'sh', '-c', 'while true; do a=1; done' ] )
+                  for h in hosts for _core in range( num_procs ) ]
+        # sample each host's cpu time at the start and after each second
+        sampler = ResourceSampler( hosts, interval=1, samples=duration + 1 )
+        try:
+            sampler.start()
+            sampled = sampler.waitSamples( duration + 1,
+                                           timeout=duration + 5 )
+        finally:
+            sampler.stop()
+            for proc in procs:
+                proc.kill()
+                proc.wait()
+        if not sampled:
+            error( '*** runCpuLimitTest: only %d of %d samples taken\n'
+                   % ( sampler.count, duration + 1 ) )
+            return []
         cpu_fractions = []
-        for _host, outputs in outputs.items():
-            for pct in outputs:
-                cpu_fractions.append( pct )
+        for host in hosts:
+            usages = sampler.series( host )[ 'cpu' ]
+            if None in usages:
+                error( '*** runCpuLimitTest: cannot read CPU usage of %s '
+                       '(no cpuacct cgroup?)\n' % host )
+                continue
+            for usage in usages:
+                cpu_fractions.append( usage / cores * 100 )
         output( '*** Results: %s\n' % cpu_fractions )
         return cpu_fractions
 
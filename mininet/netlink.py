@@ -0,0 +1,276 @@
+"""
+netlink.py: minimal rtnetlink client for creating veth pairs
+
+makeIntfPair() is a drop-in replacement for mininet.util.makeIntfPair()
+which creates each veth pair, with its names, MAC addresses and network
+namespaces, using a single RTM_NEWLINK message rather than running
+ip link add (and possibly ip link set netns). makeIntfPairs() creates
+many pairs at once, sending their requests in batches and then
+collecting the kernel's replies.
+
+To use it for a link class, set its intfPairFn, or use netlinkLink():
+
+    class NetlinkLink( TCLink ):
+        intfPairFn = staticmethod( makeIntfPair )
+
+    net = Mininet( topo, link=netlinkLink( TCLink ), deferConfig=True )
+
+If both of a pair's nodes are deferring their configuration (see
+Node.deferConfig()), makeIntfPair() queues the pair, and flushing the
+nodes' configuration creates all of their queued pairs together with
+makeIntfPairs(); mn --netlink does this.
+
+Only the Python standard library is required.
+"""
+
+import os
+import socket
+import struct
+
+from mininet.util import encode, setnsFunction, CLONE_NEWNET
+
+# From linux/netlink.h and linux/rtnetlink.h
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+RTM_NEWLINK, RTM_DELLINK = 16, 17
+NLM_F_REQUEST, NLM_F_ACK, NLM_F_EXCL, NLM_F_CREATE = 1, 4, 0x200, 0x400
+# From linux/if_link.h and linux/veth.h
+IFLA_ADDRESS, IFLA_IFNAME, IFLA_MTU = 1, 3, 4
+IFLA_LINKINFO, IFLA_NET_NS_PID = 18, 19
+IFLA_NUM_TX_QUEUES, IFLA_NUM_RX_QUEUES = 31, 32
+IFLA_INFO_KIND, IFLA_INFO_DATA = 1, 2
+VETH_INFO_PEER = 1
+
+NlMsgHdr = struct.Struct( '=IHHII' )  # len, type, flags, seq, pid
+IfInfoMsg = struct.Struct( '=BxHiII' )  # family, type, index, flags, change
+RtAttr = struct.Struct( '=HH' )  # len, type
+NlMsgErr = struct.Struct( '=i' )  # -errno
+U32 = struct.Struct( '=I' )
+
+
+def rtattr( atype, data ):
+    "Return an encoded route attribute, padded to 4 bytes"
+    length = RtAttr.size + len( data )
+    return RtAttr.pack( length, atype ) + data + b'\0' * ( -length % 4 )
+
+
+def macBytes( mac ):
+    "Convert MAC address string xx:xx:xx:xx:xx:xx to bytes"
+    return bytes( bytearray( int( b, 16 ) for b in mac.split( ':' ) ) )
+
+
+def ifInfo( name, addr=None, pid=None, mtu=None, queues=None ):
+    """Return an ifinfomsg and attributes for a new interface
+       name: interface name
+       addr: MAC address (optional)
+       pid: pid of process in target network namespace (optional)
+       mtu: MTU (optional)
+       queues: number of tx and rx queues (optional)"""
+    msg = ( IfInfoMsg.pack( socket.AF_UNSPEC, 0, 0, 0, 0 ) +
+            rtattr( IFLA_IFNAME, encode( name ) + b'\0' ) )
+    if addr:
+        msg += rtattr( IFLA_ADDRESS, macBytes( addr ) )
+    if pid:
+        msg += rtattr( IFLA_NET_NS_PID, U32.pack( pid ) )
+    if mtu:
+        msg += rtattr( IFLA_MTU, U32.pack( mtu ) )
+    if queues:
+        msg += ( rtattr( IFLA_NUM_TX_QUEUES, U32.pack( queues ) ) +
+                 rtattr( IFLA_NUM_RX_QUEUES, U32.pack( queues ) ) )
+    return msg
+
+
+class RtNetlink( object ):
+    "rtnetlink socket which sends requests in batches"
+
+    # Maximum size of a batch of requests; the kernel's replies to
+    # a batch must fit in our receive buffer
+    batchBytes = 32768
+
+    def __init__( self ):
+        self.sock = socket.socket( socket.AF_NETLINK, socket.SOCK_RAW,
+                                   NETLINK_ROUTE )
+        self.sock.bind( ( 0, 0 ) )
+        self.seq = 0
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+    def request( self, mtype, payload, flags=0 ):
+        """Return an encoded request which asks for an ack
+           mtype: message type
+           payload: message payload
+           flags: additional flags
+           returns: seq, request"""
+        self.seq += 1
+        header = NlMsgHdr.pack( NlMsgHdr.size + len( payload ), mtype,
+                                NLM_F_REQUEST | NLM_F_ACK | flags,
+                                self.seq, 0 )
+        return self.seq, header + payload
+
+    def newVeth( self, intf1, intf2, addr1=None, addr2=None,
+                 pid1=None, pid2=None, mtu=None, queues=None ):
+        """Return request to create a veth pair
+           intf1, intf2: interface names
+           addr1, addr2: MAC addresses (optional)
+           pid1, pid2: pids in target namespaces (optional)
+           mtu: MTU for both interfaces (optional)
+           queues: tx and rx queues for both interfaces (optional)
+           returns: seq, request"""
+        peer = rtattr( VETH_INFO_PEER,
+                       ifInfo( intf2, addr2, pid2, mtu, queues ) )
+        linkinfo = ( rtattr( IFLA_INFO_KIND, b'veth' ) +
+                     rtattr( IFLA_INFO_DATA, peer ) )
+        payload = ( ifInfo( intf1, addr1, pid1, mtu, queues ) +
+                    rtattr( IFLA_LINKINFO, linkinfo ) )
+        return self.request( RTM_NEWLINK, payload,
+                             NLM_F_CREATE | NLM_F_EXCL )
+
+    def delLink( self, intf ):
+        """Return request to delete an interface in our namespace
+           intf: interface name
+           returns: seq, request"""
+        return self.request( RTM_DELLINK, ifInfo( intf ) )
+
+    def transact( self, requests ):
+        """Send requests in batches, and wait for the replies to each batch
+           requests: list of ( seq, request )
+           returns: dict of seq -> errno (0 for success)"""
+        results = {}
+        batch, size = [], 0
+        for seq, req in requests:
+            if batch and size + len( req ) > self.batchBytes:
+                self.sendBatch( batch, results )
+                batch, size = [], 0
+            batch.append( ( seq, req ) )
+            size += len( req )
+        if batch:
+            self.sendBatch( batch, results )
+        return results
+
+    def sendBatch( self, batch, results ):
+        """Internal method: send a batch of requests in one datagram
+           and read their acks into results"""
+        self.sock.send( b''.join( req for _seq, req in batch ) )
+        pending = set( seq for seq, _req in batch )
+        while pending:
+            data = self.sock.recv( 65536 )
+            offset = 0
+            while offset + NlMsgHdr.size <= len( data ):
+                length, mtype, _flags, seq, _pid = NlMsgHdr.unpack_from(
+                    data, offset )
+                if mtype == NLMSG_ERROR and seq in pending:
+                    err, = NlMsgErr.unpack_from( data,
+                                                 offset + NlMsgHdr.size )
+                    results[ seq ] = -err
+                    pending.discard( seq )
+                # Messages are aligned to 4 bytes
+                offset += ( length + 3 ) & ~3
+
+
+_rtnl = None
+
+def rtnetlink():
+    "Return our shared RtNetlink socket"
+    global _rtnl  # pylint: disable=global-statement
+    if _rtnl is None:
+        _rtnl = RtNetlink()
+    return _rtnl
+
+
+def nodeRtnetlink( node ):
+    """Return a new RtNetlink socket in node's network namespace,
+       which the caller should close()
+       node: node whose namespace exists"""
+    setns = setnsFunction()
+    rootNet = os.open( '/proc/self/ns/net', os.O_RDONLY )
+    try:
+        setns( node.nsFds()[ 0 ], CLONE_NEWNET )
+        try:
+            return RtNetlink()
+        finally:
+            setns( rootNet, CLONE_NEWNET )
+    finally:
+        os.close( rootNet )
+
+
+def delIntfs( intfs ):
+    """Delete interfaces using rtnetlink, ignoring missing ones
+       intfs: list of ( intf, node ), where node is None for
+         our own namespace"""
+    nodeIntfs = {}
+    for intf, node in intfs:
+        nodeIntfs.setdefault( node, [] ).append( intf )
+    for node, names in nodeIntfs.items():
+        shared = not ( node and node.inNamespace )
+        nl = rtnetlink() if shared else nodeRtnetlink( node )
+        try:
+            nl.transact( [ nl.delLink( name ) for name in names ] )
+        finally:
+            if not shared:
+                nl.close()
+
+
+def makeIntfPairs( pairs, deleteIntfs=False, mtu=None, queues=None ):
+    """Make veth pairs using rtnetlink, creating each pair (including
+       its namespaces and MAC addresses) with a single request.
+       pairs: list of ( intf1, intf2, addr1, addr2, node1, node2 ),
+         where addrs and nodes may be None
+       deleteIntfs: delete existing intfs first
+       mtu: MTU for all interfaces (optional)
+       queues: tx and rx queues for all interfaces (optional)
+       returns: list of error strings, or None for success"""
+    nl = rtnetlink()
+    if deleteIntfs:
+        delIntfs( [ ( intf, node )
+                    for intf1, intf2, _a1, _a2, node1, node2 in pairs
+                    for intf, node in ( ( intf1, node1 ),
+                                        ( intf2, node2 ) ) ] )
+    reqs = [ nl.newVeth( intf1, intf2, addr1, addr2,
+                         node1.pid if node1 else None,
+                         node2.pid if node2 else None, mtu, queues )
+             for intf1, intf2, addr1, addr2, node1, node2 in pairs ]
+    results = nl.transact( reqs )
+    return [ os.strerror( results[ seq ] ) if results[ seq ] else None
+             for seq, _req in reqs ]
+
+
+def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None,
+                  node2=None, deleteIntfs=True, runCmd=None, mtu=None,
+                  queues=None ):
+    """Make a veth pair connnecting new interfaces intf1 and intf2,
+       using rtnetlink rather than ip link
+       intf1: name for interface 1
+       intf2: name for interface 2
+       addr1: MAC address for interface 1 (optional)
+       addr2: MAC address for interface 2 (optional)
+       node1: home node for interface 1 (optional)
+       node2: home node for interface 2 (optional)
+       deleteIntfs: delete intfs before creating them
+       runCmd: unused (we delete intfs with rtnetlink too)
+       mtu: MTU for both interfaces (optional)
+       queues: tx and rx queues for both interfaces (optional)
+       raises Exception on failure"""
+    # pylint: disable=unused-argument
+    if deleteIntfs:
+        delIntfs( [ ( intf1, node1 ), ( intf2, node2 ) ] )
+    if node1 and node2 and node1.deferring() and node2.deferring():
+        # Queue the pair for Node.flushIntfPairs()
+        node1.queueConfig( 'makeIntfPair( %s, %s )' % ( intf1, intf2 ),
+                           [ ( intf1, intf2, addr1, addr2, node1, node2,
+                               mtu, queues ) ], tool='veth' )
+        return
+    err, = makeIntfPairs( [ ( intf1, intf2, addr1, addr2, node1, node2 ) ],
+                          mtu=mtu, queues=queues )
+    if err:
+        raise Exception( "Error creating interface pair (%s,%s): %s " %
+                         ( intf1, intf2, err ) )
+
+
+def netlinkLink( cls ):
+    """Return a subclass of link class cls which creates its veth
+       pairs using rtnetlink
+       cls: link class (e.g. Link or TCLink)"""
+    return type( 'Netlink' + cls.__name__, ( cls, ),
+                 { 'intfPairFn': staticmethod( makeIntfPair ) } )
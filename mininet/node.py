@@ -57,15 +57,24 @@
 import re
 import signal
 import select
-from subprocess import Popen, PIPE
+import socket
+import sys
+from fcntl import fcntl, F_GETFL, F_SETFL, F_SETFD, FD_CLOEXEC
+from codecs import getincrementaldecoder
+from collections import deque
+from subprocess import Popen, PIPE, STDOUT
 from time import sleep
 
 from mininet.log import info, error, warn, debug
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
+                           setnsFunction, CLONE_NEWNET, CLONE_NEWNS,
                            numCores, retry, mountCgroups, BaseString, decode,
-                           encode, Python3 )
+                           encode, Python3, Encoding, ipParse,
+                           batchFailures )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
+from mininet.agent import agentPath, frame, parseFrames, decodeResult, Signal
 from mininet.link import Link, Intf, TCIntf, OVSIntf
+from mininet.netlink import makeIntfPairs
 from re import findall
 from distutils.version import StrictVersion
 
@@ -79,6 +88,15 @@ def __init__( self, name, inNamespace=True, **params ):
         """name: name of node
            inNamespace: in network namespace?
            privateDirs: list of private directory strings or tuples
+           waitStart: wait for shell prompt before returning? (True)
+           lazyShell: hold namespace with mnexec -w and start the
+             shell on first command? (False)
+           netns: register namespaces as netnsDir/name (for ip netns)
+             and mntnsDir/name? (False)
+           setnsPopen: popen() enters our namespaces with setns()
+             in the child rather than exec'ing mnexec? (False)
+           agent: run cmd() using a command agent (see agent.py)
+             rather than our shell where possible? (False)
            params: Node parameters (see config() for details)"""
 
         # Make sure class actually works
@@ -87,6 +105,12 @@ def __init__( self, name, inNamespace=True, **params ):
         self.name = params.get( 'name', name )
         self.privateDirs = params.get( 'privateDirs', [] )
         self.inNamespace = params.get( 'inNamespace', inNamespace )
+        # Name of our registered namespaces, if any
+        self.nsName = ( self.name if self.inNamespace and
+                        params.get( 'netns', False ) else None )
+        if self.nsName and os.path.exists( self.nsPath() ):
+            raise Exception( 'Namespace %s is already registered as %s;'
+                             ' try mn -c' % ( self.nsName, self.nsPath() ) )
 
         # Python 3 complains if we don't wait for shell exit
         self.waitExited = params.get( 'waitExited', Python3 )
@@ -98,18 +122,43 @@ def __init__( self, name, inNamespace=True, **params ):
         self.ports = {}  # dict of interfaces to port numbers
                          # replace with Port objects, eventually ?
         self.nameToIntf = {}  # dict of interface names to Intfs
+        self.topPort = None  # highest port, if it's still in use
 
         # Make pylint happy
         ( self.shell, self.execed, self.pid, self.stdin, self.stdout,
             self.lastPid, self.lastCmd, self.pollOut ) = (
                 None, None, None, None, None, None, None, None )
         self.waiting = False
-        self.readbuf = ''
+        self.starting = False
+        self.readbuf = bytearray()
+        self.decoder = self.newDecoder()
+        # Queued asyncio commands and output of the current one
+        self.aqueue, self.aoutput = deque(), []
+        # Namespace holder process for lazy shell startup, and whether
+        # we still have to mount our private directories in it
+        self.holder, self.mountPending = None, False
+        # Namespace fds held open for setnsPopen
+        self.setnsPopen = params.get( 'setnsPopen', False )
+        self.nsfds = []
+        # Command agent, started on first use
+        self.useAgent = params.get( 'agent', False )
+        self.shellState = False  # has our shell been given state?
+        self.agent, self.agentSock = None, None
+        self.agentBuf, self.agentResults, self.agentId = bytearray(), {}, 0
+        # Queued commands, while deferring configuration
+        self.configQueue = None
+        # tc process for tcSend(), started on first use
+        self.tcProc, self.tcLines, self.tcCount, self.tcOut = (
+            None, None, 0, '' )
+        self.tcFailed = set()  # origins of failed tcSend() lines
 
         # Start command interpreter shell
         self.master, self.slave = None, None  # pylint
-        self.startShell()
-        self.mountPrivateDirs()
+        # Private directories are mounted once the shell has started
+        if params.get( 'lazyShell', False ):
+            self.startHolder()
+        else:
+            self.startShell( waitStart=params.get( 'waitStart', True ) )
 
     # File descriptor to node mapping support
     # Class variables and methods
@@ -125,21 +174,120 @@ def fdToNode( cls, fd ):
         node = cls.outToNode.get( fd )
         return node or cls.inToNode.get( fd )
 
+    # Registered namespace directories (see mnexec -N)
+    netnsDir = '/var/run/netns'
+    mntnsDir = '/var/run/mntns'
+
+    def nsOpts( self, opts ):
+        """Internal method: return mnexec args to create our namespace
+           opts: other mnexec options (e.g. -cd)"""
+        if self.nsName:
+            # Create and register our namespaces by name
+            return [ opts, '-N', self.nsName ]
+        if self.inNamespace:
+            # Create anonymous namespaces
+            opts += 'n'
+        return [ opts ]
+
+    def nsPath( self ):
+        "Return path of our registered network namespace"
+        return '%s/%s' % ( self.netnsDir, self.nsName )
+
+    def nsTarget( self ):
+        "Return mnexec -a argument to attach to our namespace"
+        return self.nsName or str( self.pid )
+
+    def nsFds( self ):
+        """Return fds of our network and mount namespaces,
+           opening them on first use"""
+        if not self.nsfds:
+            if self.nsName:
+                paths = [ self.nsPath(),
+                          '%s/%s' % ( self.mntnsDir, self.nsName ) ]
+            else:
+                paths = [ '/proc/%d/ns/%s' % ( self.pid, ns )
+                          for ns in ( 'net', 'mnt' ) ]
+            for path in paths:
+                fd = os.open( path, os.O_RDONLY )
+                fcntl( fd, F_SETFD, FD_CLOEXEC )
+                self.nsfds.append( fd )
+        return self.nsfds
+
+    def enterNs( self, setns, cwd ):
+        """Internal method: attach a popen() child to our namespaces;
+           replaces mnexec -da
+           setns: setns() function
+           cwd: working directory to return to"""
+        os.setsid()
+        netfd, mntfd = self.nsfds
+        setns( netfd, CLONE_NEWNET )
+        setns( mntfd, CLONE_NEWNS )
+        os.chdir( cwd )
+
+    # Spawn setnsPopen commands by entering our namespaces in the
+    # parent, which lets Python 3 use vfork() rather than fork()
+    # and a (slow) preexec_fn; Python 2's Popen() always forks
+    parentSetns = Python3
+    rootNsFds = []  # our original network and mount namespaces
+
+    def nsPopen( self, cmd, **params ):
+        """Internal method: spawn cmd in our namespaces using setns()
+           cmd: command to run (list)
+           params: parameters to Popen()"""
+        setns, cwd = setnsFunction(), os.getcwd()
+        netfd, mntfd = self.nsFds()
+        if self.parentSetns:
+            if not Node.rootNsFds:
+                Node.rootNsFds = [ os.open( '/proc/self/ns/%s' % ns,
+                                            os.O_RDONLY )
+                                   for ns in ( 'net', 'mnt' ) ]
+            rootNet, rootMnt = Node.rootNsFds
+            setns( netfd, CLONE_NEWNET )
+            try:
+                # Fails if we have threads, so fall back to preexec_fn
+                setns( mntfd, CLONE_NEWNS )
+            except OSError:
+                pass
+            else:
+                try:
+                    os.chdir( cwd )
+                    return self._popen( cmd, start_new_session=True,
+                                        **params )
+                finally:
+                    setns( rootMnt, CLONE_NEWNS )
+                    os.chdir( cwd )
+            finally:
+                setns( rootNet, CLONE_NEWNET )
+        if not Python3:
+            # Python 2 closes fds before calling preexec_fn
+            params.pop( 'close_fds', None )
+        enterNs = lambda: self.enterNs( setns, cwd )
+        return self._popen( cmd, preexec_fn=enterNs, **params )
+
+    def unregisterNs( self ):
+        "Remove our namespaces' registered names"
+        if not self.nsName:
+            return
+        paths = ' '.join( '%s/%s' % ( nsdir, self.nsName )
+                          for nsdir in ( self.netnsDir, self.mntnsDir ) )
+        errRun( 'umount -l %s; rm -f %s' % ( paths, paths ), shell=True )
+
     # Command support via shell process in namespace
-    def startShell( self, mnopts=None ):
-        "Start a shell process for running commands"
+    def startShell( self, mnopts=None, waitStart=True ):
+        """Start a shell process for running commands
+           mnopts: mnexec options (-cd)
+           waitStart: wait for shell prompt? (True); if False,
+             startup is completed by waitStarted() or waitShells()"""
         if self.shell:
             error( "%s: shell is already running\n" % self.name )
             return
         # mnexec: (c)lose descriptors, (d)etach from tty,
         # (p)rint pid, and run in (n)amespace
         opts = '-cd' if mnopts is None else mnopts
-        if self.inNamespace:
-            opts += 'n'
         # bash -i: force interactive
         # -s: pass $* to shell, and make process easy to find in ps
         # prompt is set to sentinel chr( 127 )
-        cmd = [ 'mnexec', opts, 'env', 'PS1=' + chr( 127 ),
+        cmd = [ 'env', 'PS1=' + chr( 127 ),
                 'bash', '--norc', '--noediting',
                 '-is', 'mininet:' + self.name ]
 
@@ -147,13 +295,20 @@ def startShell( self, mnopts=None ):
         # in the subprocess and insulate it from signals (e.g. SIGINT)
         # received by the parent
         self.master, self.slave = pty.openpty()
-        self.shell = self._popen( cmd, stdin=self.slave, stdout=self.slave,
-                                  stderr=self.slave, close_fds=False )
+        if self.holder:
+            # Join the holder's namespaces (and cgroup) via popen()
+            self.shell = self.popen( cmd, stdin=self.slave,
+                                     stdout=self.slave, stderr=self.slave,
+                                     close_fds=True )
+        else:
+            cmd = [ 'mnexec' ] + self.nsOpts( opts ) + cmd
+            self.shell = self._popen( cmd, stdin=self.slave, stdout=self.slave,
+                                      stderr=self.slave, close_fds=False )
+            self.pid = self.shell.pid
         # XXX BL: This doesn't seem right, and we should also probably
         # close our files when we exit...
         self.stdin = os.fdopen( self.master, 'r' )
         self.stdout = self.stdin
-        self.pid = self.shell.pid
         self.pollOut = select.poll()
         self.pollOut.register( self.stdout )
         # Maintain mapping between file descriptors and nodes
@@ -164,42 +319,136 @@ def startShell( self, mnopts=None ):
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
-        self.readbuf = ''
-        # Wait for prompt
-        while True:
-            data = self.read( 1024 )
-            if data[ -1 ] == chr( 127 ):
-                break
+        self.readbuf = bytearray()
+        self.decoder = self.newDecoder()
+        # Until we see the prompt, we are waiting for the shell
+        self.waiting = True
+        self.starting = True
+        if waitStart:
+            self.waitStarted()
+
+    def startHolder( self ):
+        """Create our namespace with a minimal mnexec -w process,
+           deferring the shell until the first command is sent.
+           popen() attaches to the holder, so nodes which are only
+           used via popen() never need a shell or pty."""
+        # (p)rint pid once our namespace exists, then (w)ait; mnexec
+        # ignores our tag, which lets mn -c find stale holders
+        self.holder = self._popen( [ 'mnexec' ] + self.nsOpts( '-cd' ) +
+                                   [ '-pw', 'mininet:' + self.name ],
+                                   stdout=PIPE, close_fds=True )
+        self.holder.stdout.readline()
+        self.holder.stdout.close()
+        self.pid = self.holder.pid
+        # Our shell would mount private directories, so we mount them
+        # in the holder's mount namespace instead, on first use (see
+        # popen()) rather than now, since subclasses' popen() may
+        # depend on setup which follows Node.__init__()
+        self.mountPending = bool( self.privateDirs )
+
+    def lazyStart( self ):
+        """Start our shell if it was deferred by lazyShell
+           returns: True if our shell is running"""
+        if ( not self.shell and self.holder and
+             self.holder.poll() is None ):
+            debug( '*** %s: starting shell on first use\n' % self.name )
+            self.startShell()
+        return self.shell is not None
+
+    # Shell startup command
+    # +m: disable job control notification
+    startCmd = 'unset HISTFILE; stty -echo; set +m'
+
+    def checkPrompt( self, data ):
+        """Internal method: check shell output for initial prompt
+           data: output read from shell
+           returns: True if prompt has been received"""
+        if data and data[ -1 ] == chr( 127 ):
+            self.waiting = False
+            self.starting = False
+        return not self.starting
+
+    def waitStarted( self ):
+        "Wait for shell prompt and complete shell startup"
+        if not self.starting:
+            return
+        while not self.checkPrompt( self.read( 1024 ) ):
             self.pollOut.poll()
-        self.waiting = False
-        # +m: disable job control notification
-        self.cmd( 'unset HISTFILE; stty -echo; set +m' )
+        self.sendCmd( self.startCmd )
+        self.waitOutput()
+        if not self.holder:
+            self.mountPrivateDirs()
+
+    @classmethod
+    def waitShells( cls, nodes ):
+        """Complete startup of nodes started with waitStart=False,
+           polling all of their shells at once rather than
+           waiting for each one in turn.
+           nodes: list of nodes"""
+        starting = [ node for node in nodes if node.shell and node.starting ]
+        poller = select.poll()
+        for node in starting:
+            poller.register( node.stdout )
+        # Each shell prints a prompt, and then we run startCmd
+        pending = len( starting )
+        while pending:
+            for fd, _event in poller.poll():
+                node = cls.fdToNode( fd )
+                if node.starting:
+                    if node.checkPrompt( node.read( 1024 ) ):
+                        node.sendCmd( node.startCmd )
+                    continue
+                node.monitor()
+                if not node.waiting:
+                    poller.unregister( fd )
+                    pending -= 1
+        for node in starting:
+            if not node.holder:
+                node.mountPrivateDirs()
 
     def mountPrivateDirs( self ):
         "mount private directories"
         # Avoid expanding a string into a list of chars
         assert not isinstance( self.privateDirs, BaseString )
+        cmds = []
         for directory in self.privateDirs:
             if isinstance( directory, tuple ):
                 # mount given private directory
                 privateDir = directory[ 1 ] % self.__dict__
                 mountPoint = directory[ 0 ]
-                self.cmd( 'mkdir -p %s' % privateDir )
-                self.cmd( 'mkdir -p %s' % mountPoint )
-                self.cmd( 'mount --bind %s %s' %
-                               ( privateDir, mountPoint ) )
+                cmds += [ 'mkdir -p %s' % privateDir,
+                          'mkdir -p %s' % mountPoint,
+                          'mount --bind %s %s' % ( privateDir, mountPoint ) ]
             else:
                 # mount temporary filesystem on directory
-                self.cmd( 'mkdir -p %s' % directory )
-                self.cmd( 'mount -n -t tmpfs tmpfs %s' % directory )
+                cmds += [ 'mkdir -p %s' % directory,
+                          'mount -n -t tmpfs tmpfs %s' % directory ]
+        if cmds and not self.shell:
+            # Lazy shell: mount from a process in our namespace
+            _out, err, exitcode = self.pexec(
+                [ 'sh', '-c', '; '.join( cmds ) ] )
+            if exitcode:
+                error( '*** %s: error mounting private dirs: %s\n'
+                       % ( self.name, err ) )
+        elif cmds:
+            self.batchCmd( cmds )
 
     def unmountPrivateDirs( self ):
         "mount private directories"
+        if self.mountPending:
+            # Never mounted
+            self.mountPending = False
+            return
+        cmds = []
         for directory in self.privateDirs:
             if isinstance( directory, tuple ):
-                self.cmd( 'umount ', directory[ 0 ] )
+                cmds.append( 'umount %s' % directory[ 0 ] )
             else:
-                self.cmd( 'umount ', directory )
+                cmds.append( 'umount %s' % directory )
+        if cmds and not self.shell:
+            self.pexec( [ 'sh', '-c', '; '.join( cmds ) ] )
+        elif cmds:
+            self.batchCmd( cmds )
 
     def _popen( self, cmd, **params ):
         """Internal method: spawn and return a process
@@ -223,37 +472,64 @@ def cleanup( self ):
             self.stdin.close()
             os.close(self.slave)
             if self.waitExited:
-                debug( 'waiting for', self.pid, 'to terminate\n' )
+                debug( 'waiting for', self.shell.pid, 'to terminate\n' )
                 self.shell.wait()
+        if self.holder and self.waitExited:
+            self.holder.wait()
+        if self.agent and self.waitExited:
+            self.agent.wait()
+        if self.tcProc and self.waitExited:
+            self.tcProc.wait()
+        for fd in self.nsfds:
+            os.close( fd )
+        self.nsfds = []
         self.shell = None
 
     # Subshell I/O, commands and control
 
+    # Maximum number of bytes to read from our shell at once
+    readMax = 65536
+
+    def readBytes( self, maxbytes=None ):
+        """Buffered read of raw bytes from node, potentially blocking.
+           Buffered data is returned without reading more.
+           maxbytes: maximum number of bytes to return (readMax)"""
+        if maxbytes is None:
+            maxbytes = self.readMax
+        if not self.readbuf:
+            return os.read( self.stdout.fileno(), maxbytes )
+        data = bytes( self.readbuf[ :maxbytes ] )
+        del self.readbuf[ :maxbytes ]
+        return data
+
+    @staticmethod
+    def newDecoder():
+        """Return an incremental decoder for our output, which keeps
+           the start of any character split between reads, or None
+           for Python 2"""
+        return getincrementaldecoder( Encoding )() if Python3 else None
+
+    def decodeOutput( self, data ):
+        """Decode a chunk of output from read() or monitor()
+           data: bytes"""
+        return self.decoder.decode( data ) if self.decoder else data
+
     def read( self, maxbytes=1024 ):
         """Buffered read from node, potentially blocking.
            maxbytes: maximum number of bytes to return"""
-        count = len( self.readbuf )
-        if count < maxbytes:
-            data = decode( os.read( self.stdout.fileno(), maxbytes - count ) )
-            self.readbuf += data
-        if maxbytes >= len( self.readbuf ):
-            result = self.readbuf
-            self.readbuf = ''
-        else:
-            result = self.readbuf[ :maxbytes ]
-            self.readbuf = self.readbuf[ maxbytes: ]
-        return result
+        return self.decodeOutput( self.readBytes( maxbytes ) )
 
     def readline( self ):
         """Buffered readline from node, potentially blocking.
            returns: line (minus newline) or None"""
-        self.readbuf += self.read( 1024 )
-        if '\n' not in self.readbuf:
+        if b'\n' not in self.readbuf:
+            self.readbuf += os.read( self.stdout.fileno(), self.readMax )
+        pos = self.readbuf.find( b'\n' )
+        if pos < 0:
             return None
-        pos = self.readbuf.find( '\n' )
-        line = self.readbuf[ 0: pos ]
-        self.readbuf = self.readbuf[ pos + 1: ]
-        return line
+        line = bytes( self.readbuf[ :pos ] )
+        del self.readbuf[ :pos + 1 ]
+        return decode( line )
 
     def write( self, data ):
         """Write data to node.
@@ -266,6 +542,16 @@ def terminate( self ):
         if self.shell:
             if self.shell.poll() is None:
                 os.killpg( self.shell.pid, signal.SIGHUP )
+        if self.holder and self.holder.poll() is None:
+            os.killpg( self.holder.pid, signal.SIGHUP )
+        if self.agentSock:
+            # Agent hangs up on its commands and exits
+            self.agentSock.close()
+            self.agentSock = None
+        if self.tcProc:
+            # tc exits at EOF
+            self.tcProc.stdin.close()
+        self.unregisterNs()
         self.cleanup()
 
     def stop( self, deleteIntfs=False ):
@@ -281,14 +567,13 @@ def waitReadable( self, timeoutms=None ):
            returns: result of poll()"""
         if len( self.readbuf ) == 0:
             return self.pollOut.poll( timeoutms )
+        # Buffered output is already readable
+        return [ ( self.stdout.fileno(), select.POLLIN ) ]
 
-    def sendCmd( self, *args, **kwargs ):
-        """Send a command, followed by a command to echo a sentinel,
-           and return without waiting for the command to complete.
-           args: command and arguments, or string
-           printPid: print command's PID? (False)"""
-        assert self.shell and not self.waiting
-        printPid = kwargs.get( 'printPid', False )
+    @staticmethod
+    def cmdString( args ):
+        """Internal method: return command string for sendCmd( *args )
+           args: command and arguments, list, or string"""
         # Allow sendCmd( [ list ] )
         if len( args ) == 1 and isinstance( args[ 0 ], list ):
             cmd = args[ 0 ]
@@ -301,6 +586,20 @@ def sendCmd( self, *args, **kwargs ):
         if not re.search( r'\w', cmd ):
             # Replace empty commands with something harmless
             cmd = 'echo -n'
+        return cmd
+
+    def sendCmd( self, *args, **kwargs ):
+        """Send a command, followed by a command to echo a sentinel,
+           and return without waiting for the command to complete.
+           args: command and arguments, or string
+           printPid: print command's PID? (False)"""
+        if not self.shell:
+            self.lazyStart()
+        if self.starting:
+            self.waitStarted()
+        assert self.shell and not self.waiting
+        printPid = kwargs.get( 'printPid', False )
+        cmd = self.cmdString( args )
         self.lastCmd = cmd
         # if a builtin command is backgrounded, it still yields a PID
         if len( cmd ) > 0 and cmd[ -1 ] == '&':
@@ -317,76 +616,431 @@ def sendInt( self, intr=chr( 3 ) ):
         debug( 'sendInt: writing chr(%d)\n' % ord( intr ) )
         self.write( intr )
 
-    def monitor( self, timeoutms=None, findPid=True ):
-        """Monitor and return the output of a command.
+    # Shell output markers: a backgrounded command's job number and PID,
+    # ^A{pid} from mnexec -p or printf, and the chr( 127 ) prompt
+    # that we use as a sentinel for command completion
+    jobRegex = re.compile( br'\[\d+\] \d+\r\n' )
+    pidRegex = re.compile( br'\x01(\d+)\r\n' )
+    sentinel = b'\x7f'
+
+    def monitorBytes( self, timeoutms=None, findPid=True ):
+        """Monitor and return the raw output of a command.
+           Each chunk is scanned once for our markers, so the cost
+           is linear in the size of the output.
            Set self.waiting to False if command has completed.
            timeoutms: timeout in ms or None to wait indefinitely
-           findPid: look for PID from mnexec -p"""
+           findPid: look for PID from mnexec -p
+           returns: bytes"""
         ready = self.waitReadable( timeoutms )
         if not ready:
-            return ''
-        data = self.read( 1024 )
-        pidre = r'\[\d+\] \d+\r\n'
-        # Look for PID
-        marker = chr( 1 ) + r'\d+\r\n'
-        if findPid and chr( 1 ) in data:
-            # suppress the job and PID of a backgrounded command
-            if re.findall( pidre, data ):
-                data = re.sub( pidre, '', data )
+            return b''
+        data = self.readBytes()
+        if findPid and b'\x01' in data:
             # Marker can be read in chunks; continue until all of it is read
-            while not re.findall( marker, data ):
-                data += self.read( 1024 )
-            markers = re.findall( marker, data )
-            if markers:
-                self.lastPid = int( markers[ 0 ][ 1: ] )
-                data = re.sub( marker, '', data )
-        # Look for sentinel/EOF
-        if len( data ) > 0 and data[ -1 ] == chr( 127 ):
-            self.waiting = False
-            data = data[ :-1 ]
-        elif chr( 127 ) in data:
+            while not self.pidRegex.search( data ):
+                data += self.readBytes()
+        return self.stripMarkers( data, findPid )
+
+    def stripMarkers( self, data, findPid=True ):
+        """Internal method: remove our markers from output, setting
+           lastPid from a complete PID marker, and waiting to False
+           if the output contains the sentinel
+           data: output (bytes)
+           findPid: look for PID from mnexec -p
+           returns: output without markers"""
+        if findPid and b'\x01' in data:
+            # suppress the job and PID of a backgrounded command
+            data = self.jobRegex.sub( b'', data )
+            match = self.pidRegex.search( data )
+            if match:
+                self.lastPid = int( match.group( 1 ) )
+                data = self.pidRegex.sub( b'', data )
+        # Look for sentinel
+        if self.sentinel in data:
             self.waiting = False
-            data = data.replace( chr( 127 ), '' )
+            data = data.replace( self.sentinel, b'' )
         return data
 
+    def monitor( self, timeoutms=None, findPid=True ):
+        """Monitor and return the output of a command.
+           Set self.waiting to False if command has completed.
+           timeoutms: timeout in ms or None to wait indefinitely
+           findPid: look for PID from mnexec -p"""
+        return self.decodeOutput( self.monitorBytes( timeoutms, findPid ) )
+
     def waitOutput( self, verbose=False, findPid=True ):
         """Wait for a command to complete.
            Completion is signaled by a sentinel character, ASCII(127)
            appearing in the output stream.  Wait for the sentinel and return
            the output, including trailing newline.
            verbose: print output interactively"""
-        log = info if verbose else debug
-        output = ''
+        output = bytearray()
+        decoder = self.newDecoder()
         while self.waiting:
-            data = self.monitor( findPid=findPid )
+            data = self.monitorBytes( findPid=findPid )
             output += data
-            log( data )
+            if verbose:
+                info( decoder.decode( data ) if decoder else data )
+        output = decode( bytes( output ) )
+        if not verbose:
+            debug( output )
         return output
 
+    def iterOutput( self, lines=False, findPid=True ):
+        """Iterate over the output of a running command as it arrives,
+           rather than accumulating it as waitOutput() does.
+           If we stop iterating before the command completes, it
+           is interrupted using sendInt().
+           lines: yield lines (minus line endings) rather than chunks;
+             lines longer than readMax are yielded in pieces
+           findPid: look for PID from mnexec -p"""
+        decoder = self.newDecoder()
+        partial = ''
+        try:
+            while self.waiting:
+                data = self.monitorBytes( findPid=findPid )
+                if decoder:
+                    data = decoder.decode( data )
+                if not lines:
+                    if data:
+                        yield data
+                    continue
+                partial += data
+                # Yield complete lines, and pieces of lines longer
+                # than readMax rather than buffering all of them
+                start, limit = 0, self.readMax
+                while True:
+                    end = partial.find( '\n', start, start + limit + 1 )
+                    if end >= 0:
+                        yield partial[ start:end ].rstrip( '\r' )
+                        start = end + 1
+                    elif len( partial ) - start >= limit:
+                        yield partial[ start:start + limit ]
+                        start += limit
+                    else:
+                        break
+                partial = partial[ start: ]
+            if partial:
+                yield partial.rstrip( '\r' )
+        finally:
+            # Interrupt the command if we were abandoned early
+            if self.waiting and self.shell:
+                self.sendInt()
+                self.waitOutput( findPid=findPid )
+
+    def iterCmd( self, *args, **kwargs ):
+        """Send a command and iterate over its output,
+           e.g. for line in node.iterCmd( 'tcpdump -l', lines=True )
+           Output is yielded as it arrives, so memory use is bounded
+           even for long-running or verbose commands. The command is
+           sent when iteration starts, so an iterator which is never
+           used doesn't leave our shell busy.
+           args: command and arguments, or string
+           lines: yield lines rather than chunks (False)
+           returns: iterator over output chunks or lines"""
+        lines = kwargs.pop( 'lines', False )
+        debug( '*** %s : %s\n' % ( self.name, args ) )
+        self.sendCmd( *args, **kwargs )
+        output = self.iterOutput( lines=lines )
+        try:
+            for chunk in output:
+                yield chunk
+        finally:
+            output.close()
+
     def cmd( self, *args, **kwargs ):
         """Send a command, wait for output, and return it.
            cmd: string"""
         verbose = kwargs.get( 'verbose', False )
         log = info if verbose else debug
         log( '*** %s : %s\n' % ( self.name, args ) )
-        if self.shell:
+        if self.useAgent:
+            cmd = self.cmdString( args )
+            if self.agentCanRun( cmd, kwargs.get( 'printPid' ) ):
+                result = self.agentCmd( cmd, merge=True )
+                if result is not None:
+                    output = decode( result[ 'stdout' ] )
+                    log( output )
+                    return output
+        if self.shell or self.lazyStart():
             self.sendCmd( *args, **kwargs )
             return self.waitOutput( verbose )
         else:
             warn( '(%s exited - ignoring cmd%s)\n' % ( self, args ) )
 
+    # Each command in a batch is followed by ^B{exit status}, and
+    # backgrounded commands' output starts with their job and PID
+    statusRegex = re.compile( '\x02(\\d+)\r\n' )
+    jobLineRegex = re.compile( r'^\[\d+\] \d+\r\n' )
+
+    # Our shell's pty is in canonical mode, which cuts input lines at
+    # 4095 bytes, so batchCmd() splits longer batches into lines of
+    # at most maxLine bytes
+    maxLine = 4000
+
+    def batchCmd( self, cmds, withStatus=False, verbose=False ):
+        """Send a list of commands to our shell in as few writes as
+           possible and wait for all of them, costing one round trip
+           per maxLine bytes of commands rather than one per command.
+           cmds: list of command strings
+           withStatus: also return each command's exit status
+           verbose: print output interactively
+           returns: list of outputs, or of ( output, status ) tuples;
+             commands which didn't complete have output '' (or None
+             if our shell has exited) and status None"""
+        # Split commands into lines of ( line, number of commands )
+        lines, line, count = [], '', 0
+        for c in cmds:
+            c = c.strip() or ':'
+            # A backgrounded command can't be followed by ;
+            sep = ' ' if c.endswith( '&' ) else '; '
+            c += sep + 'printf "\\002%d\\012" $?; '
+            if len( encode( c ) ) > self.maxLine:
+                warn( '*** %s: batchCmd: command may be truncated: %s\n'
+                      % ( self.name, c ) )
+            if count and len( encode( line + c ) ) > self.maxLine:
+                lines.append( ( line, count ) )
+                line, count = '', 0
+            line += c
+            count += 1
+        if count:
+            lines.append( ( line, count ) )
+        outputs, statuses = [], []
+        for line, count in lines:
+            output = self.cmd( line, verbose=verbose )
+            if output is None:
+                # Shell has exited
+                missing = len( cmds ) - len( outputs )
+                outputs += [ None ] * missing
+                statuses += [ None ] * missing
+                break
+            parts = self.statusRegex.split( output )
+            lineOutputs = parts[ 0::2 ]
+            lineStatuses = [ int( status ) for status in parts[ 1::2 ] ]
+            # Any output after the last status marker is an error
+            trailing = lineOutputs.pop()
+            if len( lineStatuses ) < count:
+                error( '*** %s: batchCmd: %d of %d commands completed: %s\n'
+                       % ( self.name, len( lineStatuses ), count,
+                           trailing ) )
+                lineOutputs.append( trailing )
+                lineOutputs += [ '' ] * ( count - len( lineOutputs ) )
+                lineStatuses += [ None ] * ( count - len( lineStatuses ) )
+            elif trailing:
+                lineOutputs[ -1 ] += trailing
+            outputs += lineOutputs[ :count ]
+            statuses += lineStatuses[ :count ]
+        outputs = [ self.jobLineRegex.sub( '', output )
+                    if output and c.strip().endswith( '&' ) else output
+                    for c, output in zip( cmds, outputs ) ]
+        if withStatus:
+            return list( zip( outputs, statuses ) )
+        return outputs
+
     def cmdPrint( self, *args):
         """Call cmd and printing its output
            cmd: string"""
         return self.cmd( *args, **{ 'verbose': True } )
 
+    # Asyncio command support: rather than blocking in waitOutput(),
+    # our pty is registered as a reader with an asyncio event loop,
+    # so that one process can drive commands on many nodes at once.
+    # Each shell still runs one command at a time, so commands sent
+    # to the same node are queued.
+
+    def asendCmd( self, *args, **kwargs ):
+        """Queue a command to be sent from an asyncio event loop.
+           args: command and arguments, or string
+           loop: event loop (default: asyncio.get_event_loop())
+           other kwargs are passed to sendCmd()
+           returns: asyncio Future for command output"""
+        loop = kwargs.pop( 'loop', None )
+        if loop is None:
+            import asyncio
+            loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.aqueue.append( ( args, kwargs, future ) )
+        if len( self.aqueue ) == 1:
+            self.asendNext( loop )
+        return future
+
+    def asendNext( self, loop ):
+        """Internal method: send our next queued asyncio command
+           loop: event loop"""
+        while self.aqueue:
+            args, kwargs, future = self.aqueue[ 0 ]
+            if future.cancelled():
+                self.aqueue.popleft()
+            elif not self.shell and not self.lazyStart():
+                warn( '(%s exited - ignoring acmd%s)\n' % ( self, args ) )
+                self.aqueue.popleft()
+                future.set_result( None )
+            else:
+                self.aoutput = []
+                try:
+                    self.sendCmd( *args, **kwargs )
+                except ( OSError, IOError ) as e:
+                    # Shell has exited
+                    self.aqueue.popleft()
+                    future.set_exception( e )
+                    continue
+                future.add_done_callback( self.acancel )
+                loop.add_reader( self.stdout.fileno(), self.areadable, loop )
+                return
+
+    def areadable( self, loop ):
+        """Internal method: event loop callback to read output.
+           We read only what is available, so that we never block
+           the event loop, and parse the output once the sentinel
+           shows that the command has completed.
+           loop: event loop"""
+        _args, _kwargs, future = self.aqueue[ 0 ]
+        done = True
+        try:
+            data = self.readBytes()
+            if not data:
+                raise EOFError( '%s: shell exited' % self.name )
+            self.aoutput.append( data )
+            done = self.sentinel in data
+            if done:
+                output = self.stripMarkers( b''.join( self.aoutput ) )
+                if not future.done():
+                    future.set_result( decode( output ) )
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. EIO from our pty, or a decoding error
+            self.waiting = False
+            if not future.done():
+                future.set_exception( e )
+        finally:
+            if done:
+                loop.remove_reader( self.stdout.fileno() )
+                self.aqueue.popleft()
+                self.aoutput = []
+        if done:
+            self.asendNext( loop )
+
+    def acancel( self, future ):
+        """Internal method: interrupt current command if its future
+           has been cancelled
+           future: command's future"""
+        if ( future.cancelled() and self.waiting and self.aqueue and
+             self.aqueue[ 0 ][ 2 ] is future ):
+            self.sendInt()
+
+    def acmd( self, *args, **kwargs ):
+        """Awaitable version of cmd(), e.g. await node.acmd( 'ls' )
+           args: command and arguments, or string
+           loop: event loop (optional)
+           returns: asyncio Future for command output"""
+        verbose = kwargs.get( 'verbose', False )
+        log = info if verbose else debug
+        log( '*** %s : %s\n' % ( self.name, args ) )
+        return self.asendCmd( *args, **kwargs )
+
+    # Command agent: runs any number of commands at once without a
+    # pty, returning separate stdout and stderr, exit status and timing
+
+    # Commands which use or change our shell's state (working directory,
+    # variables, jobs, etc.), which our agent can't see
+    shellStateRegex = re.compile(
+        r'[$%]|(?:^|[\n;&|(){}]|\b(?:then|else|do))\s*'
+        r'(?:\w+=|(?:cd|pushd|popd|export|unset|set|declare|typeset|'
+        r'readonly|local|alias|unalias|source|\.|eval|exec|wait|jobs|'
+        r'fg|bg|disown|umask|ulimit|trap|shopt|hash|enable)(?![\w./-]))' )
+
+    def agentCanRun( self, cmd, printPid=False ):
+        """Internal method: may cmd() run cmd using our agent?
+           Background commands and printPid need our shell, as do
+           commands which use or change its state; once it has been
+           sent one of those, we keep using it, since the agent's
+           working directory or environment may now differ from it
+           cmd: command string
+           printPid: print command's PID?"""
+        if self.shellState:
+            return False
+        if self.shellStateRegex.search( cmd ):
+            self.shellState = True
+            return False
+        return cmd[ -1 ] != '&' and not printPid
+
+    def startAgent( self ):
+        """Start our command agent if it isn't running
+           returns: True if the agent is running"""
+        if self.agentSock and self.agent.poll() is None:
+            return True
+        if self.agentSock or not ( self.shell or self.holder ):
+            # Agent or node has exited
+            return False
+        ours, theirs = socket.socketpair()
+        fcntl( ours.fileno(), F_SETFD, FD_CLOEXEC )
+        self.agent = self.popen( [ sys.executable, agentPath ],
+                                 stdin=theirs.fileno(), stdout=None,
+                                 stderr=None, close_fds=True )
+        theirs.close()
+        self.agentSock = ours
+        return True
+
+    def agentSend( self, *args, **kwargs ):
+        """Send a command to our command agent without waiting for it
+           args: command and arguments, list, or string
+           merge: merge stderr into stdout? (False)
+           returns: request id for agentWait(), or None"""
+        if not self.startAgent():
+            warn( '(%s agent exited - ignoring cmd%s)\n' % ( self, args ) )
+            return None
+        ftype = b'M' if kwargs.get( 'merge', False ) else b'C'
+        self.agentId += 1
+        self.agentSock.sendall( frame( self.agentId, ftype,
+                                       encode( self.cmdString( args ) ) ) )
+        return self.agentId
+
+    def agentWait( self, rid ):
+        """Wait for the result of a command sent with agentSend()
+           rid: request id
+           returns: dict of stdout, stderr (bytes), status (exit code, or
+             -signal), wall, user and sys (s), or None"""
+        while rid not in self.agentResults:
+            data = b''
+            if self.agentSock:
+                data = self.agentSock.recv( self.readMax )
+            if not data:
+                error( '*** %s: command agent exited\n' % self.name )
+                return None
+            self.agentBuf += data
+            for frid, _ftype, payload in parseFrames( self.agentBuf ):
+                self.agentResults[ frid ] = decodeResult( payload )
+        return self.agentResults.pop( rid )
+
+    def agentKill( self, rid, sig=signal.SIGINT ):
+        """Send a signal to a command sent with agentSend()
+           rid: request id
+           sig: signal (SIGINT)"""
+        if self.agentSock:
+            self.agentSock.sendall( frame( rid, b'K', Signal.pack( sig ) ) )
+
+    def agentCmd( self, *args, **kwargs ):
+        """Run a command using our command agent and return its result
+           args: command and arguments, list, or string
+           merge: merge stderr into stdout? (False)
+           returns: dict of stdout, stderr (bytes), status (exit code, or
+             -signal), wall, user and sys (s), or None"""
+        rid = self.agentSend( *args, **kwargs )
+        return self.agentWait( rid ) if rid else None
+
     def popen( self, *args, **kwargs ):
         """Return a Popen() object in our namespace
            args: Popen() args, single list, or string
            kwargs: Popen() keyword args"""
+        if self.mountPending:
+            # Lazy shell: every command in our namespace starts
+            # with popen(), so mount our private directories first
+            self.mountPending = False
+            self.mountPrivateDirs()
         defaults = { 'stdout': PIPE, 'stderr': PIPE,
                      'mncmd':
-                     [ 'mnexec', '-da', str( self.pid ) ] }
+                     [ 'mnexec', '-da', self.nsTarget() ] }
+        # Attach to our namespace with setns() rather than mnexec?
+        setns = self.setnsPopen and 'mncmd' not in kwargs
         defaults.update( kwargs )
         shell = defaults.pop( 'shell', False )
         if len( args ) == 1:
@@ -404,8 +1058,10 @@ def popen( self, *args, **kwargs ):
         if shell:
             cmd = [ os.environ[ 'SHELL' ], '-c' ] + [ ' '.join( cmd ) ]
         # Attach to our namespace  using mnexec -a
-        cmd = defaults.pop( 'mncmd' ) + cmd
-        popen = self._popen( cmd, **defaults )
+        mncmd = defaults.pop( 'mncmd' )
+        if setns:
+            return self.nsPopen( cmd, **defaults )
+        popen = self._popen( mncmd + cmd, **defaults )
         return popen
 
     def pexec( self, *args, **kwargs ):
@@ -428,8 +1084,11 @@ def pexec( self, *args, **kwargs ):
 
     def newPort( self ):
         "Return the next port number to allocate."
-        if len( self.ports ) > 0:
-            return max( self.ports.values() ) + 1
+        # We only need to search for the highest port if it was removed
+        if self.topPort not in self.intfs:
+            self.topPort = max( self.intfs ) if self.intfs else None
+        if self.topPort is not None:
+            return self.topPort + 1
         return self.portBase
 
     def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
@@ -439,6 +1098,8 @@ def addIntf( self, intf, port=None, moveIntfFn=moveIntf ):
            moveIntfFn: function to move interface (optional)"""
         if port is None:
             port = self.newPort()
+        if self.topPort is None or port > self.topPort:
+            self.topPort = port
         self.intfs[ port ] = intf
         self.ports[ intf ] = port
         self.nameToIntf[ intf.name ] = intf
@@ -511,12 +1172,246 @@ def deleteIntfs( self, checkName=True ):
                 intf.delete()
                 info( '.' )
 
+    # Deferred configuration support: while we are deferring,
+    # Intf.setIP(), Intf.setMAC(), Intf.isUp( setUp=True ), setARP(),
+    # setHostRoute(), setDefaultRoute() and TCIntf.config() queue
+    # their commands rather than running them, and flushConfig() runs
+    # the queued ip and tc commands with a single ip -batch and
+    # tc -batch process, and any other commands with one sh -s.
+    # Commands which aren't queued still run immediately.
+    # netlink.makeIntfPair() queues veth pairs, which flushConfig()
+    # creates first (see flushIntfPairs()).
+
+    def deferConfig( self ):
+        "Queue configuration commands until flushConfig()"
+        if self.configQueue is None:
+            self.configQueue = []
+
+    def deferring( self ):
+        "Are we queueing configuration commands?"
+        return self.configQueue is not None
+
+    def queueConfig( self, origin, cmds, tool='ip' ):
+        """Queue commands for flushConfig()
+           origin: description of the queueing call, for errors,
+             or None to ignore errors
+           cmds: list of batch lines for tool (e.g.
+             'link set dev h1-eth0 up'), or of shell commands
+           tool: 'ip', 'tc', 'sh' (shell commands) or 'veth' (pairs
+             for netlink.makeIntfPairs(), followed by mtu and queues)
+           returns: '' (the output of a successful command)"""
+        self.configQueue += [ ( tool, c, origin ) for c in cmds ]
+        return ''
+
+    def flushConfig( self ):
+        """Run our queued commands and stop deferring
+           returns: list of ( origin, command, message ) for each
+             command that failed"""
+        if not self.deferring():
+            return []
+        failures = self.flushIntfPairs( [ self ] ).get( self, [] )
+        queue, self.configQueue = self.configQueue, None
+        for tool in 'ip', 'tc':
+            lines = [ ( c, origin ) for t, c, origin in queue if t == tool ]
+            if not lines:
+                continue
+            popen = self.popen( [ tool, '-force', '-batch', '-' ],
+                                stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+            out, _err = popen.communicate(
+                encode( ''.join( c + '\n' for c, _origin in lines ) ) )
+            popen.wait()
+            failures += self.batchResults( tool, lines, decode( out ) )
+        shell = [ ( c, origin ) for t, c, origin in queue if t == 'sh' ]
+        if shell:
+            failures += self.runScript( shell )
+        for intf in self.intfList():
+            intf.configFlushed( failures )
+        return failures
+
+    # Each command run by runScript() is followed by ^B{exit status}
+    scriptStatusRegex = re.compile( '\x02(\\d+)\n' )
+
+    def runScript( self, cmds ):
+        """Internal method: run shell commands with a single sh -s,
+           which reads them from a pipe rather than our shell's pty
+           (whose input lines are limited to 4095 bytes)
+           cmds: list of ( command, origin ), with origin None to
+             ignore errors
+           returns: list of ( origin, command, message ) for each
+             command that failed"""
+        # Commands mustn't read the rest of the script from stdin
+        script = ''.join( '{ ' + c + '\n} < /dev/null 2>&1\n'
+                          'printf "\\002%d\\n" $?\n'
+                          for c, _origin in cmds )
+        popen = self.popen( [ 'sh', '-s' ], stdin=PIPE, stdout=PIPE,
+                            stderr=STDOUT )
+        out, _err = popen.communicate( encode( script ) )
+        popen.wait()
+        # output, status, output, status, ..., trailing output
+        parts = self.scriptStatusRegex.split( decode( out ) )
+        outputs, statuses = parts[ :-1 ][ ::2 ], parts[ 1::2 ]
+        failures = []
+        for i, ( c, origin ) in enumerate( cmds ):
+            if origin is None:
+                continue
+            if i >= len( statuses ):
+                # sh exited early
+                failures.append( ( origin, c, parts[ -1 ].strip() ) )
+            elif int( statuses[ i ] ):
+                failures.append( ( origin, c, outputs[ i ].strip() ) )
+        self.reportFailures( failures )
+        return failures
+
+    @staticmethod
+    def flushIntfPairs( nodes ):
+        """Create the veth pairs queued in nodes with a single
+           netlink.makeIntfPairs() (for each MTU and queue count), so
+           that they exist before any node's queued commands run
+           nodes: deferring nodes
+           returns: dict of node -> list of failures, for nodes
+             with pairs which could not be created"""
+        groups, failures = {}, {}
+        for node in nodes:
+            if not node.deferring():
+                continue
+            for tool, pair, origin in node.configQueue:
+                if tool == 'veth':
+                    groups.setdefault( pair[ 6: ], [] ).append(
+                        ( node, pair[ :6 ], origin ) )
+            node.configQueue = [ entry for entry in node.configQueue
+                                 if entry[ 0 ] != 'veth' ]
+        for ( mtu, queues ), entries in groups.items():
+            errors = makeIntfPairs( [ pair for _node, pair, _origin
+                                      in entries ], mtu=mtu, queues=queues )
+            for ( node, pair, origin ), err in zip( entries, errors ):
+                if err:
+                    failures.setdefault( node, [] ).append(
+                        ( origin, 'ip link add %s type veth peer name %s' %
+                          pair[ :2 ], err ) )
+        for node, nodeFailures in failures.items():
+            node.reportFailures( nodeFailures )
+        return failures
+
+    def batchResults( self, tool, lines, output, first=0 ):
+        """Internal method: report and return failures of tool -batch
+           tool: ip or tc
+           lines: list of ( line, origin ) sent to tool,
+             with origin None to ignore errors
+           output: its output
+           first: index in output of lines[ 0 ]
+           returns: list of ( origin, command, message )"""
+        failures = []
+        for index, message in batchFailures( output ):
+            index -= first
+            line, origin = lines[ index ] if index >= 0 else ( '?', '?' )
+            if origin is not None:
+                failures.append( ( origin, '%s %s' % ( tool, line ),
+                                   message ) )
+        self.reportFailures( failures )
+        return failures
+
+    def reportFailures( self, failures ):
+        """Internal method: report failed configuration commands
+           failures: list of ( origin, command, message )"""
+        for origin, c, message in failures:
+            error( '*** %s: %s failed: %s: %s\n' %
+                   ( self.name, origin, c, message ) )
+
+    # Fast tc support: tcSend() writes batch lines to a tc -batch
+    # process which we keep running, so that frequent changes (see
+    # TCIntf.update()) don't need to spawn a process or wait for one.
+    # tc reports errors asynchronously, so later calls return them.
+
+    # Number of lines sent to tcSend() to remember for error reports
+    tcHistory = 10000
+
+    def tcStart( self ):
+        "Start our tc process for tcSend(), if it isn't running"
+        if self.tcProc and self.tcProc.poll() is None:
+            return
+        self.tcProc = self.popen( [ 'tc', '-force', '-batch', '-' ],
+                                  stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+        fd = self.tcProc.stdout.fileno()
+        fcntl( fd, F_SETFL, fcntl( fd, F_GETFL ) | os.O_NONBLOCK )
+        self.tcLines = deque( maxlen=self.tcHistory )
+        self.tcCount, self.tcOut = 0, ''
+
+    def tcSend( self, lines, check=True ):
+        """Send tc batch lines to our tc process without waiting
+           lines: list of ( line, origin ), with origin None to
+             ignore errors
+           check: check for errors (see tcErrors())
+           returns: list of ( origin, command, message ) for errors
+             reported since our last check"""
+        self.tcStart()
+        self.tcLines.extend( lines )
+        self.tcCount += len( lines )
+        self.tcProc.stdin.write(
+            encode( ''.join( line + '\n' for line, _origin in lines ) ) )
+        self.tcProc.stdin.flush()
+        if check:
+            return self.tcErrors()
+        # Keep tc's output from filling its pipe and blocking it
+        self.tcRead()
+        return []
+
+    def tcRead( self ):
+        "Internal method: read any output from our tc process"
+        while True:
+            try:
+                data = os.read( self.tcProc.stdout.fileno(), 65536 )
+            except OSError:
+                # EAGAIN
+                break
+            if not data:
+                break
+            self.tcOut += decode( data )
+
+    def tcErrors( self ):
+        """Report and return errors from our tc process so far
+           returns: list of ( origin, command, message )"""
+        if not self.tcProc:
+            return []
+        self.tcRead()
+        # Parse complete error reports, leaving any partial one
+        end = self.tcOut.rfind( 'Command failed' )
+        end = self.tcOut.find( '\n', end ) if end >= 0 else -1
+        if end < 0:
+            # Discard warnings, which may be all we have
+            self.tcOut = '\n'.join(
+                line for line in self.tcOut.split( '\n' )
+                if not line.startswith( 'Warning:' ) )
+            return []
+        done, self.tcOut = self.tcOut[ : end + 1 ], self.tcOut[ end + 1 : ]
+        first = self.tcCount - len( self.tcLines )
+        failures = self.batchResults( 'tc', self.tcLines, done, first )
+        self.tcFailed.update( origin for origin, _c, _m in failures )
+        return failures
+
     # Routing support
 
+    def intfForIP( self, ip ):
+        """Return our interface whose subnet contains ip,
+           or our default interface
+           ip: IP address as dotted decimal"""
+        ipNum = ipParse( ip )
+        for intf in self.intfList():
+            if intf.IP() and intf.prefixLen is not None:
+                prefixLen = int( intf.prefixLen )
+                mask = ( 0xffffffff << ( 32 - prefixLen ) ) & 0xffffffff
+                if ( ipParse( intf.IP() ) ^ ipNum ) & mask == 0:
+                    return intf
+        return self.defaultIntf()
+
     def setARP( self, ip, mac ):
         """Add an ARP entry.
            ip: IP address as string
            mac: MAC address as string"""
+        if self.deferring():
+            return self.queueConfig(
+                'setARP( %s, %s )' % ( ip, mac ),
+                [ 'neigh replace %s lladdr %s dev %s nud permanent' %
+                  ( ip, mac, self.intfForIP( ip ) ) ] )
         result = self.cmd( 'arp', '-s', ip, mac )
         return result
 
@@ -524,6 +1419,10 @@ def setHostRoute( self, ip, intf ):
         """Add route to host.
            ip: IP address as dotted decimal
            intf: string, interface name"""
+        if self.deferring():
+            return self.queueConfig(
+                'setHostRoute( %s, %s )' % ( ip, intf ),
+                [ 'route add %s/32 dev %s' % ( ip, intf ) ] )
         return self.cmd( 'route add -host', ip, 'dev', intf )
 
     def setDefaultRoute( self, intf=None ):
@@ -534,6 +1433,9 @@ def setDefaultRoute( self, intf=None ):
             params = intf
         else:
             params = 'dev %s' % intf
+        if self.deferring():
+            return self.queueConfig( 'setDefaultRoute( %s )' % intf,
+                                     [ 'route replace default ' + params ] )
         # Do this in one line in case we're messing with the root namespace
         self.cmd( 'ip route del default; ip route add default', params )
 
@@ -608,7 +1510,10 @@ def config( self, mac=None, ip=None,
         self.setParam( r, 'setIP', ip=ip )
         self.setParam( r, 'setDefaultRoute', defaultRoute=defaultRoute )
         # This should be examined
-        self.cmd( 'ifconfig lo ' + lo )
+        if self.deferring() and lo == 'up':
+            self.queueConfig( 'config( lo=up )', [ 'link set dev lo up' ] )
+        else:
+            self.cmd( 'ifconfig lo ' + lo )
         return r
 
     def configDefault( self, **moreParams ):
@@ -719,9 +1624,13 @@ def popen( self, *args, **kwargs ):
         """Return a Popen() object in node's namespace
            args: Popen() args, single list, or string
            kwargs: Popen() keyword args"""
+        if ( self.setnsPopen and 'mncmd' not in kwargs and
+             self.sched != 'rt' ):
+            # enterNs() adds the child to our cgroup
+            return Host.popen( self, *args, **kwargs )
         # Tell mnexec to execute command in our cgroup
         mncmd = kwargs.pop( 'mncmd', [ 'mnexec', '-g', self.name,
-                                       '-da', str( self.pid ) ] )
+                                       '-da', self.nsTarget() ] )
         # if our cgroup is not given any cpu time,
         # we cannot assign the RR Scheduler.
         if self.sched == 'rt':
@@ -732,6 +1641,27 @@ def popen( self, *args, **kwargs ):
                        self.name, 'Using cfs scheduler for subprocess\n' )
         return Host.popen( self, *args, mncmd=mncmd, **kwargs )
 
+    # Cgroup controllers joined by mnexec -g
+    cgroupControllers = ( 'cpu', 'cpuacct', 'cpuset' )
+
+    # Children must join our cgroup themselves, in enterNs()
+    parentSetns = False
+
+    def enterNs( self, setns, cwd ):
+        """Internal method: add a popen() child to our cgroup and
+           attach it to our namespaces; replaces mnexec -g -da"""
+        pid = str( os.getpid() )
+        joined = 0
+        for controller in self.cgroupControllers:
+            path = '/sys/fs/cgroup/%s/%s/tasks' % ( controller, self.name )
+            if os.path.exists( path ):
+                with open( path, 'w' ) as tasks:
+                    tasks.write( pid )
+                joined += 1
+        if not joined:
+            raise Exception( 'could not add to cgroup %s' % self.name )
+        super( CPULimitedHost, self ).enterNs( setns, cwd )
+
     def cleanup( self ):
         "Clean up Node, then clean up our cgroup"
         super( CPULimitedHost, self ).cleanup()
@@ -1001,6 +1931,7 @@ def TCReapply( intf ):
             ifspeed = 10000000000  # 10 Gbps
             minspeed = ifspeed * 0.001
 
+            intf.tcTree = None
             res = intf.config( **intf.params )
 
             if res is None:  # link may not have TC parameters
@@ -1121,6 +2052,7 @@ def TCReapply( intf ):
            over tc queuing disciplines. As a quick hack/
            workaround, we clear OVS's and reapply our own."""
         if isinstance( intf, TCIntf ):
+            intf.tcTree = None
             intf.config( **intf.params )
 
     def attach( self, intf ):
@@ -1247,11 +2179,18 @@ def batchStartup( cls, switches, run=errRun ):
                 switch.batch = False
         if cmds:
             run( cmds, shell=True )
-        # Reapply link config if necessary...
+        # Reapply link config if necessary, using one batch of
+        # commands per switch
         for switch in switches:
-            for intf in switch.intfs.values():
-                if isinstance( intf, TCIntf ):
-                    intf.config( **intf.params )
+            tcIntfs = [ intf for intf in switch.intfs.values()
+                        if isinstance( intf, TCIntf ) ]
+            if not tcIntfs:
+                continue
+            switch.deferConfig()
+            for intf in tcIntfs:
+                intf.tcTree = None
+                intf.config( **intf.params )
+            switch.flushConfig()
         return switches
 
     def stop( self, deleteIntfs=True ):
@@ -0,0 +1,467 @@
+"""
+pinger.py: parallel all-pairs ping
+
+Mininet.ping() pings each pair of hosts in turn by running ping -c1
+in the source host's shell, so pinging all pairs of 1000 hosts means
+a million sequential round trips. A Pinger instead opens a raw ICMP
+socket in each source host's network namespace (using setns(); see
+Node.nsFds()), and sends echo requests from all sources to many
+destinations at once from a single poll() loop, keeping up to
+concurrency requests in flight.
+
+Example:
+
+    pinger = Pinger( net.hosts, count=3, timeout=1 )
+    pinger.run()
+    print( pinger.ploss(), pinger.stats( h1, h2 ), pinger.matrix() )
+
+Mininet.pingParallel() runs a Pinger and reports its results as
+Mininet.ping() does.
+
+A Pinger keeps its results in a PingStats, which stores every RTT
+sample compactly (in a float array per pair of hosts), so that many
+samples for many pairs fit in memory (e.g. 10k pairs x 1000 samples
+take about 40 MB), and which computes per-pair statistics and
+percentiles and exports them as CSV or (with NumPy) .npz files:
+
+    pinger = Pinger( net.hosts, count=1000 )
+    pinger.run()
+    print( pinger.percentiles( h1, h2, ( 50, 99, 99.9 ) ) )
+    pinger.export( 'rtts.csv' )
+
+Since echo requests are sent by Mininet rather than by a process
+running in the source host, they aren't subject to the host's CPU
+limits.
+
+Pinging all pairs of hosts quickly needs an ARP cache entry for
+every pair at once, so run() raises the neighbor table's (global)
+garbage collection thresholds as needed: otherwise, once the table
+is full, new neighbors can't be resolved and their pings are lost.
+"""
+
+import csv
+import os
+import select
+import socket
+from array import array
+from collections import deque
+from errno import EAGAIN, EWOULDBLOCK, ENOBUFS, EINTR
+from math import sqrt
+from struct import pack, unpack
+
+from mininet.log import error, debug, warn
+from mininet.util import setnsFunction, sysctlTestAndSet, CLONE_NEWNET
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+
+# ICMP message types
+ICMP_ECHOREPLY, ICMP_ECHO = 0, 8
+
+# setsockopt() options not in the socket module
+SO_RCVBUFFORCE = 33
+SOL_RAW, ICMP_FILTER = 255, 1
+
+
+def checksum( data ):
+    "Return the internet checksum of data, in native byte order"
+    if len( data ) % 2:
+        data += b'\0'
+    total = sum( array( 'H', data ) )
+    total = ( total >> 16 ) + ( total & 0xffff )
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def percentile( values, p ):
+    """Return the pth percentile of sorted values, interpolating
+       linearly between samples as numpy.percentile() does
+       values: sorted sequence
+       p: percentile (0-100)"""
+    if not values:
+        return None
+    rank = ( len( values ) - 1 ) * p / 100.0
+    lo = int( rank )
+    hi = min( lo + 1, len( values ) - 1 )
+    return values[ lo ] + ( values[ hi ] - values[ lo ] ) * ( rank - lo )
+
+
+class PingStats( object ):
+    "RTT samples for pairs of hosts, and their statistics"
+
+    percentileList = ( 50, 99, 99.9 )  # default percentiles
+
+    def __init__( self, hosts ):
+        "hosts: list of hosts"
+        self.hosts = list( hosts )
+        self.clear()
+
+    def clear( self ):
+        "Discard all samples"
+        self.sent = {}  # ( src, dst ) -> requests sent
+        self.rtts = {}  # ( src, dst ) -> array of RTTs (ms) received
+
+    def add( self, src, dst, rtt=None ):
+        """Record a request from src to dst
+           rtt: its RTT (ms), or None if it was lost"""
+        pair = src, dst
+        self.sent[ pair ] = self.sent.get( pair, 0 ) + 1
+        if rtt is not None:
+            rtts = self.rtts.get( pair )
+            if rtts is None:
+                rtts = self.rtts[ pair ] = array( 'f' )
+            rtts.append( rtt )
+
+    def stats( self, src, dst ):
+        """Return ping statistics for src -> dst in the form of
+           Mininet._parsePingFull(): ( sent, received, rttmin, rttavg,
+           rttmax, rttdev ), with RTTs in ms"""
+        sent = self.sent.get( ( src, dst ), 0 )
+        rtts = self.rtts.get( ( src, dst ) )
+        if not rtts:
+            return sent, 0, 0, 0, 0, 0
+        avg = sum( rtts ) / len( rtts )
+        dev = sqrt( max( 0, sum( rtt * rtt for rtt in rtts ) /
+                         len( rtts ) - avg * avg ) )
+        return sent, len( rtts ), min( rtts ), avg, max( rtts ), dev
+
+    def percentiles( self, src, dst, ps=None ):
+        """Return RTT percentiles (ms) for src -> dst
+           ps: list of percentiles (default: percentileList)
+           returns: list of values, or Nones if no replies"""
+        ps = self.percentileList if ps is None else ps
+        rtts = sorted( self.rtts.get( ( src, dst ), () ) )
+        return [ percentile( rtts, p ) for p in ps ]
+
+    def totals( self ):
+        "Return total requests sent and replies received"
+        return ( sum( self.sent.values() ),
+                 sum( len( rtts ) for rtts in self.rtts.values() ) )
+
+    def ploss( self ):
+        "Return percentage of requests lost, or None if none sent"
+        sent, received = self.totals()
+        if not sent:
+            return None
+        return 100.0 * ( sent - received ) / sent
+
+    def matrix( self ):
+        """Return N x N list of lists of mean RTTs (ms) from each host
+           to each host in self.hosts, or None for pairs without
+           replies (including each host to itself)"""
+        def meanRtt( src, dst ):
+            "Mean RTT (ms) for src -> dst, or None"
+            rtts = self.rtts.get( ( src, dst ) )
+            return sum( rtts ) / len( rtts ) if rtts else None
+
+        return [ [ meanRtt( src, dst ) for dst in self.hosts ]
+                 for src in self.hosts ]
+
+    def pairs( self ):
+        "Return ( src, dst ) pairs with requests, in hosts order"
+        return [ ( src, dst ) for src in self.hosts for dst in self.hosts
+                 if ( src, dst ) in self.sent ]
+
+    def summary( self, ps=None ):
+        """Return a row of statistics for each pair: src, dst, sent,
+           received, rttmin, rttavg, rttmax, rttdev and percentiles
+           ps: list of percentiles (default: percentileList)"""
+        return [ [ src.name, dst.name ] + list( self.stats( src, dst ) ) +
+                 self.percentiles( src, dst, ps )
+                 for src, dst in self.pairs() ]
+
+    def writeCSV( self, filename, ps=None, samples=False ):
+        """Write statistics to a CSV file, with a row for each pair
+           (see summary())
+           ps: list of percentiles (default: percentileList)
+           samples: write a row for each sample (src, dst, rtt) instead"""
+        ps = self.percentileList if ps is None else ps
+        with open( filename, 'w' ) as f:
+            writer = csv.writer( f, lineterminator='\n' )
+            if samples:
+                writer.writerow( [ 'src', 'dst', 'rtt' ] )
+                for src, dst in self.pairs():
+                    for rtt in self.rtts.get( ( src, dst ), () ):
+                        writer.writerow( [ src.name, dst.name, rtt ] )
+                return
+            writer.writerow( [ 'src', 'dst', 'sent', 'received', 'min',
+                               'avg', 'max', 'mdev' ] +
+                             [ 'p%g' % p for p in ps ] )
+            writer.writerows( self.summary( ps ) )
+
+    def saveNPZ( self, filename, ps=None ):
+        """Save samples and statistics to a NumPy .npz file, with
+           arrays hosts (names), src and dst (indices in hosts), sent
+           and received for each pair, all RTT samples (ms) in rtts,
+           with pair i's in rtts[ offsets[ i ] : offsets[ i + 1 ] ],
+           and each percentile, e.g. p99.9 (NaN if no replies)
+           ps: list of percentiles (default: percentileList)"""
+        import numpy
+        ps = self.percentileList if ps is None else ps
+        index = dict( ( host, i ) for i, host in enumerate( self.hosts ) )
+        pairs = self.pairs()
+        empty = array( 'f' )
+        rtts = [ self.rtts.get( pair, empty ) for pair in pairs ]
+        offsets = numpy.zeros( len( pairs ) + 1, dtype=numpy.int64 )
+        numpy.cumsum( [ len( r ) for r in rtts ], out=offsets[ 1: ] )
+        arrays = {
+            'hosts': numpy.array( [ host.name for host in self.hosts ] ),
+            'src': numpy.array( [ index[ src ] for src, _ in pairs ],
+                                dtype=numpy.int32 ),
+            'dst': numpy.array( [ index[ dst ] for _, dst in pairs ],
+                                dtype=numpy.int32 ),
+            'sent': numpy.array( [ self.sent[ pair ] for pair in pairs ],
+                                 dtype=numpy.int64 ),
+            'received': numpy.diff( offsets ),
+            'offsets': offsets,
+            'rtts': numpy.concatenate(
+                [ numpy.frombuffer( r, dtype=numpy.float32 )
+                  for r in rtts ] or
+                [ numpy.zeros( 0, dtype=numpy.float32 ) ] ) }
+        for p in ps:
+            arrays[ 'p%g' % p ] = numpy.array(
+                [ numpy.percentile( r, p ) if len( r ) else numpy.nan
+                  for r in rtts ] )
+        numpy.savez_compressed( filename, **arrays )
+
+    def export( self, filename, ps=None ):
+        """Save statistics with saveNPZ() if filename ends with .npz,
+           and otherwise with writeCSV()
+           ps: list of percentiles (default: percentileList)"""
+        if filename.endswith( '.npz' ):
+            try:
+                self.saveNPZ( filename, ps )
+            except ImportError:
+                error( '*** Saving %s requires NumPy\n' % filename )
+        else:
+            self.writeCSV( filename, ps )
+
+
+class Pinger( PingStats ):
+    "Ping between all pairs of a list of hosts in parallel"
+
+    payload = b'\0' * 56  # as ping sends
+    rcvbuf = 1 << 22  # socket receive buffer size
+
+    def __init__( self, hosts, count=1, timeout=1, concurrency=256 ):
+        """hosts: list of hosts
+           count: echo requests per pair of hosts
+           timeout: time (s) to wait for each reply
+           concurrency: maximum number of requests in flight"""
+        PingStats.__init__( self, hosts )
+        self.count = count
+        self.timeout = float( timeout )
+        self.concurrency = concurrency
+
+    def probes( self, ips ):
+        """Generator: return ( src, dst ) index pairs to ping, count
+           times each; each round of len( hosts ) requests sends one
+           request from and to each host, to spread the load"""
+        n = len( self.hosts )
+        for _round in range( self.count ):
+            for offset in range( 1, n ):
+                for i in range( n ):
+                    j = ( i + offset ) % n
+                    if ips[ j ]:
+                        yield i, j
+
+    # Neighbor table limits which fixNeighLimits() raises
+    neighLimits = ( 'net.ipv4.neigh.default.gc_thresh2',
+                    'net.ipv4.neigh.default.gc_thresh3' )
+
+    @classmethod
+    def fixNeighLimits( cls, hosts ):
+        """Make room in the neighbor table for an entry for every pair
+           of hosts (in addition to the 16384 that fixLimits() allows)
+           hosts: number of hosts
+           returns: dict of sysctl -> value, for limits we raised"""
+        limit = hosts * ( hosts - 1 ) + 16384
+        old = {}
+        try:
+            for name in cls.neighLimits:
+                with open( '/proc/sys/' + name.replace( '.', '/' ) ) as f:
+                    value = int( f.read() )
+                if value < limit:
+                    sysctlTestAndSet( name, limit )
+                    old[ name ] = value
+        except ( IOError, OSError ) as e:
+            warn( '*** Pinger: could not raise neighbor table limits: '
+                  '%s\n' % e )
+        return old
+
+    @classmethod
+    def restoreNeighLimits( cls, old ):
+        """Restore neighbor table limits raised by fixNeighLimits()
+           old: its return value"""
+        for name in reversed( cls.neighLimits ):
+            if name not in old:
+                continue
+            try:
+                sysctlTestAndSet( name, '%d' % old[ name ] )
+            except ( IOError, OSError ) as e:
+                warn( '*** Pinger: could not restore %s: %s\n' %
+                      ( name, e ) )
+
+    def openSocket( self, host, rootNet ):
+        """Return a non-blocking raw ICMP socket in host's network
+           namespace, or None if we can't open one
+           rootNet: fd of our network namespace"""
+        setns = setnsFunction()
+        try:
+            setns( host.nsFds()[ 0 ], CLONE_NEWNET )
+            try:
+                sock = socket.socket( socket.AF_INET, socket.SOCK_RAW,
+                                      socket.IPPROTO_ICMP )
+            finally:
+                setns( rootNet, CLONE_NEWNET )
+        except ( OSError, socket.error ) as e:
+            error( '*** Pinger: cannot open ICMP socket in %s: %s\n' %
+                   ( host, e ) )
+            return None
+        sock.setblocking( False )
+        try:
+            sock.setsockopt( socket.SOL_SOCKET, SO_RCVBUFFORCE,
+                             self.rcvbuf )
+        except socket.error:
+            sock.setsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF,
+                             self.rcvbuf )
+        # Only receive echo replies
+        sock.setsockopt( SOL_RAW, ICMP_FILTER,
+                         pack( 'I', ~( 1 << ICMP_ECHOREPLY ) & 0xffffffff ) )
+        return sock
+
+    def echoRequest( self, ident, seq ):
+        "Return ICMP echo request packet"
+        header = pack( '!BBHHH', ICMP_ECHO, 0, 0, ident, seq )
+        cksum = checksum( header + self.payload )
+        return header[ :2 ] + pack( 'H', cksum ) + header[ 4: ] + self.payload
+
+    def run( self ):
+        """Send all echo requests and wait for their replies,
+           replacing any earlier results
+           returns: self"""
+        hosts = self.hosts
+        n = len( hosts )
+        ips = [ host.IP() if host.intfs else None for host in hosts ]
+        self.clear()
+        rootNet = os.open( '/proc/self/ns/net', os.O_RDONLY )
+        try:
+            socks = [ self.openSocket( host, rootNet ) for host in hosts ]
+        finally:
+            os.close( rootNet )
+        # Only raise the limits while we need them
+        oldLimits = self.fixNeighLimits( n )
+        try:
+            self.ping( socks, ips )
+        finally:
+            for sock in socks:
+                if sock:
+                    sock.close()
+            self.restoreNeighLimits( oldLimits )
+        debug( '*** Pinger: %d hosts, %d requests\n' %
+               ( n, self.totals()[ 0 ] ) )
+        return self
+
+    def ping( self, socks, ips ):
+        """Internal method: send echo requests from socks and receive
+           replies until all have arrived or timed out
+           socks: sockets for each host (or None)
+           ips: IP address of each host (or None)"""
+        hosts = self.hosts
+        pid = os.getpid()
+        idents = [ ( pid + i ) & 0xffff for i in range( len( hosts ) ) ]
+        seqs = [ 0 ] * len( hosts )
+        poller = select.poll()
+        fdToIndex = {}
+        for i, sock in enumerate( socks ):
+            if sock:
+                fdToIndex[ sock.fileno() ] = i
+                poller.register( sock.fileno(), select.POLLIN )
+        inflight = {}  # ( src index, seq ) -> ( dst index, send time )
+        deadlines = deque()  # ( deadline, src index, seq ), in order
+        probes = self.probes( ips )
+        retry = None  # request that couldn't be sent yet
+        done = False
+        while not done or inflight:
+            # Send as many requests as we are allowed to
+            while not done and len( inflight ) < self.concurrency:
+                probe, retry = retry or next( probes, None ), None
+                if probe is None:
+                    done = True
+                    break
+                i, j = probe
+                src, dst = hosts[ i ], hosts[ j ]
+                if not socks[ i ]:
+                    self.add( src, dst )
+                    continue
+                seq = seqs[ i ]
+                try:
+                    socks[ i ].sendto( self.echoRequest( idents[ i ], seq ),
+                                       ( ips[ j ], 0 ) )
+                except socket.error as e:
+                    if e.errno in ( EAGAIN, EWOULDBLOCK, ENOBUFS, EINTR ):
+                        # Try again when we have received some replies
+                        retry = probe
+                        break
+                    # e.g. network unreachable
+                    debug( '*** Pinger: %s -> %s: %s\n' % ( src, dst, e ) )
+                    self.add( src, dst )
+                    continue
+                seqs[ i ] = ( seq + 1 ) & 0xffff
+                now = monotonic()
+                inflight[ i, seq ] = ( j, now )
+                deadlines.append( ( now + self.timeout, i, seq ) )
+            # Wait for replies until the next deadline
+            timeoutms = 1 if retry else 0
+            if deadlines and not retry:
+                timeoutms = int( ( deadlines[ 0 ][ 0 ] -
+                                   monotonic() ) * 1000 ) + 1
+            try:
+                events = poller.poll( max( 0, timeoutms ) )
+            except select.error:
+                # EINTR on Python 2
+                events = []
+            for fd, _event in events:
+                i = fdToIndex[ fd ]
+                self.receive( i, socks[ i ], idents[ i ], ips, inflight )
+            # Expire requests which have run out of time
+            now = monotonic()
+            while deadlines and deadlines[ 0 ][ 0 ] <= now:
+                _deadline, i, seq = deadlines.popleft()
+                entry = inflight.pop( ( i, seq ), None )
+                if entry:
+                    self.add( hosts[ i ], hosts[ entry[ 0 ] ] )
+
+    def receive( self, i, sock, ident, ips, inflight ):
+        """Internal method: read available echo replies for host i
+           sock: host i's socket
+           ident: ICMP id of host i's requests
+           ips: IP address of each host
+           inflight: ( src index, seq ) -> ( dst index, send time )"""
+        while True:
+            try:
+                data, addr = sock.recvfrom( 2048 )
+            except socket.error as e:
+                if e.errno == EINTR:
+                    continue
+                if e.errno in ( EAGAIN, EWOULDBLOCK ):
+                    return
+                raise
+            now = monotonic()
+            data = bytearray( data )
+            hlen = ( data[ 0 ] & 0xf ) * 4
+            if len( data ) < hlen + 8 or data[ hlen ] != ICMP_ECHOREPLY:
+                continue
+            replyIdent, seq = unpack(
+                '!HH', bytes( data[ hlen + 4 : hlen + 8 ] ) )
+            entry = inflight.get( ( i, seq ) )
+            if ( replyIdent != ident or entry is None or
+                 addr[ 0 ] != ips[ entry[ 0 ] ] ):
+                continue
+            j, sent = inflight.pop( ( i, seq ) )
+            self.add( self.hosts[ i ], self.hosts[ j ],
+                      ( now - sent ) * 1000 )
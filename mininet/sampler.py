@@ -0,0 +1,220 @@
+"""
+sampler.py: sample hosts' cgroup resource usage
+
+A ResourceSampler periodically reads the CPU usage, CPU throttling
+counts and memory usage of hosts' cgroups (e.g. CPULimitedHosts') from
+a single background thread, so that resource isolation can be checked
+while many hosts are running without perturbing them much:
+
+- it keeps each cgroup stat file open, and rereads it with lseek()
+  and read() rather than reopening it (or running cgget) each time
+- it stores samples in arrays which are allocated in advance (and
+  reused as ring buffers once they are full)
+
+Example:
+
+    sampler = ResourceSampler( net.hosts, interval=.5, samples=1000 )
+    sampler.start()
+    ...
+    sampler.stop()
+    series = sampler.series( h1 )
+    print( series[ 'times' ], series[ 'cpu' ], series[ 'throttled' ] )
+
+Series contain, for each interval between samples, the CPU time used
+(CPU seconds per second, so 1.0 is one core), the number of periods
+in which the cgroup was throttled, and the time (s) for which it was
+throttled; and for each sample, the memory used (bytes, or None if
+the host has no memory cgroup).
+
+Mininet.sampleResources() starts a ResourceSampler for a network's
+CPULimitedHosts.
+
+Note that cgroup paths follow CPULimitedHost's cgroup v1 layout,
+i.e. /sys/fs/cgroup/<controller>/<host name>.
+"""
+
+import os
+from array import array
+from threading import Thread, Event, Lock
+from time import sleep
+
+from mininet.log import debug, error
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+
+NAN = float( 'nan' )
+
+
+class ResourceSampler( object ):
+    "Sample hosts' cgroup CPU and memory usage from a background thread"
+
+    cgroupDir = '/sys/fs/cgroup'
+
+    # Stat files we read: ( controller, file )
+    usageFile = ( 'cpuacct', 'cpuacct.usage' )
+    statFile = ( 'cpu', 'cpu.stat' )
+    memoryFile = ( 'memory', 'memory.usage_in_bytes' )
+
+    def __init__( self, hosts, interval=1.0, samples=600 ):
+        """hosts: hosts with cgroups (e.g. CPULimitedHosts)
+           interval: time (s) between samples
+           samples: number of samples to keep for each host"""
+        self.hosts = list( hosts )
+        self.index = dict( ( host, i ) for i, host
+                           in enumerate( self.hosts ) )
+        self.interval, self.samples = interval, samples
+        # Sample times, and for each host (in host order): cumulative
+        # CPU usage (ns), throttled periods, throttled time (ns) and
+        # memory usage (bytes)
+        size = len( self.hosts ) * samples
+        self.times = array( 'd', [ 0 ] ) * samples
+        self.usage = array( 'd', [ NAN ] ) * size
+        self.throttled = array( 'd', [ NAN ] ) * size
+        self.throttledTime = array( 'd', [ NAN ] ) * size
+        self.memory = array( 'd', [ NAN ] ) * size
+        self.count = 0
+        self.fds = []
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+    def path( self, host, controller, filename ):
+        "Return path of host's cgroup stat file"
+        return os.path.join( self.cgroupDir, controller, host.name,
+                             filename )
+
+    def open( self ):
+        """Open stat files for all hosts; missing files (e.g. for hosts
+           without a memory cgroup) are skipped"""
+        self.fds = []
+        for host in self.hosts:
+            fds = []
+            for controller, filename in ( self.usageFile, self.statFile,
+                                          self.memoryFile ):
+                path = self.path( host, controller, filename )
+                try:
+                    fds.append( os.open( path, os.O_RDONLY ) )
+                except OSError:
+                    debug( '*** ResourceSampler: cannot open %s\n' % path )
+                    fds.append( None )
+            self.fds.append( fds )
+
+    def close( self ):
+        "Close stat files"
+        for fds in self.fds:
+            for fd in fds:
+                if fd is not None:
+                    os.close( fd )
+        self.fds = []
+
+    @staticmethod
+    def read( fd ):
+        "Reread an open stat file"
+        os.lseek( fd, 0, os.SEEK_SET )
+        return os.read( fd, 4096 )
+
+    def sample( self ):
+        "Read all stat files once and store a sample"
+        with self.lock:
+            slot = self.count % self.samples
+            self.times[ slot ] = monotonic()
+            for i, ( usageFd, statFd, memoryFd ) in enumerate( self.fds ):
+                index = i * self.samples + slot
+                if usageFd is not None:
+                    self.usage[ index ] = float( self.read( usageFd ) )
+                if statFd is not None:
+                    # nr_periods N nr_throttled N throttled_time N
+                    fields = self.read( statFd ).split()
+                    stats = dict( zip( fields[ ::2 ], fields[ 1::2 ] ) )
+                    self.throttled[ index ] = float(
+                        stats.get( b'nr_throttled', NAN ) )
+                    self.throttledTime[ index ] = float(
+                        stats.get( b'throttled_time', NAN ) )
+                if memoryFd is not None:
+                    self.memory[ index ] = float( self.read( memoryFd ) )
+            self.count += 1
+
+    def run( self ):
+        "Internal method: take samples until stopped or sampling fails"
+        nextSample = monotonic()
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+            except ( OSError, ValueError ) as e:
+                error( '*** ResourceSampler: sampling failed, stopping: '
+                       '%s\n' % e )
+                break
+            nextSample += self.interval
+            self.stopped.wait( max( 0, nextSample - monotonic() ) )
+
+    def start( self ):
+        "Open stat files and start sampling in a background thread"
+        self.open()
+        self.stopped.clear()
+        self.thread = Thread( target=self.run, name='ResourceSampler' )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop( self ):
+        "Stop sampling and close stat files"
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.close()
+
+    def waitSamples( self, count, timeout=None ):
+        """Wait until count samples have been taken
+           timeout: maximum time (s) to wait
+           returns: True if count samples were taken, False if the
+             timeout expired or sampling stopped first"""
+        deadline = None if timeout is None else monotonic() + timeout
+        while self.count < count:
+            if deadline is not None and monotonic() > deadline:
+                return False
+            if not ( self.thread and self.thread.is_alive() ):
+                return self.count >= count
+            sleep( min( .05, self.interval ) )
+        return True
+
+    def slots( self ):
+        "Return stored sample slots, oldest first"
+        first = max( 0, self.count - self.samples )
+        return [ i % self.samples for i in range( first, self.count ) ]
+
+    def series( self, host ):
+        """Return host's stored samples as time series
+           returns: dict of times (s since the first stored sample),
+             memory (bytes, or None) at each sample, and cpu (CPU
+             seconds per second), throttled (throttled periods) and
+             throttledTime (s) for each interval between samples"""
+        with self.lock:
+            slots = self.slots()
+            base = self.index[ host ] * self.samples
+            times = [ self.times[ slot ] for slot in slots ]
+            usage = [ self.usage[ base + slot ] for slot in slots ]
+            throttled = [ self.throttled[ base + slot ] for slot in slots ]
+            throttledTime = [ self.throttledTime[ base + slot ]
+                              for slot in slots ]
+            memory = [ self.memory[ base + slot ] for slot in slots ]
+
+        def deltas( values, scale=1 ):
+            "Return changes in values between samples, or None if unknown"
+            return [ ( b - a ) / scale if a == a and b == b else None
+                     for a, b in zip( values, values[ 1: ] ) ]
+
+        intervals = [ b - a for a, b in zip( times, times[ 1: ] ) ]
+        return {
+            'times': [ t - times[ 0 ] for t in times ],
+            'cpu': [ used / interval if used is not None and interval
+                     else None for used, interval in
+                     zip( deltas( usage, 1e9 ), intervals ) ],
+            'throttled': [ int( t ) if t is not None else None
+                           for t in deltas( throttled ) ],
+            'throttledTime': deltas( throttledTime, 1e9 ),
+            'memory': [ int( m ) if m == m else None for m in memory ] }
@@ -10,7 +10,8 @@
 from mininet.net import Mininet
 from mininet.node import OVSSwitch, UserSwitch, IVSSwitch
 from mininet.node import CPULimitedHost
-from mininet.link import TCLink
+from mininet.link import TCLink, PerfLink
+from mininet.linktrace import LinkTracePlayer
 from mininet.topo import Topo
 from mininet.log import setLogLevel
 from mininet.util import quietRun
@@ -227,6 +228,84 @@ def testLinkLoss( self ):
 
         self.assertGreater( dropped_total, 0, msg )
 
+    def testLinkUpdate( self ):
+        "Verify that link parameters can be changed in place."
+        lopts = { 'bw': 10, 'loss': 99, 'use_htb': True }
+        mn = Mininet( topo=SingleSwitchOptionsTopo( n=N, lopts=lopts ),
+                      link=TCLink, switch=self.switchClass,
+                      waitConnected=True )
+        mn.start()
+        dropped = mn.ping( timeout='1' )
+        failures = []
+        for link in mn.links:
+            failures += link.update( bw=20, loss=0, wait=True )
+        self.assertEqual( failures, [] )
+        h1 = mn.get( 'h1' )
+        classes = h1.cmd( 'tc class show dev', h1.defaultIntf() )
+        updatedDropped = mn.ping()
+        mn.stop()
+        self.assertGreater( dropped, 0 )
+        self.assertIn( 'rate 20Mbit', classes )
+        self.assertEqual( updatedDropped, 0 )
+
+    def testLinkTrace( self ):
+        "Verify that a link trace is played on all links."
+        lopts = { 'bw': 10, 'use_htb': True }
+        mn = Mininet( topo=SingleSwitchOptionsTopo( n=N, lopts=lopts ),
+                      link=TCLink, switch=self.switchClass,
+                      waitConnected=True )
+        mn.start()
+        trace = [ ( .01 * i, { 'bw': 10 + i } ) for i in range( 11 ) ]
+        player = LinkTracePlayer( dict( ( link, trace )
+                                        for link in mn.links ) )
+        stats = player.play()
+        h1 = mn.get( 'h1' )
+        classes = h1.cmd( 'tc class show dev', h1.defaultIntf() )
+        mn.stop()
+        self.assertEqual( stats[ 'failures' ], [] )
+        self.assertEqual( stats[ 'steps' ], len( trace ) )
+        self.assertIn( 'rate 20Mbit', classes )
+
+    def testHighRate( self ):
+        "Verify multi-gigabit shaping with burst sized from the rate."
+        lopts = { 'bw': 10000, 'high_rate': True, 'leaf': 'pfifo' }
+        mn = Mininet( topo=SingleSwitchOptionsTopo( n=N, lopts=lopts ),
+                      link=TCLink, switch=self.switchClass,
+                      waitConnected=True )
+        mn.start()
+        dropped = mn.ping()
+        h1 = mn.get( 'h1' )
+        intf = h1.defaultIntf()
+        classes = h1.cmd( 'tc -d class show dev', intf )
+        qdiscs = h1.cmd( 'tc qdisc show dev', intf )
+        mn.stop()
+        self.assertEqual( dropped, 0 )
+        # Burst covers a timer tick at 10 Gb/s: 10e9 / 8 / 250 bytes
+        burst = intf.highRateBurst( 10000 )
+        self.assertEqual( burst, 5000000 )
+        self.assertIn( 'rate 10Gbit', classes )
+        self.assertIn( 'burst %db' % burst, classes )
+        self.assertIn( 'cburst %db' % burst, classes )
+        self.assertIn( 'quantum %d' % intf.gsoMaxBytes, classes )
+        # The leaf qdisc is attached to the HTB class
+        self.assertIn( 'leaf 20:', classes )
+        self.assertIn( 'qdisc pfifo 20: parent 5:1', qdiscs )
+
+    def testPerfLink( self ):
+        "Verify ping over jumbo MTU, multiqueue veths."
+        mn = Mininet( topo=SingleSwitchOptionsTopo( n=N ),
+                      link=partial( PerfLink, queues=2 ),
+                      switch=self.switchClass, waitConnected=True )
+        mn.start()
+        dropped = mn.ping()
+        h1 = mn.get( 'h1' )
+        link = h1.cmd( 'ip link show', h1.defaultIntf() )
+        queues = h1.cmd( 'ls /sys/class/net/%s/queues' % h1.defaultIntf() )
+        mn.stop()
+        self.assertEqual( dropped, 0 )
+        self.assertIn( 'mtu 9000', link )
+        self.assertEqual( len( queues.split() ), 4 )
+
     def testMostOptions( self ):
         "Verify topology creation with most link options and CPU limits."
         lopts = { 'bw': 10, 'delay': '5ms', 'use_htb': True }
@@ -263,6 +342,22 @@ class testOptionsTopoUserspace( testOptionsTopoCommon, unittest.TestCase ):
     longMessage = True
     switchClass = UserSwitch
 
+class testHighRateParams( unittest.TestCase ):
+    "Verify that high rate shaping must be requested explicitly."
+
+    def testHighRateParams( self ):
+        "Verify that rates above bwParamMax need high_rate=True."
+        net = Mininet( link=TCLink, controller=None )
+        link = net.addLink( net.addHost( 'h1' ), net.addHost( 'h2' ) )
+        try:
+            intf = link.intf1
+            # Out of range: ignored, with an error
+            self.assertEqual( intf.bwCmds( bw=10000 ), ( [], ' root ' ) )
+            cmds, _parent = intf.bwCmds( bw=10000, high_rate=True )
+            self.assertIn( 'quantum %d' % intf.gsoMaxBytes, cmds[ -1 ] )
+        finally:
+            net.stop()
+
 if __name__ == '__main__':
     setLogLevel( 'warning' )
     unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test creating veth pairs with rtnetlink."""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Host
+from mininet.link import Link, TCLink, OVSLink
+from mininet.netlink import makeIntfPair, makeIntfPairs, netlinkLink
+from mininet.topo import Topo
+from mininet.clean import cleanup
+from mininet.util import quietRun
+
+
+def intfInfo( node, intf ):
+    "Return MTU and number of tx and rx queues of node's intf"
+    out = node.cmd( 'cat /sys/class/net/%s/mtu; ls /sys/class/net/%s/queues'
+                    % ( intf, intf ) ).split()
+    queues = out[ 1: ]
+    return ( int( out[ 0 ] ),
+             len( [ q for q in queues if q.startswith( 'tx-' ) ] ),
+             len( [ q for q in queues if q.startswith( 'rx-' ) ] ) )
+
+
+class PairsTopo( Topo ):
+    "Pairs of directly connected hosts"
+
+    def build( self, n=4 ):
+        for i in range( 1, n + 1 ):
+            self.addLink( self.addHost( 'h%da' % i ),
+                          self.addHost( 'h%db' % i ) )
+
+
+class ShapedPairTopo( Topo ):
+    "Two hosts connected by a shaped link"
+
+    def build( self ):
+        self.addLink( self.addHost( 'h1' ), self.addHost( 'h2' ), bw=10 )
+
+
+class testNetlink( unittest.TestCase ):
+    "Test makeIntfPairs() and netlink links"
+
+    def tearDown( self ):
+        cleanup()
+
+    def testMakeIntfPairs( self ):
+        "makeIntfPairs() creates pairs with their names, MTU and queues"
+        h1, h2 = Host( 'h1' ), Host( 'h2' )
+        try:
+            pairs = [ ( 'h1-eth%d' % i, 'h2-eth%d' % i, None,
+                        '02:00:00:00:00:%02x' % i, h1, h2 )
+                      for i in range( 5 ) ]
+            errors = makeIntfPairs( pairs, mtu=9000, queues=3 )
+            self.assertEqual( errors, [ None ] * 5 )
+            for intf1, intf2, _addr1, addr2, _node1, _node2 in pairs:
+                self.assertEqual( intfInfo( h1, intf1 ), ( 9000, 3, 3 ) )
+                self.assertEqual( intfInfo( h2, intf2 ), ( 9000, 3, 3 ) )
+                self.assertIn( addr2, h2.cmd( 'ip link show', intf2 ) )
+            # Names are taken now
+            errors = makeIntfPairs( pairs[ :1 ] )
+            self.assertIsNotNone( errors[ 0 ] )
+            # ... but not in our namespace
+            self.assertNotIn( 'h1-eth0', quietRun( 'ip link show' ) )
+        finally:
+            h1.stop()
+            h2.stop()
+
+    def testDeleteIntfs( self ):
+        "makeIntfPair() replaces intfs without starting lazy shells"
+        h1 = Host( 'h1', lazyShell=True )
+        h2 = Host( 'h2', lazyShell=True )
+        try:
+            for _ in range( 2 ):
+                makeIntfPair( 'h1-eth0', 'h2-eth0', node1=h1, node2=h2 )
+            self.assertIsNone( h1.shell )
+            self.assertIsNone( h2.shell )
+            self.assertIn( 'h1-eth0', h1.cmd( 'ip link show' ) )
+        finally:
+            h1.stop()
+            h2.stop()
+
+    def testDeferredLinks( self ):
+        "Deferred netlink links are created together and then configured"
+        net = Mininet( topo=PairsTopo(), controller=None,
+                       link=netlinkLink( TCLink ), deferConfig=True )
+        try:
+            self.assertFalse( any( node.deferring() for node in net.hosts ) )
+            for i in range( 1, 5 ):
+                src, dst = net.get( 'h%da' % i, 'h%db' % i )
+                self.assertEqual( src.intf().name, 'h%da-eth0' % i )
+                self.assertIn( 'inet %s/8' % src.IP(),
+                               src.cmd( 'ip addr show', src.intf() ) )
+                # Its peer is up, in dst
+                self.assertIn( 'state UP', dst.cmd( 'ip link show',
+                                                    dst.intf() ) )
+        finally:
+            net.stop()
+
+    def testDeferredTCTree( self ):
+        "Deferred tc trees are recorded, so update() changes them in place"
+        net = Mininet( topo=ShapedPairTopo(), controller=None,
+                       link=netlinkLink( TCLink ), deferConfig=True )
+        try:
+            intf = net.get( 'h1' ).intf()
+            self.assertEqual( intf.tcTree, intf.shapingTree( intf.params ) )
+            lines = intf.changeCmds( intf.tcTree,
+                                     intf.shapingTree( { 'bw': 20 } ), '' )
+            self.assertTrue( all( ' change ' in line
+                                  for line, _origin in lines ) )
+            self.assertEqual( intf.update( bw=20, wait=True ), [] )
+            self.assertIn( 'rate 20Mbit',
+                           intf.cmd( 'tc class show dev', intf ) )
+        finally:
+            net.stop()
+
+    def testNetlinkLink( self ):
+        "Without deferConfig, netlink links are created one at a time"
+        link = netlinkLink( Link )
+        self.assertTrue( issubclass( link, Link ) )
+        # OVSLinks between hosts use their class's intfPairFn
+        pairs = []
+
+        def intfPair( *args, **kwargs ):
+            "Record and make a veth pair"
+            pairs.append( args[ :2 ] )
+            return makeIntfPair( *args, **kwargs )
+        ovsLink = type( 'RecordingOVSLink', ( netlinkLink( OVSLink ), ),
+                        { 'intfPairFn': staticmethod( intfPair ) } )
+        h1, h2 = Host( 'h1' ), Host( 'h2' )
+        try:
+            ovsLink( h1, h2 )
+            self.assertEqual( pairs, [ ( 'h1-eth0', 'h2-eth0' ) ] )
+        finally:
+            h1.stop()
+            h2.stop()
+        net = Mininet( topo=PairsTopo( n=2 ), controller=None, link=link )
+        try:
+            self.assertEqual( net.get( 'h1a' ).intf().name, 'h1a-eth0' )
+            self.assertEqual( intfInfo( net.get( 'h2b' ), 'h2b-eth0' )[ 0 ],
+                              1500 )
+        finally:
+            net.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,6 +43,56 @@ def testSingle5( self ):
         dropped = mn.run( mn.ping )
         self.assertEqual( dropped, 0 )
 
+    def testBulkStart( self ):
+        "Ping test on 5-host single-switch topology with bulk node startup"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass, Host,
+                      Controller, waitConnected=True, bulkStart=True )
+        dropped = mn.run( mn.ping )
+        self.assertEqual( dropped, 0 )
+
+    def testDeferConfig( self ):
+        "Ping test on 5-host single-switch topology with deferred config"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass, Host,
+                      Controller, waitConnected=True, deferConfig=True,
+                      autoStaticArp=True )
+        dropped = mn.run( mn.ping )
+        self.assertEqual( dropped, 0 )
+
+    def testLazyShell( self ):
+        "Ping test on 5-host single-switch topology with lazy host shells"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass,
+                      partial( Host, lazyShell=True ),
+                      Controller, waitConnected=True )
+        dropped = mn.run( mn.ping )
+        self.assertEqual( dropped, 0 )
+
+    def testAgent( self ):
+        "Ping test on 5-host single-switch topology using command agents"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass,
+                      partial( Host, agent=True, lazyShell=True ),
+                      Controller, waitConnected=True )
+        dropped = mn.run( mn.ping )
+        self.assertEqual( dropped, 0 )
+
+    def testParallelPing( self ):
+        "Parallel ping test on 5-host single-switch topology"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass, Host,
+                      Controller, waitConnected=True )
+        dropped = mn.run( mn.ping, parallel=True )
+        self.assertEqual( dropped, 0 )
+
+    def testNamedNamespaces( self ):
+        "Ping test on 5-host single-switch topology with named namespaces"
+        mn = Mininet( SingleSwitchTopo( k=5 ), self.switchClass,
+                      partial( Host, netns=True ),
+                      Controller, waitConnected=True )
+        mn.start()
+        self.assertIn( 'h1', quietRun( 'ip netns list' ).split() )
+        dropped = mn.ping()
+        mn.stop()
+        self.assertEqual( dropped, 0 )
+        self.assertNotIn( 'h1', quietRun( 'ip netns list' ).split() )
+
 # pylint: enable=E1101
 
 class testSingleSwitchOVSKernel( testSingleSwitchCommon, unittest.TestCase ):
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test Node command support: output decoding, streaming and batching."""
+
+import unittest
+from time import time
+
+from mininet.net import Mininet
+from mininet.node import Node, Host, CPULimitedHost
+from mininet.clean import cleanup, killprocs
+from mininet.util import decode, quietRun, Python3
+
+
+class testNodeCmd( unittest.TestCase ):
+    "Test commands sent to a node's shell"
+
+    def setUp( self ):
+        self.node = Node( 'n1' )
+
+    def tearDown( self ):
+        self.node.stop()
+
+    def testSplitCharacter( self ):
+        "A character split between reads is decoded once complete"
+        node = self.node
+        data = b'caf\xc3\xa9'
+        node.readbuf += data
+        self.assertEqual( node.read( 4 ) + node.read( 1 ), decode( data ) )
+
+    def testIterCmd( self ):
+        "iterCmd() streams command output as chunks or lines"
+        node = self.node
+        output = ''.join( node.iterCmd( 'printf "a\\nb\\n"' ) )
+        self.assertEqual( output.split(), [ 'a', 'b' ] )
+        lines = list( node.iterCmd( 'printf "a\\nbb\\nc"', lines=True ) )
+        self.assertEqual( lines, [ 'a', 'bb', 'c' ] )
+
+    def testIterLongLine( self ):
+        "Lines longer than readMax are yielded in pieces"
+        node = self.node
+        size = node.readMax * 3 + 10
+        pieces = list( node.iterCmd(
+            'head -c %d /dev/zero | tr "\\0" x; echo' % size,
+            lines=True ) )
+        self.assertEqual( sum( len( p ) for p in pieces ), size )
+        self.assertTrue( max( len( p ) for p in pieces ) <= node.readMax )
+
+    def testIterClose( self ):
+        "Closing an iterator early interrupts its command"
+        node = self.node
+        lines = node.iterCmd( 'yes x', lines=True )
+        self.assertEqual( next( lines ), 'x' )
+        lines.close()
+        self.assertFalse( node.waiting )
+        # An iterator which is never started doesn't send its command
+        node.iterCmd( 'sleep 100' )
+        self.assertFalse( node.waiting )
+        self.assertEqual( node.cmd( 'echo ok' ).strip(), 'ok' )
+
+    def testBatchCmd( self ):
+        "batchCmd() returns each command's output and exit status"
+        node = self.node
+        self.assertEqual( node.batchCmd( [] ), [] )
+        results = node.batchCmd( [ 'echo a', 'false', 'sleep 1 &', '',
+                                   'echo b' ], withStatus=True )
+        self.assertEqual( [ ( o.strip(), s ) for o, s in results ],
+                          [ ( 'a', 0 ), ( '', 1 ), ( '', 0 ), ( '', 0 ),
+                            ( 'b', 0 ) ] )
+        # Batches longer than a pty line are split into several lines
+        cmds = [ 'echo %d' % i for i in range( 2000 ) ]
+        self.assertGreater( len( '; '.join( cmds ) ), 4 * node.maxLine )
+        results = node.batchCmd( cmds, withStatus=True )
+        self.assertEqual( [ ( int( o ), s ) for o, s in results ],
+                          [ ( i, 0 ) for i in range( 2000 ) ] )
+
+    def testFlushConfig( self ):
+        "Queued shell commands run in order, without a line limit"
+        node = self.node
+        self.assertEqual( node.flushConfig(), [] )
+        node.deferConfig()
+        cmds = [ 'echo %04d%s >> /tmp/mn-test-flush' % ( i, 'x' * 100 )
+                 for i in range( 100 ) ]
+        node.queueConfig( 'test', [ 'rm -f /tmp/mn-test-flush' ] + cmds,
+                          tool='sh' )
+        node.queueConfig( 'fail', [ 'echo failed; false', 'read x' ],
+                          tool='sh' )
+        node.queueConfig( None, [ 'false' ], tool='sh' )
+        failures = node.flushConfig()
+        self.assertEqual( failures, [ ( 'fail', 'echo failed; false',
+                                        'failed' ),
+                                      ( 'fail', 'read x', '' ) ] )
+        with open( '/tmp/mn-test-flush' ) as f:
+            lines = f.read().split()
+        self.assertEqual( lines, [ c.split()[ 1 ] for c in cmds ] )
+        # We're no longer deferring
+        self.assertEqual( node.flushConfig(), [] )
+
+
+class testNodeAsync( unittest.TestCase ):
+    "Test asyncio commands on several nodes at once"
+
+    def setUp( self ):
+        if not Python3:
+            self.skipTest( 'requires asyncio' )
+        self.nodes = [ Node( 'n%d' % i ) for i in range( 1, 4 ) ]
+
+    def tearDown( self ):
+        for node in getattr( self, 'nodes', [] ):
+            node.stop()
+
+    def testAcmd( self ):
+        "acmd() runs commands on all nodes concurrently"
+        import asyncio
+        loop = asyncio.new_event_loop()
+        start = time()
+        futures = [ node.acmd( 'sleep 1; echo $1', loop=loop )
+                    for node in self.nodes ]
+        # A second command on each node is queued behind the first
+        futures += [ node.acmd( 'sleep 2 &', loop=loop )
+                     for node in self.nodes ]
+        results = loop.run_until_complete( asyncio.gather( *futures ) )
+        elapsed = time() - start
+        self.assertEqual( [ r.strip() for r in results[ :3 ] ],
+                          [ 'mininet:n1', 'mininet:n2', 'mininet:n3' ] )
+        self.assertLess( elapsed, 2 )
+        for node in self.nodes:
+            # Backgrounded commands' PIDs are parsed and removed
+            self.assertTrue( node.lastPid )
+            self.assertFalse( node.waiting )
+            # Our reader was removed once the commands completed
+            self.assertFalse( loop.remove_reader( node.stdout.fileno() ) )
+        self.assertNotIn( '\x01', ''.join( results ) )
+        loop.close()
+
+
+class testParallelCmd( unittest.TestCase ):
+    "Test commands and ARP entries on many hosts at once"
+
+    def setUp( self ):
+        self.net = Mininet( controller=None )
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def testPcmd( self ):
+        "pcmd() runs per-node commands, at most maxActive at once"
+        net = self.net
+        hosts = [ net.addHost( 'h%d' % i ) for i in range( 1, 5 ) ]
+        start = time()
+        timedOut = []
+        outputs = net.pcmd(
+            dict( ( h, 'sleep .5; echo %s' % h ) for h in hosts ),
+            maxActive=2, timedOut=timedOut )
+        elapsed = time() - start
+        self.assertEqual( dict( ( h, o.strip() ) for h, o in outputs.items() ),
+                          dict( ( h, h.name ) for h in hosts ) )
+        self.assertEqual( timedOut, [] )
+        # Two rounds of two commands
+        self.assertTrue( 1 <= elapsed < 1.9, elapsed )
+        # Commands which time out are interrupted and reported
+        outputs = net.pcmd(
+            dict( ( h, 'sleep %d; echo done' % ( 10 if h == hosts[ 0 ]
+                                                 else 0 ) )
+                  for h in hosts ), timeout=1, timedOut=timedOut )
+        self.assertEqual( timedOut, [ hosts[ 0 ] ] )
+        self.assertNotIn( 'done', outputs[ hosts[ 0 ] ] )
+        self.assertIn( 'done', outputs[ hosts[ 1 ] ] )
+        self.assertFalse( any( h.waiting for h in hosts ) )
+
+    def testPcmdDuplicates( self ):
+        "pcmd() runs a node's command once, however often it is listed"
+        h1 = self.net.addHost( 'h1' )
+        outputs = self.net.pcmd( 'echo x', nodes=[ h1, h1 ] )
+        self.assertEqual( outputs[ h1 ].split(), [ 'x' ] )
+
+    def testPcmdIgnoresInterrupt( self ):
+        "pcmd() gives up on commands which ignore interrupts"
+        h1, h2 = [ self.net.addHost( 'h%d' % i ) for i in ( 1, 2 ) ]
+        timedOut = []
+        start = time()
+        outputs = self.net.pcmd(
+            { h1: "sh -c \"trap '' INT; sleep 4\"; echo done",
+              h2: 'echo ok' }, timeout=.5, interruptTimeout=.5,
+            timedOut=timedOut )
+        self.assertLess( time() - start, 3 )
+        self.assertEqual( timedOut, [ h1 ] )
+        self.assertEqual( outputs[ h2 ].strip(), 'ok' )
+        # h1 is left waiting for its command
+        self.assertTrue( h1.waiting )
+        self.assertIn( 'done', h1.waitOutput() )
+
+    def testStaticArp( self ):
+        "staticArp() adds all-pairs entries, even for many hosts"
+        net = self.net
+        hub = net.addHost( 'hub', ip=None )
+        hosts = [ net.addHost( 'h%d' % i ) for i in range( 1, 121 ) ]
+        for host in hosts:
+            net.addLink( host, hub )
+        net.configHosts()
+        net.staticArp()
+        neighbors = hosts[ 0 ].cmd( 'ip neigh show nud permanent' )
+        self.assertEqual( len( neighbors.splitlines() ), len( hosts ) - 1 )
+        self.assertIn( '%s dev h1-eth0 lladdr %s' % ( hosts[ -1 ].IP(),
+                                                      hosts[ -1 ].MAC() ),
+                       neighbors )
+
+
+class testAgentCmd( unittest.TestCase ):
+    "Test cmd() using a command agent"
+
+    def setUp( self ):
+        self.node = Node( 'n1', agent=True )
+
+    def tearDown( self ):
+        self.node.stop()
+
+    def testAgent( self ):
+        "Simple commands run using the agent"
+        node = self.node
+        self.assertEqual( node.cmd( 'echo ok' ).strip(), 'ok' )
+        self.assertIsNotNone( node.agent )
+        self.assertFalse( node.shellState )
+
+    def testShellState( self ):
+        "Commands using shell state run in (and stay in) our shell"
+        node = self.node
+        node.cmd( 'cd /tmp && export MNTEST=1' )
+        self.assertTrue( node.shellState )
+        self.assertEqual( node.cmd( 'pwd' ).strip(), '/tmp' )
+        self.assertEqual( node.cmd( 'echo $MNTEST' ).strip(), '1' )
+
+    def testJobSpec( self ):
+        "Job specs refer to our shell's background jobs"
+        node = self.node
+        node.cmd( 'sleep 100 &' )
+        pid = node.lastPid
+        node.cmd( 'kill %sleep' )
+        node.cmd( 'wait' )
+        self.assertEqual( quietRun( 'ps -o pid= -p %d' % pid ), '' )
+
+
+class LateHost( Host ):
+    "Host whose popen() depends on setup after Host.__init__()"
+
+    def __init__( self, name, **params ):
+        Host.__init__( self, name, **params )
+        self.ready = True
+
+    def popen( self, *args, **kwargs ):
+        "Check that we're ready, as CPULimitedHost.popen() would"
+        assert self.ready
+        return Host.popen( self, *args, **kwargs )
+
+
+class testLazyShell( unittest.TestCase ):
+    "Test deferred shell startup"
+
+    privateDir = '/tmp/mn-test-private'
+
+    def testLazyShell( self ):
+        "The shell starts on first cmd(), and private dirs on first use"
+        host = LateHost( 'h1', lazyShell=True,
+                         privateDirs=[ self.privateDir ] )
+        try:
+            self.assertIsNone( host.shell )
+            # popen() doesn't need a shell
+            out, _err, _code = host.pexec( 'mount' )
+            self.assertIn( self.privateDir, out )
+            self.assertIsNone( host.shell )
+            self.assertEqual( host.cmd( 'echo ok' ).strip(), 'ok' )
+            self.assertIsNotNone( host.shell )
+            self.assertIn( 'tmpfs', host.cmd( 'stat -f -c %%T %s' %
+                                              self.privateDir ) )
+            # The mount is private to h1
+            self.assertNotIn( self.privateDir, quietRun( 'mount' ) )
+        finally:
+            host.stop()
+
+    def testStaleHolder( self ):
+        "Namespace holders are tagged so that mn -c can kill them"
+        host = Host( 'lazyh1', lazyShell=True )
+        try:
+            with open( '/proc/%d/cmdline' % host.pid ) as f:
+                self.assertIn( 'mininet:lazyh1', f.read().split( '\0' ) )
+            killprocs( 'mininet:lazyh1' )
+            host.holder.wait()
+        finally:
+            host.stop()
+
+
+class testSetnsPopen( unittest.TestCase ):
+    "Test that setnsPopen matches popen() via mnexec"
+
+    # Namespaces, working directory and cgroups of a command
+    infoCmd = [ 'sh', '-c', 'readlink /proc/self/ns/net /proc/self/ns/mnt;'
+                ' pwd; cat /proc/self/cgroup' ]
+
+    def info( self, host, **kwargs ):
+        "Return infoCmd's output in host"
+        out, err, code = host.pexec( self.infoCmd, **kwargs )
+        self.assertEqual( code, 0, err )
+        return out
+
+    def testHost( self ):
+        "setns() attaches to the same namespaces and cwd as mnexec -a"
+        host = Host( 'h1', setnsPopen=True )
+        try:
+            mncmd = [ 'mnexec', '-da', host.nsTarget() ]
+            self.assertEqual( self.info( host ),
+                              self.info( host, mncmd=mncmd ) )
+            # ... which aren't ours
+            self.assertNotEqual( self.info( host ),
+                                 quietRun( self.infoCmd ) )
+        finally:
+            host.stop()
+
+    @unittest.skipUnless( quietRun( 'which cgcreate' ),
+                          'needs cgroup-tools' )
+    def testCPULimitedHost( self ):
+        "setns() children join the same cgroups as mnexec -g"
+        host = CPULimitedHost( 'h1', setnsPopen=True )
+        try:
+            mncmd = [ 'mnexec', '-g', host.name, '-da', host.nsTarget() ]
+            self.assertEqual( self.info( host ),
+                              self.info( host, mncmd=mncmd ) )
+        finally:
+            host.stop()
+            host.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test PingStats sample storage, statistics and export."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+from mininet.pinger import PingStats, Pinger, percentile
+from mininet.net import Mininet
+from mininet.clean import cleanup
+
+
+Host = namedtuple( 'Host', 'name' )
+
+
+class testPingStats( unittest.TestCase ):
+    "Test PingStats statistics and export"
+
+    def setUp( self ):
+        self.h1, self.h2, self.h3 = hosts = [ Host( 'h%d' % i )
+                                              for i in ( 1, 2, 3 ) ]
+        self.stats = PingStats( hosts )
+        for rtt in range( 1, 101 ):
+            self.stats.add( self.h1, self.h2, float( rtt ) )
+        self.stats.add( self.h1, self.h2 )
+        self.stats.add( self.h2, self.h1 )
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def testPercentile( self ):
+        "Percentiles interpolate between samples"
+        self.assertEqual( percentile( [], 50 ), None )
+        self.assertEqual( percentile( [ 1, 2, 3, 4 ], 50 ), 2.5 )
+        self.assertEqual( percentile( [ 1, 2, 3, 4 ], 100 ), 4 )
+
+    def testStats( self ):
+        "Stats, percentiles and loss match the samples added"
+        stats, h1, h2, h3 = self.stats, self.h1, self.h2, self.h3
+        sent, received, rttmin, rttavg, rttmax, _dev = stats.stats( h1, h2 )
+        self.assertEqual( ( sent, received, rttmin, rttavg, rttmax ),
+                          ( 101, 100, 1, 50.5, 100 ) )
+        self.assertAlmostEqual( stats.percentiles( h1, h2 )[ 1 ], 99.01 )
+        self.assertEqual( stats.stats( h2, h1 ), ( 1, 0, 0, 0, 0, 0 ) )
+        self.assertEqual( stats.stats( h1, h3 ), ( 0, 0, 0, 0, 0, 0 ) )
+        self.assertEqual( stats.percentiles( h2, h1 ), [ None ] * 3 )
+        self.assertEqual( stats.totals(), ( 102, 100 ) )
+        self.assertEqual( stats.matrix()[ 0 ], [ None, 50.5, None ] )
+
+    def testCSV( self ):
+        "CSV export has a row per pair, or per sample"
+        filename = os.path.join( self.tmpdir, 'rtts.csv' )
+        self.stats.export( filename )
+        with open( filename ) as f:
+            lines = f.read().splitlines()
+        self.assertEqual( lines[ 0 ], 'src,dst,sent,received,min,avg,max,'
+                          'mdev,p50,p99,p99.9' )
+        self.assertEqual( len( lines ), 3 )
+        self.assertTrue( lines[ 2 ].startswith( 'h2,h1,1,0,' ) )
+        self.stats.writeCSV( filename, samples=True )
+        with open( filename ) as f:
+            self.assertEqual( len( f.read().splitlines() ), 101 )
+
+    def testNPZ( self ):
+        "NPZ export stores samples by pair"
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest( 'requires NumPy' )
+        filename = os.path.join( self.tmpdir, 'rtts.npz' )
+        self.stats.export( filename )
+        data = numpy.load( filename )
+        self.assertEqual( list( data[ 'received' ] ), [ 100, 0 ] )
+        rtts = data[ 'rtts' ][ data[ 'offsets' ][ 0 ]:
+                               data[ 'offsets' ][ 1 ] ]
+        self.assertEqual( rtts.sum(), 5050 )
+        self.assertAlmostEqual( data[ 'p99' ][ 0 ], 99.01, places=4 )
+        self.assertTrue( numpy.isnan( data[ 'p50' ][ 1 ] ) )
+
+
+class testPinger( unittest.TestCase ):
+    "Test Pinger between directly connected hosts"
+
+    @staticmethod
+    def hostsOver( limits ):
+        "Return a number of hosts which needs more than limits"
+        return int( max( limits ) ** .5 ) + 2
+
+    @staticmethod
+    def neighLimits():
+        "Return current neighbor table limits"
+        values = []
+        for name in Pinger.neighLimits:
+            with open( '/proc/sys/' + name.replace( '.', '/' ) ) as f:
+                values.append( int( f.read() ) )
+        return values
+
+    def testRun( self ):
+        "Pinger pings all pairs and restores neighbor table limits"
+        net = Mininet( controller=None )
+        h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+        net.addLink( h1, h2 )
+        try:
+            net.build()
+            limits = self.neighLimits()
+            pinger = Pinger( [ h1, h2 ], count=2 )
+            # Make run() raise the limits
+            hosts = self.hostsOver( limits )
+            pinger.fixNeighLimits = lambda _n: Pinger.fixNeighLimits( hosts )
+            self.assertEqual( pinger.run().totals(), ( 4, 4 ) )
+            self.assertEqual( self.neighLimits(), limits )
+        finally:
+            net.stop()
+            cleanup()
+
+    def testNeighLimits( self ):
+        "fixNeighLimits() only raises limits, and they can be restored"
+        limits = self.neighLimits()
+        old = Pinger.fixNeighLimits( self.hostsOver( limits ) )
+        try:
+            raised = self.neighLimits()
+            self.assertTrue( all( r > l for r, l in zip( raised, limits ) ) )
+            self.assertEqual( Pinger.fixNeighLimits( 2 ), {} )
+        finally:
+            Pinger.restoreNeighLimits( old )
+        self.assertEqual( self.neighLimits(), limits )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test ResourceSampler using stat files in a temporary directory."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+from mininet.sampler import ResourceSampler
+
+
+Host = namedtuple( 'Host', 'name' )
+
+
+class testResourceSampler( unittest.TestCase ):
+    "Test sampling, ring buffers and time series"
+
+    def setUp( self ):
+        self.h1, self.h2 = self.hosts = [ Host( 'h1' ), Host( 'h2' ) ]
+        self.tmpdir = tempfile.mkdtemp()
+        for host in self.hosts:
+            for controller in 'cpuacct', 'cpu':
+                os.makedirs( os.path.join( self.tmpdir, controller,
+                                           host.name ) )
+        # Only h1 has a memory cgroup
+        os.makedirs( os.path.join( self.tmpdir, 'memory', 'h1' ) )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def sampler( self, **kwargs ):
+        "Return a ResourceSampler using our stat files"
+        sampler = ResourceSampler( self.hosts, **kwargs )
+        sampler.cgroupDir = self.tmpdir
+        return sampler
+
+    def write( self, host, usage, throttled, memory=None ):
+        "Write host's stat files (in place, as the kernel would)"
+        stats = { ( 'cpuacct', 'cpuacct.usage' ): '%d\n' % usage,
+                  ( 'cpu', 'cpu.stat' ):
+                  'nr_periods 100\nnr_throttled %d\n'
+                  'throttled_time %d\n' % ( throttled, throttled * 1e6 ),
+                  ( 'memory', 'memory.usage_in_bytes' ): '%s\n' % memory }
+        for ( controller, filename ), data in stats.items():
+            path = os.path.join( self.tmpdir, controller, host.name,
+                                 filename )
+            if os.path.isdir( os.path.dirname( path ) ):
+                with open( path, 'w' ) as f:
+                    f.write( data )
+
+    def testSeries( self ):
+        "Series are computed from samples, oldest first"
+        sampler = self.sampler( samples=3 )
+        for i in range( 5 ):
+            self.write( self.h1, usage=i * 1e9, throttled=i,
+                        memory=1000 * i )
+            self.write( self.h2, usage=i * 5e8, throttled=0 )
+            if i == 0:
+                sampler.open()
+            sampler.sample()
+        sampler.close()
+        series = sampler.series( self.h1 )
+        self.assertEqual( len( series[ 'times' ] ), 3 )
+        self.assertEqual( series[ 'throttled' ], [ 1, 1 ] )
+        self.assertEqual( series[ 'throttledTime' ], [ .001, .001 ] )
+        self.assertEqual( series[ 'memory' ], [ 2000, 3000, 4000 ] )
+        series = sampler.series( self.h2 )
+        self.assertEqual( series[ 'memory' ], [ None ] * 3 )
+        self.assertEqual( series[ 'throttled' ], [ 0, 0 ] )
+        # Usage grows by .5s per sample, however long the intervals are
+        times = series[ 'times' ]
+        for cpu, start, end in zip( series[ 'cpu' ], times, times[ 1: ] ):
+            self.assertAlmostEqual( cpu * ( end - start ), .5 )
+
+    def testThread( self ):
+        "A started sampler samples in the background until stopped"
+        for host in self.hosts:
+            self.write( host, usage=0, throttled=0, memory=0 )
+        sampler = self.sampler( interval=.01, samples=10 )
+        sampler.start()
+        self.assertTrue( sampler.waitSamples( 20, timeout=10 ) )
+        sampler.stop()
+        count = sampler.count
+        self.assertEqual( len( sampler.series( self.h1 )[ 'times' ] ), 10 )
+        self.assertEqual( sampler.count, count )
+        self.assertEqual( sampler.fds, [] )
+
+    def testSamplingError( self ):
+        "A sampler stops when a stat file cannot be parsed"
+        for host in self.hosts:
+            self.write( host, usage=0, throttled=0, memory=0 )
+        sampler = self.sampler( interval=.01, samples=10 )
+        sampler.start()
+        self.assertTrue( sampler.waitSamples( 2, timeout=10 ) )
+        with open( sampler.path( self.h2, 'cpuacct', 'cpuacct.usage' ),
+                   'w' ) as f:
+            f.write( 'garbage\n' )
+        # waitSamples() returns as soon as the sampler thread stops
+        self.assertFalse( sampler.waitSamples( 1000, timeout=10 ) )
+        self.assertFalse( sampler.thread.is_alive() )
+        sampler.stop()
+
+    def testMissingUsage( self ):
+        "CPU usage is None for hosts whose usage file is missing"
+        shutil.rmtree( os.path.join( self.tmpdir, 'cpuacct', 'h2' ) )
+        for host in self.hosts:
+            self.write( host, usage=0, throttled=0, memory=0 )
+        sampler = self.sampler( samples=3 )
+        sampler.open()
+        sampler.sample()
+        sampler.sample()
+        sampler.close()
+        self.assertEqual( sampler.series( self.h2 )[ 'cpu' ], [ None ] )
+        self.assertEqual( len( sampler.series( self.h1 )[ 'cpu' ] ), 1 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test Topo link keys, port bookkeeping and sorted views,
+   and that CompactTopo matches Topo."""
+
+import unittest
+
+from mininet.topo import Topo, MultiGraph
+from mininet.compacttopo import CompactGraph, CompactTopo
+
+
+class testTopo( unittest.TestCase ):
+    "Test MultiGraph edge keys and Topo port lookups"
+
+    def testKeys( self ):
+        "Edge keys count up per node pair, in either direction"
+        g = MultiGraph()
+        self.assertEqual( g.add_edge( 'h1', 's1' ), 1 )
+        self.assertEqual( g.add_edge( 's1', 'h1' ), 2 )
+        self.assertEqual( g.add_edge( 'h2', 's1' ), 1 )
+        self.assertEqual( g.add_edge( 'h1', 's1', key=5 ), 5 )
+        self.assertEqual( g.add_edge( 'h1', 's1' ), 6 )
+        self.assertEqual( g.add_edge( 'h1', 's1', key='x' ), 'x' )
+        self.assertEqual( g.add_edge( 's1', 'h1', key=3 ), 3 )
+        self.assertEqual( g.add_edge( 'h1', 's1' ), 7 )
+        self.assertEqual( len( g[ 'h1' ][ 's1' ] ), 7 )
+
+    def testPorts( self ):
+        "Port lookups reflect links added after earlier lookups"
+        topo = Topo()
+        s1, s2 = topo.addSwitch( 's1' ), topo.addSwitch( 's2' )
+        h1 = topo.addHost( 'h1' )
+        topo.addLink( h1, s1 )
+        topo.addLink( s1, s2 )
+        self.assertEqual( topo.port( h1, s1 ), ( 0, 1 ) )
+        self.assertEqual( topo.port( s2, s1 ), ( 1, 2 ) )
+        topo.addLink( s1, s2 )
+        self.assertEqual( topo.port( s1, s2 ), [ ( 2, 1 ), ( 3, 2 ) ] )
+        self.assertEqual( topo.port( s1, h1 ), ( 1, 0 ) )
+        self.assertEqual( topo.port( h1, s2 ), [] )
+
+    def testSortedViews( self ):
+        "Sorted views are natural-sorted and reflect later changes"
+        topo = Topo()
+        for i in 10, 2, 1:
+            topo.addSwitch( 's%d' % i )
+        self.assertEqual( topo.switches(), [ 's1', 's2', 's10' ] )
+        # Repeated calls return the cached list
+        self.assertIs( topo.switches(), topo.switches() )
+        topo.addHost( 'h1' )
+        topo.addLink( 'h1', 's10' )
+        topo.addLink( 'h1', 's2' )
+        self.assertEqual( topo.nodes(), [ 'h1', 's1', 's2', 's10' ] )
+        self.assertEqual( topo.hosts(), [ 'h1' ] )
+        self.assertEqual( topo.links( sort=True ),
+                          [ ( 'h1', 's2' ), ( 'h1', 's10' ) ] )
+        topo.setNodeInfo( 's1', {} )
+        self.assertEqual( topo.hosts(), [ 'h1', 's1' ] )
+
+
+class testCompactTopo( unittest.TestCase ):
+    "Test that CompactGraph and CompactTopo match MultiGraph and Topo"
+
+    @staticmethod
+    def buildTopo( topoClass ):
+        "Build a topo with multiple links, options and explicit ports"
+        topo = topoClass()
+        for i in 10, 2, 1:
+            topo.addSwitch( 's%d' % i )
+        topo.addHost( 'h1', ip='10.0.0.1' )
+        topo.addLink( 'h1', 's10', bw=10 )
+        topo.addLink( 's1', 's2', bw=10 )
+        topo.addLink( 's2', 's1', key=5, delay='1ms' )
+        topo.addLink( 's1', 's10', port1=7, port2=8, queues=[ 1 ] )
+        return topo
+
+    def testGraph( self ):
+        "CompactGraph keys and edges match MultiGraph's"
+        graphs = MultiGraph(), CompactGraph()
+        for g in graphs:
+            for src, dst, key in ( ( 'h1', 's1', None ), ( 's1', 'h1', 5 ),
+                                   ( 'h1', 's1', None ), ( 'h1', 'h1', None ),
+                                   ( 'h1', 's1', 'x' ), ( 'h2', 's1', 2 ) ):
+                g.add_edge( src, dst, key, { 'port1': 1, 'bw': 10 } )
+        g, c = graphs
+        self.assertEqual( sorted( g.edges( data=True, keys=True ),
+                                  key=str ),
+                          sorted( c.edges( data=True, keys=True ),
+                                  key=str ) )
+        self.assertEqual( g[ 's1' ], c[ 's1' ] )
+        self.assertEqual( g[ 'h1' ], c[ 'h1' ] )
+        self.assertEqual( c.add_edge( 's1', 'h1' ), 7 )
+        self.assertEqual( len( c.opts ), 2 )
+
+    def testTopo( self ):
+        "CompactTopo views, ports and link info match Topo's"
+        topo, compact = self.buildTopo( Topo ), self.buildTopo( CompactTopo )
+        self.assertEqual( topo.nodes(), compact.nodes() )
+        self.assertEqual( topo.links( True, True, True ),
+                          compact.links( True, True, True ) )
+        # Unsorted links are in dict order for Topo
+        self.assertEqual( sorted( topo.links( False, True, True ), key=str ),
+                          sorted( compact.links( False, True, True ),
+                                  key=str ) )
+        for src, dst in ( ( 's1', 's2' ), ( 's10', 's1' ), ( 'h1', 's10' ),
+                          ( 'h1', 's2' ) ):
+            self.assertEqual( topo.port( src, dst ),
+                              compact.port( src, dst ) )
+        self.assertEqual( topo.nodeInfo( 'h1' ), compact.nodeInfo( 'h1' ) )
+        for t in topo, compact:
+            info = t.linkInfo( 's1', 's2', key=5 )
+            info.update( delay='5ms' )
+            t.setlinkInfo( 's1', 's2', info, key=5 )
+        self.assertEqual( topo.links( True, True, True ),
+                          compact.links( True, True, True ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the traffic generator and sink over the loopback interface."""
+
+import socket
+import unittest
+from subprocess import Popen, PIPE
+from time import sleep, time
+
+from mininet.trafficgen import command, parseReport
+
+
+def freePort( proto ):
+    "Return a port which is currently free for proto (udp or tcp)"
+    sock = socket.socket( socket.AF_INET, socket.SOCK_DGRAM if proto == 'udp'
+                          else socket.SOCK_STREAM )
+    sock.bind( ( '127.0.0.1', 0 ) )
+    port = sock.getsockname()[ 1 ]
+    sock.close()
+    return port
+
+
+def bound( proto, port ):
+    "Is a UDP socket bound to port, or a TCP socket listening on it?"
+    with open( '/proc/net/%s' % proto ) as table:
+        for line in table.readlines()[ 1: ]:
+            fields = line.split()
+            # UDP sockets are unconnected (07), TCP listening (0A)
+            if ( int( fields[ 1 ].split( ':' )[ 1 ], 16 ) == port and
+                 fields[ 3 ] == ( '07' if proto == 'udp' else '0A' ) ):
+                return True
+    return False
+
+
+class testTrafficGen( unittest.TestCase ):
+    "Run sources and sinks on localhost and check their reports"
+
+    def flow( self, proto, sinkOpts=None, **opts ):
+        "Run a source and sink and return their reports"
+        port = freePort( proto )
+        sink = Popen( command( 'sink', proto=proto, port=port,
+                               **( sinkOpts or {} ) ), stdout=PIPE )
+        deadline = time() + 10
+        while not bound( proto, port ):
+            self.assertLess( time(), deadline, 'sink did not start' )
+            sleep( .01 )
+        source = Popen( command( 'source', proto=proto, dst='127.0.0.1',
+                                 port=port, seconds=1, **opts ),
+                        stdout=PIPE )
+        sourceOutput, _err = source.communicate()
+        sinkOutput, _err = sink.communicate()
+        return parseReport( sourceOutput ), parseReport( sinkOutput )
+
+    def testUDPRate( self ):
+        "A constant-rate UDP flow is received in full"
+        source, sink = self.flow( 'udp', pps=1000, size=100 )
+        self.assertAlmostEqual( source[ 'packets' ], 1000, delta=20 )
+        self.assertEqual( sink[ 'sent' ], source[ 'packets' ] )
+        self.assertEqual( sink[ 'lost' ], sink[ 'sent' ] -
+                          sink[ 'packets' ] )
+        self.assertEqual( sink[ 'bytes' ], sink[ 'packets' ] * 100 )
+        self.assertLess( sink[ 'loss' ], 1 )
+
+    def testUDPLargePackets( self ):
+        "Packets larger than the sink's --size are counted in full"
+        source, sink = self.flow( 'udp', sinkOpts={ 'size': 100 },
+                                  pps=1000, size=4000 )
+        self.assertGreater( sink[ 'packets' ], 0 )
+        self.assertEqual( sink[ 'bytes' ], sink[ 'packets' ] * 4000 )
+        self.assertEqual( sink[ 'sent' ], source[ 'packets' ] )
+
+    def testTCP( self ):
+        "A TCP sink receives everything sent"
+        source, sink = self.flow( 'tcp', size=65536 )
+        self.assertGreater( source[ 'bytes' ], 0 )
+        self.assertEqual( sink[ 'bytes' ], source[ 'bytes' ] )
+        self.assertGreater( sink[ 'bps' ], 0 )
+
+    def testParseReport( self ):
+        "Reports are parsed from the last JSON line of output"
+        self.assertEqual( parseReport( b'warning\n{"bps": 1.0}\n' ),
+                          { 'bps': 1.0 } )
+        self.assertEqual( parseReport( 'Traceback...\n' ), None )
+
+
+if __name__ == '__main__':
+    unittest.main()
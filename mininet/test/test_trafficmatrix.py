@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test traffic matrix patterns and iperf output parsing."""
+
+import unittest
+from time import time
+
+import mininet.net
+from mininet.net import Mininet
+from mininet.clean import cleanup
+from mininet.trafficmatrix import ( allToAll, permutation, incast,
+                                    parseRate, TrafficMatrix )
+
+
+class testTrafficMatrix( unittest.TestCase ):
+    "Test traffic patterns, rate parsing and port assignment"
+
+    hosts = [ 'h%d' % i for i in range( 1, 6 ) ]
+
+    def testPatterns( self ):
+        "Patterns generate the expected flows"
+        hosts = self.hosts
+        self.assertEqual( len( allToAll( hosts ) ), 20 )
+        for seed in range( 10 ):
+            flows = permutation( hosts, seed=seed )
+            self.assertEqual( sorted( c for c, _s in flows ), hosts )
+            self.assertEqual( sorted( s for _c, s in flows ), hosts )
+            self.assertFalse( any( c == s for c, s in flows ) )
+        self.assertEqual( incast( hosts ),
+                          [ ( h, 'h1' ) for h in hosts[ 1: ] ] )
+        self.assertEqual( len( incast( hosts, 'h3' ) ), 4 )
+
+    def testParseRate( self ):
+        "Rates are parsed from iperf and iperf3 output"
+        iperf = '[  3]  0.0-10.0 sec  1.10 GBytes   942 Mbits/sec\n'
+        self.assertEqual( parseRate( iperf ), 942e6 )
+        iperf3 = ( '[  5]   0.00-10.00  sec  1.09 GBytes  1.10 Gbits/sec'
+                   '    0             sender\n'
+                   '[  5]   0.00-10.04  sec  1.09 GBytes   933 Mbits/sec'
+                   '                  receiver\n' )
+        self.assertEqual( parseRate( iperf3, 'sender' ), 1.1e9 )
+        self.assertEqual( parseRate( iperf3, 'receiver' ), 933e6 )
+        self.assertEqual( parseRate( 'connect failed' ), None )
+
+    def testPorts( self ):
+        "Each server's flows get consecutive ports"
+        matrix = TrafficMatrix( incast( self.hosts ) +
+                                [ ( 'h1', 'h2' ) ], port=6000 )
+        self.assertEqual( matrix.ports(), [ 6000, 6001, 6002, 6003,
+                                            6000 ] )
+
+
+class DeafMatrix( TrafficMatrix ):
+    "TrafficMatrix whose first server port never listens"
+
+    def serverCmd( self, port ):
+        if port == self.port:
+            return [ 'sleep', '60' ]
+        return TrafficMatrix.serverCmd( self, port )
+
+
+class testTrafficMatrixRun( unittest.TestCase ):
+    "Run trafficgen flows between directly connected hosts"
+
+    def testNotListening( self ):
+        "Flows whose servers don't listen fail without starting clients"
+        net = Mininet( controller=None )
+        h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+        net.addLink( h1, h2 )
+        try:
+            net.build()
+            matrix = DeafMatrix( [ ( h1, h2 ), ( h1, h2 ) ], seconds=1,
+                                 tool='trafficgen', timeout=2 )
+            start = time()
+            results = matrix.run()
+            self.assertLess( time() - start, 15 )
+        finally:
+            net.stop()
+            cleanup()
+        failed, ok = results[ 'flows' ]
+        self.assertGreaterEqual( results[ 'failures' ], 1 )
+        self.assertEqual( ( failed[ 'start' ], failed[ 'sent' ],
+                            failed[ 'received' ] ), ( None, None, None ) )
+        # The other flow's client was started
+        self.assertEqual( ok[ 'start' ], 0 )
+
+    def testIperfMatrixNotListening( self ):
+        "iperfMatrix() reports flows which were never started"
+        net = Mininet( controller=None )
+        h1, h2 = net.addHost( 'h1' ), net.addHost( 'h2' )
+        net.addLink( h1, h2 )
+        matrix = mininet.net.TrafficMatrix
+        try:
+            net.build()
+            mininet.net.TrafficMatrix = DeafMatrix
+            results = net.iperfMatrix( [ ( h1, h2 ) ], seconds=1,
+                                       tool='trafficgen' )
+        finally:
+            mininet.net.TrafficMatrix = matrix
+            net.stop()
+            cleanup()
+        self.assertEqual( results[ 'failures' ], 1 )
+        self.assertEqual( results[ 'flows' ][ 0 ][ 'start' ], None )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,7 @@
 setup for testing, and can even be emulated with the Mininet package.
 """
 
-from mininet.util import irange, natural, naturalSeq
+from mininet.util import irange, natural
 
 class MultiGraph( object ):
     "Utility class to track nodes and edges - replaces networkx.MultiGraph"
@@ -19,6 +19,7 @@ class MultiGraph( object ):
     def __init__( self ):
         self.node = {}
         self.edge = {}
+        self.nextKey = {}  # nextKey[ src ][ dst ] is next ordinal key
 
     def add_node( self, node, attr_dict=None, **attrs):
         """Add node to graph
@@ -44,9 +45,13 @@ def add_edge( self, src, dst, key=None, attr_dict=None, **attrs ):
         self.edge[ src ].setdefault( dst, {} )
         entry = self.edge[ dst ][ src ] = self.edge[ src ][ dst ]
         # If no key, pick next ordinal number
+        srcKeys = self.nextKey.setdefault( src, {} )
+        nextKey = srcKeys.get( dst, 1 )
         if key is None:
-            keys = [ k for k in entry.keys() if isinstance( k, int ) ]
-            key = max( [ 0 ] + keys ) + 1
+            key = nextKey
+        if isinstance( key, int ) and key >= nextKey:
+            srcKeys[ dst ] = self.nextKey.setdefault( dst, {} )[ src ] = (
+                key + 1 )
         entry[ key ] = attr_dict
         return key
 
@@ -99,6 +104,9 @@ def convertTo( self, cls, data=False, keys=False ):
 class Topo( object ):
     "Data center network representation for structured multi-trees."
 
+    # Graph class, with the interface of MultiGraph
+    graphClass = MultiGraph
+
     def __init__( self, *args, **params ):
         """Topo object.
            Optional named parameters:
@@ -106,12 +114,18 @@ def __init__( self, *args, **params ):
            sopts: default switch options
            lopts: default link options
            calls build()"""
-        self.g = MultiGraph()
+        self.g = self.graphClass()
         self.hopts = params.pop( 'hopts', {} )
         self.sopts = params.pop( 'sopts', {} )
         self.lopts = params.pop( 'lopts', {} )
-        # ports[src][dst][sport] is port on dst that connects to src
+        # ports[src][sport] is ( dst, dport ) that connects to src
         self.ports = {}
+        # portIndex[src][dst] is list of ( sport, dport ), built by
+        # port() and discarded when src's ports change
+        self.portIndex = {}
+        # Sorted nodes and links, until the graph changes
+        self.sortCache = {}
+        self.naturalKeys = {}  # item to natural( item )
         self.build( *args, **params )
 
     def build( self, *args, **params ):
@@ -124,6 +138,8 @@ def addNode( self, name, **opts ):
            opts: node options
            returns: node name"""
         self.g.add_node( name, **opts )
+        if self.sortCache:
+            self.sortCache.clear()
         return name
 
     def addHost( self, name, **opts ):
@@ -157,12 +173,33 @@ def addLink( self, node1, node2, port1=None, port2=None,
         opts = dict( opts )
         opts.update( node1=node1, node2=node2, port1=port1, port2=port2 )
         self.g.add_edge(node1, node2, key, opts )
+        if self.sortCache:
+            self.sortCache.clear()
         return key
 
+    def naturalKey( self, item ):
+        "Return natural( item ), which we remember"
+        key = self.naturalKeys.get( item )
+        if key is None:
+            key = self.naturalKeys[ item ] = natural( item )
+        return key
+
+    def cachedSort( self, name, sortFn ):
+        """Internal method: return the list returned by sortFn(),
+           which we remember under name until the graph changes.
+           The list is shared, so callers must not modify it."""
+        result = self.sortCache.get( name )
+        if result is None:
+            result = self.sortCache[ name ] = sortFn()
+        return result
+
     def nodes( self, sort=True ):
-        "Return nodes in graph"
+        """Return nodes in graph
+           (sorted lists are shared; copy them to modify them)"""
         if sort:
-            return self.sorted( self.g.nodes() )
+            return self.cachedSort(
+                'nodes', lambda: sorted( self.g.nodes(),
+                                         key=self.naturalKey ) )
         else:
             return self.g.nodes()
 
@@ -173,13 +210,23 @@ def isSwitch( self, n ):
     def switches( self, sort=True ):
         """Return switches.
            sort: sort switches alphabetically
-           returns: dpids list of dpids"""
+           returns: dpids list of dpids (shared if sorted; copy it
+             to modify it)"""
+        if sort:
+            return self.cachedSort(
+                'switches', lambda: [ n for n in self.nodes()
+                                      if self.isSwitch( n ) ] )
         return [ n for n in self.nodes( sort ) if self.isSwitch( n ) ]
 
     def hosts( self, sort=True ):
         """Return hosts.
            sort: sort hosts alphabetically
-           returns: list of hosts"""
+           returns: list of hosts (shared if sorted; copy it to
+             modify it)"""
+        if sort:
+            return self.cachedSort(
+                'hosts', lambda: [ n for n in self.nodes()
+                                   if not self.isSwitch( n ) ] )
         return [ n for n in self.nodes( sort ) if not self.isSwitch( n ) ]
 
     def iterLinks( self, withKeys=False, withInfo=False ):
@@ -205,13 +252,17 @@ def links( self, sort=False, withKeys=False, withInfo=False ):
            sort: sort links alphabetically, preserving (src, dst) order
            withKeys: return link keys
            withInfo: return link info
-           returns: list of ( src, dst [,key, info ] )"""
-        links = list( self.iterLinks( withKeys, withInfo ) )
+           returns: list of ( src, dst [,key, info ] ) (shared if
+             sorted; copy it to modify it)"""
         if not sort:
-            return links
+            return list( self.iterLinks( withKeys, withInfo ) )
         # Ignore info when sorting
         tupleSize = 3 if withKeys else 2
-        return sorted( links, key=( lambda l: naturalSeq( l[ :tupleSize ] ) ) )
+        return self.cachedSort(
+            ( 'links', withKeys, withInfo ),
+            lambda: sorted( self.iterLinks( withKeys, withInfo ),
+                            key=lambda l: [ self.naturalKey( item ) for item
+                                            in l[ :tupleSize ] ] ) )
 
     # This legacy port management mechanism is clunky and will probably
     # be removed at some point.
@@ -233,6 +284,8 @@ def addPort( self, src, dst, sport=None, dport=None ):
             dport = len( ports[ dst ] ) + dst_base
         ports[ src ][ sport ] = ( dst, dport )
         ports[ dst ][ dport ] = ( src, sport )
+        self.portIndex.pop( src, None )
+        self.portIndex.pop( dst, None )
         return sport, dport
 
     def port( self, src, dst ):
@@ -244,10 +297,13 @@ def port( self, src, dst ):
                 sport = port on source switch leading to the destination switch
                 dport = port on destination switch leading to the source switch
             Note that you can also look up ports using linkInfo()"""
-        # A bit ugly and slow vs. single-link implementation ;-(
-        ports = [ ( sport, entry[ 1 ] )
-                  for sport, entry in self.ports[ src ].items()
-                  if entry[ 0 ] == dst ]
+        # A bit ugly vs. single-link implementation ;-(
+        index = self.portIndex.get( src )
+        if index is None:
+            index = self.portIndex[ src ] = {}
+            for sport, ( node, dport ) in self.ports[ src ].items():
+                index.setdefault( node, [] ).append( ( sport, dport ) )
+        ports = list( index.get( dst, [] ) )
         return ports if len( ports ) != 1 else ports[ 0 ]
 
     def _linkEntry( self, src, dst, key=None ):
@@ -266,6 +322,8 @@ def setlinkInfo( self, src, dst, info, key=None ):
         "Set link metadata dict"
         entry, key = self._linkEntry( src, dst, key )
         entry[ key ] = info
+        if self.sortCache:
+            self.sortCache.clear()
 
     def nodeInfo( self, name ):
         "Return metadata (dict) for node"
@@ -274,6 +332,8 @@ def nodeInfo( self, name ):
     def setNodeInfo( self, name, info ):
         "Set metadata (dict) for node"
         self.g.node[ name ] = info
+        if self.sortCache:
+            self.sortCache.clear()
 
     def convertTo( self, cls, data=True, keys=True ):
         """Convert to a new object of networkx.MultiGraph-like class cls
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+
+"""
+trafficgen.py: lightweight UDP/TCP traffic generator and sink
+
+This module has no dependencies beyond the Python standard library
+(and Mininet itself doesn't need to be importable by it), so that it
+can be run in any node's namespace with popen():
+
+    sink = h2.popen( command( 'sink', port=5001 ) )
+    source = h1.popen( command( 'source', dst=h2.IP(), port=5001,
+                                pps=100000, size=64, seconds=5 ) )
+    print( parseReport( source.communicate()[ 0 ] ) )
+    print( parseReport( sink.communicate()[ 0 ] ) )
+
+UDP sources send packets with a small header (a magic number and a
+sequence number) at a constant rate (pps, or bits/s with rate) or as
+fast as they can, in batches with sendmmsg() where libc has it, and
+end with a few FIN packets which carry the number of packets sent.
+UDP sinks receive in batches with recvmmsg(), and count packets,
+bytes and (from the sequence numbers) lost packets until they see a
+FIN, stay idle for idle seconds, or are interrupted.
+
+TCP sources send size-byte writes, again at a constant or maximum
+rate, and TCP sinks count the bytes received from one connection.
+
+Sources and sinks print a one-line JSON report, e.g.
+
+    {"mode": "sink", "proto": "udp", "packets": 499712,
+     "bytes": 31981568, "seconds": 4.998, "pps": 99978.4,
+     "bps": 51188940.3, "sent": 500000, "lost": 288, "loss": 0.0576}
+
+where loss is a percentage and bps counts UDP or TCP payload bits.
+
+Usage: trafficgen.py source|sink [options]
+"""
+
+import ctypes
+import json
+import os
+import socket
+import struct
+import sys
+from argparse import ArgumentParser
+from select import poll, POLLIN
+from time import sleep
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+
+# UDP header: magic, flags, sequence number (or count sent, for FIN)
+header = struct.Struct( '!4sB3xQ' )
+MAGIC, FIN = b'MNTG', 1
+
+# recvmmsg() flags
+MSG_DONTWAIT, MSG_TRUNC = 0x40, 0x20
+
+# UDP sinks' buffers hold --size bytes plus this much; MSG_TRUNC
+# makes the kernel report the full length of larger packets
+SINK_HEADROOM = 512
+
+
+# Batched send/receive support
+
+class iovec( ctypes.Structure ):
+    "struct iovec"
+    _fields_ = [ ( 'iov_base', ctypes.c_void_p ),
+                 ( 'iov_len', ctypes.c_size_t ) ]
+
+
+class msghdr( ctypes.Structure ):
+    "struct msghdr"
+    _fields_ = [ ( 'msg_name', ctypes.c_void_p ),
+                 ( 'msg_namelen', ctypes.c_uint32 ),
+                 ( 'msg_iov', ctypes.POINTER( iovec ) ),
+                 ( 'msg_iovlen', ctypes.c_size_t ),
+                 ( 'msg_control', ctypes.c_void_p ),
+                 ( 'msg_controllen', ctypes.c_size_t ),
+                 ( 'msg_flags', ctypes.c_int ) ]
+
+
+class mmsghdr( ctypes.Structure ):
+    "struct mmsghdr"
+    _fields_ = [ ( 'msg_hdr', msghdr ), ( 'msg_len', ctypes.c_uint ) ]
+
+
+def libcFunction( name ):
+    "Return libc function name, or None if we don't have it"
+    try:
+        return getattr( ctypes.CDLL( None, use_errno=True ), name )
+    except ( OSError, AttributeError ):
+        return None
+
+
+class MessageBatch( object ):
+    """Buffers for sending or receiving a batch of messages on a
+       connected socket with sendmmsg() or recvmmsg()"""
+
+    sendmmsg = libcFunction( 'sendmmsg' )
+    recvmmsg = libcFunction( 'recvmmsg' )
+
+    def __init__( self, count, size ):
+        """count: number of messages
+           size: size of each message"""
+        self.buffers = [ bytearray( size ) for _ in range( count ) ]
+        self.iovecs = ( iovec * count )()
+        self.msgs = ( mmsghdr * count )()
+        for i, buf in enumerate( self.buffers ):
+            self.iovecs[ i ].iov_base = ctypes.addressof(
+                ( ctypes.c_char * size ).from_buffer( buf ) )
+            self.iovecs[ i ].iov_len = size
+            self.msgs[ i ].msg_hdr.msg_iov = ctypes.pointer(
+                self.iovecs[ i ] )
+            self.msgs[ i ].msg_hdr.msg_iovlen = 1
+
+    def send( self, sock, count ):
+        """Send the first count messages
+           returns: number of messages sent"""
+        sent = self.sendmmsg( sock.fileno(), self.msgs, count, 0 )
+        if sent < 0:
+            errno = ctypes.get_errno()
+            raise socket.error( errno, os.strerror( errno ) )
+        return sent
+
+    def receive( self, sock ):
+        """Receive available messages without blocking
+           returns: list of ( buffer, length ) received, where length
+             is the full length of messages longer than our buffers"""
+        count = self.recvmmsg( sock.fileno(), self.msgs,
+                               len( self.buffers ),
+                               MSG_DONTWAIT | MSG_TRUNC, None )
+        if count < 0:
+            return []
+        return [ ( self.buffers[ i ], self.msgs[ i ].msg_len )
+                 for i in range( count ) ]
+
+
+def report( **fields ):
+    "Print a one-line JSON report"
+    seconds = fields[ 'seconds' ]
+    fields.update( pps=fields[ 'packets' ] / seconds if seconds else 0,
+                   bps=fields[ 'bytes' ] * 8 / seconds if seconds else 0 )
+    print( json.dumps( fields, sort_keys=True ) )
+    sys.stdout.flush()
+
+
+class Pacer( object ):
+    "Constant (or maximum) rate pacing for units (packets or writes)"
+
+    def __init__( self, rate, batch ):
+        """rate: units per second, or 0 for maximum rate
+           batch: maximum units per burst"""
+        self.rate, self.batch = rate, batch
+        self.start = monotonic()
+
+    def due( self, sent ):
+        """Wait until units are due and return how many are
+           sent: units sent so far"""
+        if not self.rate:
+            return self.batch
+        while True:
+            due = int( ( monotonic() - self.start ) * self.rate ) - sent
+            if due > 0:
+                return min( due, self.batch )
+            sleep( min( 1.0 / self.rate, .001 ) )
+
+
+def udpSource( opts ):
+    "Send UDP packets to opts.dst and report"
+    sock = socket.socket( socket.AF_INET, socket.SOCK_DGRAM )
+    sock.connect( ( opts.dst, opts.port ) )
+    batch = MessageBatch( opts.batch, opts.size )
+    batched = MessageBatch.sendmmsg and opts.batch > 1
+    pacer = Pacer( opts.pps, opts.batch if batched else 1 )
+    seq, end = 0, pacer.start + opts.seconds
+    while monotonic() < end:
+        count = pacer.due( seq )
+        for i in range( count ):
+            header.pack_into( batch.buffers[ i ], 0, MAGIC, 0, seq + i )
+        try:
+            if batched:
+                seq += batch.send( sock, count )
+            else:
+                seq += sock.send( batch.buffers[ 0 ] ) and 1
+        except socket.error:
+            # e.g. ENOBUFS or ECONNREFUSED: try again
+            sleep( .0001 )
+    seconds = monotonic() - pacer.start
+    fin = bytearray( opts.size )
+    header.pack_into( fin, 0, MAGIC, FIN, seq )
+    for _ in range( 3 ):
+        try:
+            sock.send( fin )
+        except socket.error:
+            pass
+        sleep( .01 )
+    report( mode='source', proto='udp', packets=seq,
+            bytes=seq * opts.size, seconds=seconds )
+
+
+def udpSink( opts ):
+    "Receive UDP packets on opts.port and report"
+    sock = socket.socket( socket.AF_INET, socket.SOCK_DGRAM )
+    sock.setsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 24 )
+    sock.bind( ( '', opts.port ) )
+    size = opts.size + SINK_HEADROOM
+    batch = MessageBatch( opts.batch, size ) if (
+        MessageBatch.recvmmsg ) else None
+    buf = bytearray( size )
+    poller = poll()
+    poller.register( sock.fileno(), POLLIN )
+    packets = nbytes = 0
+    sent = first = last = None
+    maxSeq = -1
+    try:
+        while sent is None:
+            if not poller.poll( opts.idle * 1000 ) and first is not None:
+                break
+            if batch:
+                msgs = batch.receive( sock )
+            else:
+                msgs = [ ( buf, sock.recv_into( buf, 0, MSG_TRUNC ) ) ]
+            now = monotonic()
+            for data, length in msgs:
+                if length < header.size:
+                    continue
+                magic, flags, seq = header.unpack_from( data )
+                if magic != MAGIC:
+                    continue
+                if flags & FIN:
+                    sent = seq
+                    continue
+                packets += 1
+                nbytes += length
+                maxSeq = max( maxSeq, seq )
+                if first is None:
+                    first = now
+                last = now
+    except KeyboardInterrupt:
+        pass
+    if sent is None:
+        sent = maxSeq + 1
+    lost = max( 0, sent - packets )
+    report( mode='sink', proto='udp', packets=packets, bytes=nbytes,
+            seconds=last - first if packets else 0, sent=sent, lost=lost,
+            loss=100.0 * lost / sent if sent else 0 )
+
+
+def tcpSource( opts ):
+    "Send to opts.dst over TCP and report"
+    sock = socket.create_connection( ( opts.dst, opts.port ) )
+    data = bytearray( opts.size )
+    pacer = Pacer( opts.pps, opts.batch )
+    writes = nbytes = 0
+    end = pacer.start + opts.seconds
+    while monotonic() < end:
+        for _ in range( pacer.due( writes ) ):
+            sock.sendall( data )
+            writes += 1
+        nbytes = writes * opts.size
+    sock.shutdown( socket.SHUT_WR )
+    # Wait for the sink to close, so that everything was received
+    sock.recv( 1 )
+    report( mode='source', proto='tcp', packets=writes, bytes=nbytes,
+            seconds=monotonic() - pacer.start )
+
+
+def tcpSink( opts ):
+    "Receive from one TCP connection on opts.port and report"
+    listener = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+    listener.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
+    listener.bind( ( '', opts.port ) )
+    listener.listen( 1 )
+    nbytes, reads, start = 0, 0, None
+    buf = bytearray( 1 << 20 )
+    try:
+        sock, _addr = listener.accept()
+        start = monotonic()
+        while True:
+            count = sock.recv_into( buf )
+            if not count:
+                break
+            nbytes += count
+            reads += 1
+        sock.close()
+    except KeyboardInterrupt:
+        pass
+    report( mode='sink', proto='tcp', packets=reads, bytes=nbytes,
+            seconds=monotonic() - start if start else 0 )
+
+
+def parseRate( rate ):
+    "Parse a rate such as 10M (bits/s)"
+    units = { 'K': 1e3, 'M': 1e6, 'G': 1e9 }
+    if rate[ -1: ].upper() in units:
+        return float( rate[ :-1 ] ) * units[ rate[ -1 ].upper() ]
+    return float( rate )
+
+
+def parseArgs( args=None ):
+    "Parse command line arguments"
+    parser = ArgumentParser( description='Lightweight traffic generator '
+                             'and sink' )
+    parser.add_argument( 'mode', choices=[ 'source', 'sink' ] )
+    parser.add_argument( '--proto', choices=[ 'udp', 'tcp' ],
+                         default='udp' )
+    parser.add_argument( '--dst', help='destination address (source)' )
+    parser.add_argument( '--port', type=int, default=5001 )
+    parser.add_argument( '--size', type=int, default=1470,
+                         help='UDP payload or TCP write size (bytes); '
+                         'UDP sinks size their buffers from it' )
+    parser.add_argument( '--pps', type=float, default=0,
+                         help='packets (or writes) per second; '
+                         '0 for maximum rate' )
+    parser.add_argument( '--rate', help='rate in bits/s, e.g. 10M; '
+                         'sets pps from size' )
+    parser.add_argument( '--seconds', type=float, default=10,
+                         help='source duration' )
+    parser.add_argument( '--batch', type=int, default=64,
+                         help='packets per sendmmsg()/recvmmsg()' )
+    parser.add_argument( '--idle', type=float, default=3,
+                         help='UDP sink exits after idle seconds' )
+    opts = parser.parse_args( args )
+    if opts.mode == 'source' and not opts.dst:
+        parser.error( 'source requires --dst' )
+    if opts.proto == 'udp' and opts.size < header.size:
+        parser.error( 'UDP size must be at least %d' % header.size )
+    if opts.rate:
+        opts.pps = parseRate( opts.rate ) / ( opts.size * 8 )
+    return opts
+
+
+# Support for running us in nodes
+
+def command( mode, **opts ):
+    """Return command ( list ) to run a source or sink
+       mode: source or sink
+       opts: options, e.g. dst='10.0.0.2', pps=1000 (see parseArgs())"""
+    path = os.path.abspath( __file__ )
+    if path.endswith( '.pyc' ):
+        path = path[ :-1 ]
+    cmd = [ sys.executable, path, mode ]
+    for name, value in sorted( opts.items() ):
+        cmd += [ '--%s' % name, str( value ) ]
+    return cmd
+
+
+def parseReport( output ):
+    """Return the report in source or sink output as a dict,
+       or None if there isn't one"""
+    if isinstance( output, bytes ):
+        output = output.decode( 'utf-8', 'replace' )
+    for line in reversed( output.splitlines() ):
+        if line.startswith( '{' ):
+            try:
+                return json.loads( line )
+            except ValueError:
+                pass
+    return None
+
+
+def main( args=None ):
+    "Run a source or sink"
+    opts = parseArgs( args )
+    run = { ( 'source', 'udp' ): udpSource, ( 'sink', 'udp' ): udpSink,
+            ( 'source', 'tcp' ): tcpSource, ( 'sink', 'tcp' ): tcpSink }
+    run[ opts.mode, opts.proto ]( opts )
+
+
+if __name__ == '__main__':
+    main()
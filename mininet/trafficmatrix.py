@@ -0,0 +1,316 @@
+"""
+trafficmatrix.py: run many iperf flows at once
+
+Mininet.iperf() measures a single flow between two hosts. A
+TrafficMatrix runs a set of flows concurrently: it starts an iperf
+(or iperf3) server for each flow with popen(), waits until they are
+all listening, starts all the clients at once, and collects their
+output with pmonitor(). It returns each flow's sent and received
+rates, the aggregate received rate, and how far apart the clients
+were started (their start-time skew), which limits how concurrent
+the flows really were.
+
+Flows are ( client, server ) pairs of hosts, which may be generated
+by one of the patterns:
+
+- allToAll( hosts ): every host sends to every other host
+- permutation( hosts ): each host sends to one other host, chosen at
+  random, and receives from one other host
+- incast( hosts ): every host sends to one host (by default the
+  first)
+
+Example:
+
+    matrix = TrafficMatrix( permutation( net.hosts ), seconds=10 )
+    results = matrix.run()
+    print( results[ 'aggregate' ], results[ 'skew' ] )
+
+Each flow has its own server process and port, since iperf3 servers
+handle a single test at a time. With tool='trafficgen', flows use
+Mininet's own traffic generator and sink (see trafficgen.py) rather
+than iperf. Note that all-to-all traffic between
+n hosts uses 2n(n-1) processes.
+"""
+
+import re
+import random
+from signal import SIGINT
+from subprocess import STDOUT
+from time import sleep
+
+from mininet.log import info, error, debug
+from mininet.trafficgen import command, parseReport
+from mininet.util import pmonitor, decode
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
+
+def allToAll( hosts ):
+    "Return flows from every host to every other host"
+    return [ ( client, server ) for client in hosts for server in hosts
+             if client != server ]
+
+
+def permutation( hosts, seed=None ):
+    """Return flows for a random permutation of hosts, in which no host
+       sends to itself
+       seed: random seed (optional)"""
+    rand = random.Random( seed )
+    hosts = list( hosts )
+    if len( hosts ) < 2:
+        return []
+    # Shuffling hosts and sending to the next one in the shuffled order
+    # gives a random permutation without fixed points
+    rand.shuffle( hosts )
+    return [ ( client, hosts[ ( i + 1 ) % len( hosts ) ] )
+             for i, client in enumerate( hosts ) ]
+
+
+def incast( hosts, server=None ):
+    """Return flows from every host to one host
+       server: receiving host (default: first host)"""
+    server = server or hosts[ 0 ]
+    return [ ( client, server ) for client in hosts if client != server ]
+
+
+# Traffic patterns by name (e.g. for the CLI)
+patterns = { 'all': allToAll, 'permutation': permutation,
+             'incast': incast }
+
+
+# Rates reported by iperf, e.g. 941 Mbits/sec
+rateRegex = r'([\d.]+) ([KMGT]?)bits/sec'
+rateUnits = { '': 1, 'K': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12 }
+
+
+def parseRate( iperfOutput, label=None ):
+    """Parse iperf or iperf3 output and return its last rate in bits/s
+       label: use the last rate on a line containing label, e.g.
+         'sender' or 'receiver' for iperf3, if any
+       returns: rate or None"""
+    lines = iperfOutput.splitlines()
+    if label and any( label in line for line in lines ):
+        lines = [ line for line in lines if label in line ]
+    rates = re.findall( rateRegex, '\n'.join( lines ) )
+    if not rates:
+        return None
+    value, unit = rates[ -1 ]
+    return float( value ) * rateUnits[ unit ]
+
+
+class TrafficMatrix( object ):
+    "Run concurrent iperf flows between hosts"
+
+    def __init__( self, flows, seconds=10, l4Type='TCP', udpBw='10M',
+                  tool='iperf', port=5001, timeout=10 ):
+        """flows: list of ( client, server ) hosts
+           seconds: duration of each flow
+           l4Type: TCP or UDP
+           udpBw: target rate of UDP flows, e.g. 10M
+           tool: iperf, iperf3 or trafficgen
+           port: first server port on each host
+           timeout: time (s) to wait for servers to start, and for
+             clients and servers to finish after seconds"""
+        if l4Type not in ( 'TCP', 'UDP' ):
+            raise Exception( 'Unexpected l4 type: %s' % l4Type )
+        if tool not in ( 'iperf', 'iperf3', 'trafficgen' ):
+            raise Exception( 'Unexpected iperf tool: %s' % tool )
+        self.flows = list( flows )
+        self.seconds = seconds
+        self.l4Type, self.udpBw = l4Type, udpBw
+        self.tool, self.port = tool, port
+        self.timeout = timeout
+
+    def ports( self ):
+        "Return server port for each flow, counting up on each server"
+        nextPort, ports = {}, []
+        for _client, server in self.flows:
+            port = nextPort.get( server, self.port )
+            nextPort[ server ] = port + 1
+            ports.append( port )
+        return ports
+
+    def serverCmd( self, port ):
+        "Return iperf server command for port"
+        if self.tool == 'trafficgen':
+            return command( 'sink', proto=self.l4Type.lower(), port=port )
+        cmd = [ self.tool, '-s', '-p', str( port ) ]
+        if self.tool == 'iperf3':
+            # Exit after one test
+            cmd.append( '-1' )
+        elif self.l4Type == 'UDP':
+            cmd.append( '-u' )
+        return cmd
+
+    def clientCmd( self, server, port ):
+        "Return iperf client command for server and port"
+        if self.tool == 'trafficgen':
+            opts = dict( proto=self.l4Type.lower(), dst=server.IP(),
+                         port=port, seconds=self.seconds )
+            if self.l4Type == 'UDP':
+                opts.update( rate=self.udpBw )
+            return command( 'source', **opts )
+        cmd = [ self.tool, '-c', server.IP(), '-p', str( port ),
+                '-t', str( self.seconds ) ]
+        if self.l4Type == 'UDP':
+            cmd += [ '-u', '-b', self.udpBw ]
+        return cmd
+
+    def rate( self, output, label ):
+        """Return rate (bits/s) reported in client or server output
+           label: sender or receiver"""
+        if self.tool == 'trafficgen':
+            report = parseReport( output )
+            return report[ 'bps' ] if report else None
+        return parseRate( output, label )
+
+    @staticmethod
+    def listening( host, udp=False ):
+        """Return ports with listening sockets in host's namespace
+           udp: return bound UDP ports rather than listening TCP ports"""
+        # /proc/net shows the reading process's network namespace
+        table = '/proc/net/udp' if udp else '/proc/net/tcp'
+        out, _err, _code = host.pexec( 'cat', table )
+        ports = set()
+        for line in out.splitlines()[ 1: ]:
+            fields = line.split()
+            # UDP sockets are unconnected (07), TCP listening (0A)
+            if len( fields ) > 3 and fields[ 3 ] == ( '07' if udp
+                                                       else '0A' ):
+                ports.add( int( fields[ 1 ].split( ':' )[ 1 ], 16 ) )
+        return ports
+
+    def waitListening( self, ports ):
+        """Wait until servers are listening on their ports
+           ports: server port for each flow
+           returns: dict of server -> set of ports it isn't listening
+             on, for servers which didn't start in time"""
+        waiting = {}
+        for ( _client, server ), port in zip( self.flows, ports ):
+            waiting.setdefault( server, set() ).add( port )
+        # iperf3 servers listen for TCP control connections
+        udp = self.l4Type == 'UDP' and self.tool != 'iperf3'
+        deadline = monotonic() + self.timeout
+        while waiting and monotonic() < deadline:
+            for server, serverPorts in list( waiting.items() ):
+                serverPorts -= self.listening( server, udp=udp )
+                if not serverPorts:
+                    del waiting[ server ]
+            if waiting:
+                sleep( .1 )
+        for server, serverPorts in waiting.items():
+            error( '*** TrafficMatrix: %s not listening on ports %s\n' %
+                   ( server, sorted( serverPorts ) ) )
+        return waiting
+
+    def run( self ):
+        """Run all flows at once and collect their results
+           returns: dict of flows, a list of dicts of client, server,
+             port, start (s after the first client started), sent and
+             received (bits/s, or None if unknown); aggregate
+             (total received bits/s); skew (time (s) between the
+             first and last client starts); and failures (flows
+             without a received rate, including flows whose servers
+             didn't start listening, which have no start)"""
+        info( '*** TrafficMatrix: starting %d %s %s flows for %ss\n' %
+              ( len( self.flows ), self.tool, self.l4Type, self.seconds ) )
+        ports = self.ports()
+        servers = dict( ( i, server.popen( self.serverCmd( port ),
+                                           stderr=STDOUT ) )
+                        for i, ( ( _client, server ), port )
+                        in enumerate( zip( self.flows, ports ) ) )
+        clients, starts, outputs = {}, {}, {}
+        try:
+            notListening = self.waitListening( ports )
+            for i, ( ( client, server ), port ) in enumerate(
+                    zip( self.flows, ports ) ):
+                if port in notListening.get( server, () ):
+                    # Fail this flow rather than starting its client
+                    popen = servers.pop( i )
+                    popen.kill()
+                    outputs[ 'server', i ] = decode(
+                        popen.communicate()[ 0 ] )
+                    continue
+                starts[ i ] = monotonic()
+                clients[ i ] = client.popen(
+                    self.clientCmd( server, port ), stderr=STDOUT )
+            outputs.update( self.collect( clients, servers ) )
+        finally:
+            for popen in list( clients.values() ) + list( servers.values() ):
+                if popen.poll() is None:
+                    popen.kill()
+                popen.wait()
+        return self.results( ports, starts, outputs )
+
+    def collect( self, clients, servers ):
+        """Internal method: collect client and server output until
+           clients exit, and then until servers report their results
+           clients, servers: dicts of flow index -> popen
+           returns: dict of ( 'client' or 'server', flow index ) ->
+             output"""
+        popens = {}
+        for i, popen in clients.items():
+            popens[ 'client', i ] = popen
+        for i, popen in servers.items():
+            popens[ 'server', i ] = popen
+        outputs = dict( ( key, '' ) for key in popens )
+        # iperf servers keep running, so once the clients have exited
+        # and the servers have reported (or we run out of time), we
+        # interrupt them
+        unreported = set( ( 'server', i ) for i in servers )
+        deadline = monotonic() + self.seconds + self.timeout
+        interrupted, nextCheck = False, 0
+        live = dict( popens )  # pmonitor() removes popens as they exit
+        for key, line in pmonitor( live, timeoutms=100 ):
+            if key:
+                outputs[ key ] += line
+                if key in unreported and self.rate( outputs[ key ],
+                                                     'receiver' ):
+                    unreported.remove( key )
+            now = monotonic()
+            if now < nextCheck:
+                continue
+            nextCheck = now + .1
+            clientsDone = not any( side == 'client' for side, _i in live )
+            if not interrupted and ( now > deadline or clientsDone and
+                                     not unreported.intersection( live ) ):
+                for key in live:
+                    live[ key ].send_signal( SIGINT )
+                interrupted = True
+                deadline = now + self.timeout
+            elif interrupted and now > deadline:
+                for key in live:
+                    live[ key ].kill()
+        for key, output in outputs.items():
+            debug( '*** TrafficMatrix: %s %d output: %s\n' %
+                   ( key[ 0 ], key[ 1 ], output ) )
+        return outputs
+
+    def results( self, ports, starts, outputs ):
+        """Internal method: return results of run()
+           starts: dict of flow index -> client start time, for
+             flows whose clients we started"""
+        first = min( starts.values() ) if starts else 0
+        flows = []
+        for i, ( client, server ) in enumerate( self.flows ):
+            flows.append( {
+                'client': client, 'server': server, 'port': ports[ i ],
+                'start': starts[ i ] - first if i in starts else None,
+                'sent': self.rate( outputs.get( ( 'client', i ), '' ),
+                                   'sender' ),
+                'received': self.rate( outputs.get( ( 'server', i ), '' ),
+                                       'receiver' ) } )
+        received = [ flow[ 'received' ] for flow in flows
+                     if flow[ 'received' ] is not None ]
+        results = { 'flows': flows, 'aggregate': sum( received ),
+                    'skew': max( starts.values() ) - first if starts else 0,
+                    'failures': len( flows ) - len( received ) }
+        info( '*** TrafficMatrix: %d flows, aggregate %.1f Mbits/sec, '
+              'start skew %.3fs, %d failed\n' %
+              ( len( flows ), results[ 'aggregate' ] / 1e6,
+                results[ 'skew' ], results[ 'failures' ] ) )
+        return results
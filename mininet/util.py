@@ -184,6 +184,39 @@ def isShellBuiltin( cmd ):
 
 isShellBuiltin.builtIns = None
 
+# Batched ip and tc commands
+#
+# ip -batch and tc -batch run a list of commands in a single process;
+# with -force they keep going after errors, reporting each failed line
+# (numbered from 1) after its error messages. Warnings may come from
+# any earlier line, so we ignore them.
+
+batchFailRegex = re.compile( r'Command failed -:(\d+)' )
+
+def batchFailures( output ):
+    """Parse the output of ip -force -batch or tc -force -batch
+       output: command output, including stderr
+       returns: list of ( index of failed line, error message )"""
+    failures, messages = [], []
+    for line in output.splitlines():
+        line = line.strip()
+        match = batchFailRegex.match( line )
+        if match:
+            failures.append( ( int( match.group( 1 ) ) - 1,
+                               ' '.join( messages ) ) )
+            messages = []
+        elif line and not line.startswith( 'Warning:' ):
+            messages.append( line )
+    return failures
+
+def batchPipe( tool, lines ):
+    """Return a shell command which runs lines using tool -force -batch
+       tool: ip or tc
+       lines: list of batch lines (commands without the tool name)"""
+    quoted = [ "'%s'" % line.replace( "'", "'\\''" ) for line in lines ]
+    return "printf '%%s\\n' %s | %s -force -batch -" % (
+        ' '.join( quoted ), tool )
+
 # Interface management
 #
 # Interfaces are managed as strings which are simply the
@@ -198,7 +231,7 @@ def isShellBuiltin( cmd ):
 # explicitly moved.
 
 def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
-                  deleteIntfs=True, runCmd=None ):
+                  deleteIntfs=True, runCmd=None, mtu=None, queues=None ):
     """Make a veth pair connnecting new interfaces intf1 and intf2
        intf1: name for interface 1
        intf2: name for interface 2
@@ -208,6 +241,8 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
        node2: home node for interface 2 (optional)
        deleteIntfs: delete intfs before creating them
        runCmd: function to run shell commands (quietRun)
+       mtu: MTU for both interfaces (optional)
+       queues: number of tx and rx queues for both interfaces (optional)
        raises Exception on failure"""
     if not runCmd:
         runCmd = quietRun if not node1 else node1.cmd
@@ -218,17 +253,22 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
         runCmd2( 'ip link del ' + intf2 )
     # Create new pair
     netns = 1 if not node2 else node2.pid
+    opts = ( ( 'mtu %d ' % mtu if mtu else '' ) +
+             ( 'numtxqueues %d numrxqueues %d ' % ( queues, queues )
+               if queues else '' ) )
     if addr1 is None and addr2 is None:
         cmdOutput = runCmd( 'ip link add name %s '
-                            'type veth peer name %s '
-                            'netns %s' % ( intf1, intf2, netns ) )
+                            '%stype veth peer name %s '
+                            '%snetns %s' %
+                            ( intf1, opts, intf2, opts, netns ) )
     else:
         cmdOutput = runCmd( 'ip link add name %s '
                             'address %s '
-                            'type veth peer name %s '
+                            '%stype veth peer name %s '
                             'address %s '
-                            'netns %s' %
-                            (  intf1, addr1, intf2, addr2, netns ) )
+                            '%snetns %s' %
+                            (  intf1, addr1, opts, intf2, addr2, opts,
+                               netns ) )
     if cmdOutput:
         raise Exception( "Error creating interface pair (%s,%s): %s " %
                          ( intf1, intf2, cmdOutput ) )
@@ -274,6 +314,34 @@ def moveIntf( intf, dstNode, printError=True,
     retry( retries, delaySecs, moveIntfNoRetry, intf, dstNode,
            printError=printError )
 
+# Namespace attachment without mnexec
+
+CLONE_NEWNS, CLONE_NEWNET = 0x00020000, 0x40000000
+
+_setns = None  # cached setns() function
+
+def setnsFunction():
+    """Return a function setns( fd, nstype ) which attaches the
+       calling process to the namespace open as fd: os.setns() if
+       available, otherwise libc setns() via ctypes. Call this before
+       forking, since loading libc is not safe in a preexec_fn."""
+    global _setns  # pylint: disable=global-statement
+    if _setns:
+        return _setns
+    if hasattr( os, 'setns' ):
+        _setns = os.setns
+        return _setns
+    import ctypes
+    libcSetns = ctypes.CDLL( None, use_errno=True ).setns
+
+    def setns( fd, nstype=0 ):
+        "Attach to namespace fd, raising OSError on failure"
+        if libcSetns( fd, nstype ) != 0:
+            errno = ctypes.get_errno()
+            raise OSError( errno, os.strerror( errno ) )
+    _setns = setns
+    return _setns
+
 # Support for dumping network
 
 def dumpNodeConnections( nodes ):
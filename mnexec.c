@@ -6,9 +6,11 @@
  *  - closing all file descriptors except stdin/out/error
  *  - detaching from a controlling tty using setsid
  *  - running in network and mount namespaces
+ *  - registering namespaces by name, as with ip netns
  *  - printing out the pid of a process so we can identify it later
  *  - attaching to a namespace and cgroup
  *  - setting RT scheduling
+ *  - holding namespaces open without running a command
  *
  * Partially based on public domain setsid(1)
 */
@@ -23,7 +25,14 @@
 #include <stdlib.h>
 #include <sched.h>
 #include <ctype.h>
+#include <string.h>
 #include <sys/mount.h>
+#include <sys/stat.h>
+
+/* Named network namespaces are compatible with ip netns;
+ * the corresponding mount namespaces are registered alongside */
+#define NETNS_DIR "/var/run/netns"
+#define MNTNS_DIR "/var/run/mntns"
 
 #if !defined(VERSION)
 #define VERSION "(devel)"
@@ -32,15 +41,21 @@
 void usage(char *name)
 {
     printf("Execution utility for Mininet\n\n"
-           "Usage: %s [-cdnp] [-a pid] [-g group] [-r rtprio] cmd args...\n\n"
+           "Usage: %s [-cdnpw] [-N name] [-a pid|name] [-g group] [-r rtprio] "
+           "cmd args...\n\n"
            "Options:\n"
            "  -c: close all file descriptors except stdin/out/error\n"
            "  -d: detach from tty by calling setsid()\n"
            "  -n: run in new network and mount namespaces\n"
+           "  -N name: like -n, and register namespaces as\n"
+           "           " NETNS_DIR "/name and " MNTNS_DIR "/name\n"
            "  -p: print ^A + pid\n"
-           "  -a pid: attach to pid's network and mount namespaces\n"
+           "  -a pid|name: attach to pid's or named network and mount "
+           "namespaces\n"
            "  -g group: add to cgroup\n"
            "  -r rtprio: run with SCHED_RR (usually requires -g)\n"
+           "  -w: wait until killed instead of running cmd\n"
+           "      (any cmd args, e.g. a tag for ps, are ignored)\n"
            "  -v: print version\n",
            name);
 }
@@ -92,17 +107,227 @@ void cgroup(char *gname)
     }
 }
 
-int main(int argc, char *argv[])
+/* Is s a pid, i.e. all digits? */
+int ispid(char *s)
 {
-    int c;
+    return *s && strspn(s, "0123456789") == strlen(s);
+}
+
+/* Validate namespace name foo-1.bar; names which look like pids
+ * would be ambiguous for -a */
+void validname(char *name)
+{
+    char *s;
+    for (s=name; *s; s++) {
+        if (!isalnum(*s) && !(s > name && strchr("-_.", *s))) {
+            fprintf(stderr, "invalid name: %s\n", name);
+            exit(1);
+        }
+    }
+    if (ispid(name)) {
+        fprintf(stderr, "invalid name (all digits): %s\n", name);
+        exit(1);
+    }
+}
+
+/* Is dir a mount point in our mount namespace? */
+int ismountpoint(char *dir)
+{
+    char line[2 * PATH_MAX], mountpoint[PATH_MAX];
+    int found = 0;
+    FILE *f = fopen("/proc/self/mountinfo", "r");
+    if (!f)
+        return 0;
+    /* id parent major:minor root mountpoint ... */
+    while (!found && fgets(line, sizeof(line), f))
+        found = sscanf(line, "%*s %*s %*s %*s %4095s", mountpoint) == 1 &&
+            !strcmp(mountpoint, dir);
+    fclose(f);
+    return found;
+}
+
+/* Make registration directory dir a mount point (by binding it to
+ * itself) if it isn't one, so that new mount namespaces can detach
+ * all of the registered namespaces which they inherit at once */
+int registrydir(char *dir)
+{
+    char path[PATH_MAX];
+    /* dir may already exist */
+    mkdir(dir, 0755);
+    /* e.g. /var/run is often a symlink to /run */
+    if (!realpath(dir, path)) {
+        perror(dir);
+        return -1;
+    }
+    if (!ismountpoint(path) &&
+        mount(path, path, "none", MS_BIND, NULL) == -1) {
+        perror(path);
+        return -1;
+    }
+    return 0;
+}
+
+/* Detach all mounts on registration directory dir, which a new mount
+ * namespace copies from its parent: otherwise each namespace would
+ * hold (and pin) every namespace registered before it */
+void detachdir(char *dir)
+{
+    while (umount2(dir, MNT_DETACH) == 0)
+        ;
+}
+
+/* Bind mount namespace file nsfile as dir/name so that it persists */
+int bindns(char *nsfile, char *dir, char *name)
+{
+    char path[PATH_MAX];
     int fd;
+    snprintf(path, PATH_MAX, "%s/%s", dir, name);
+    fd = open(path, O_RDONLY|O_CREAT|O_EXCL, 0);
+    if (fd < 0) {
+        perror(path);
+        return -1;
+    }
+    close(fd);
+    if (mount(nsfile, path, "none", MS_BIND, NULL) == -1) {
+        perror(path);
+        unlink(path);
+        return -1;
+    }
+    return 0;
+}
+
+/* Run in new network and mount namespaces, optionally registering
+ * them under name, and then return to directory cwd */
+int newns(char *name, char *cwd)
+{
+    char path[PATH_MAX];
+    int rootns = -1, ns;
+
+    if (name) {
+        validname(name);
+        if (registrydir(NETNS_DIR) < 0 || registrydir(MNTNS_DIR) < 0)
+            return -1;
+        rootns = open("/proc/self/ns/mnt", O_RDONLY);
+        if (rootns < 0) {
+            perror("/proc/self/ns/mnt");
+            return -1;
+        }
+    }
+
+    /* Network namespace is registered from the root mount namespace */
+    if (unshare(CLONE_NEWNET) == -1) {
+        perror("unshare");
+        return -1;
+    }
+    if (name && bindns("/proc/self/ns/net", NETNS_DIR, name) < 0)
+        return -1;
+
+    if (unshare(CLONE_NEWNS) == -1) {
+        perror("unshare");
+        return -1;
+    }
+
+    /* Mark our whole hierarchy recursively as private, so that our
+     * mounts do not propagate to other processes.
+     */
+
+    if (mount("none", "/", NULL, MS_REC|MS_PRIVATE, NULL) == -1) {
+        perror("remount");
+        return -1;
+    }
+
+    /* Drop our copies of other nodes' registered namespaces */
+    detachdir(NETNS_DIR);
+    detachdir(MNTNS_DIR);
+
+    if (name) {
+        /* Step back into the root mount namespace to register ours */
+        ns = open("/proc/self/ns/mnt", O_RDONLY);
+        snprintf(path, PATH_MAX, "/proc/self/fd/%d", ns);
+        if (ns < 0 || setns(rootns, 0) != 0) {
+            perror("setns");
+            return -1;
+        }
+        if (bindns(path, MNTNS_DIR, name) < 0)
+            return -1;
+        if (setns(ns, 0) != 0 || chdir(cwd) != 0) {
+            perror("setns");
+            return -1;
+        }
+        close(ns);
+        close(rootns);
+    }
+
+    /* mount sysfs to pick up the new network namespace */
+    if (mount("sysfs", "/sys", "sysfs", MS_MGC_VAL, NULL) == -1) {
+        perror("mount");
+        return -1;
+    }
+    return 0;
+}
+
+/* Attach to network and mount namespaces of pid, or registered
+ * as name, and then change to directory cwd */
+int attach(char *target, char *cwd)
+{
     char path[PATH_MAX];
     int nsid;
-    int pid;
+    int pid = 0;
+
+    if (ispid(target)) {
+        pid = atoi(target);
+        sprintf(path, "/proc/%d/ns/net", pid);
+    } else {
+        validname(target);
+        snprintf(path, PATH_MAX, "%s/%s", NETNS_DIR, target);
+    }
+    nsid = open(path, O_RDONLY);
+    if (nsid < 0) {
+        perror(path);
+        return -1;
+    }
+    if (setns(nsid, 0) != 0) {
+        perror("setns");
+        return -1;
+    }
+    close(nsid);
+    /* Plan A: call setns() to attach to mount namespace */
+    if (pid)
+        sprintf(path, "/proc/%d/ns/mnt", pid);
+    else
+        snprintf(path, PATH_MAX, "%s/%s", MNTNS_DIR, target);
+    nsid = open(path, O_RDONLY);
+    if (nsid < 0 || setns(nsid, 0) != 0) {
+        /* Plan B: chroot/chdir into pid's root file system */
+        if (!pid) {
+            perror(path);
+            return -1;
+        }
+        sprintf(path, "/proc/%d/root", pid);
+        if (chroot(path) < 0) {
+            perror(path);
+            return -1;
+        }
+    }
+    if (nsid >= 0)
+        close(nsid);
+    /* chdir to correct working directory */
+    if (chdir(cwd) != 0) {
+        perror(cwd);
+        return -1;
+    }
+    return 0;
+}
+
+int main(int argc, char *argv[])
+{
+    int c;
+    int fd;
     char *cwd = get_current_dir_name();
+    int hold = 0;
 
     static struct sched_param sp;
-    while ((c = getopt(argc, argv, "+cdnpa:g:r:vh")) != -1)
+    while ((c = getopt(argc, argv, "+cdnpwN:a:g:r:vh")) != -1)
         switch(c) {
         case 'c':
             /* close file descriptors except stdin/out/error */
@@ -126,25 +351,13 @@ int main(int argc, char *argv[])
             break;
         case 'n':
             /* run in network and mount namespaces */
-            if (unshare(CLONE_NEWNET|CLONE_NEWNS) == -1) {
-                perror("unshare");
+            if (newns(NULL, cwd) < 0)
                 return 1;
-            }
-
-            /* Mark our whole hierarchy recursively as private, so that our
-             * mounts do not propagate to other processes.
-             */
-
-            if (mount("none", "/", NULL, MS_REC|MS_PRIVATE, NULL) == -1) {
-                perror("remount");
-                return 1;
-            }
-
-            /* mount sysfs to pick up the new network namespace */
-            if (mount("sysfs", "/sys", "sysfs", MS_MGC_VAL, NULL) == -1) {
-                perror("mount");
+            break;
+        case 'N':
+            /* run in network and mount namespaces, registered by name */
+            if (newns(optarg, cwd) < 0)
                 return 1;
-            }
             break;
         case 'p':
             /* print pid */
@@ -152,34 +365,13 @@ int main(int argc, char *argv[])
             fflush(stdout);
             break;
         case 'a':
-            /* Attach to pid's network namespace and mount namespace */
-            pid = atoi(optarg);
-            sprintf(path, "/proc/%d/ns/net", pid);
-            nsid = open(path, O_RDONLY);
-            if (nsid < 0) {
-                perror(path);
-                return 1;
-            }
-            if (setns(nsid, 0) != 0) {
-                perror("setns");
+            /* Attach to network namespace and mount namespace */
+            if (attach(optarg, cwd) < 0)
                 return 1;
-            }
-            /* Plan A: call setns() to attach to mount namespace */
-            sprintf(path, "/proc/%d/ns/mnt", pid);
-            nsid = open(path, O_RDONLY);
-            if (nsid < 0 || setns(nsid, 0) != 0) {
-                /* Plan B: chroot/chdir into pid's root file system */
-                sprintf(path, "/proc/%d/root", pid);
-                if (chroot(path) < 0) {
-                    perror(path);
-                    return 1;
-                }
-            }
-            /* chdir to correct working directory */
-            if (chdir(cwd) != 0) {
-                perror(cwd);
-                return 1;
-            }
+            break;
+        case 'w':
+            /* hold our namespaces open until we are killed */
+            hold = 1;
             break;
         case 'g':
             /* Attach to cgroup */
@@ -204,6 +396,10 @@ int main(int argc, char *argv[])
             exit(1);
         }
 
+    if (hold) {
+        for (;;)
+            pause();
+    }
     if (optind < argc) {
         execvp(argv[optind], &argv[optind]);
         perror(argv[optind]);